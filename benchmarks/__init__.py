@@ -0,0 +1,8 @@
+"""
+Moto backed benchmarks for the blog API handlers, run with python -m benchmarks.<name>
+"""
+import os
+import sys
+
+# Lambda packages blog_api/ as the code root, so handlers import shared modules top-level
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'blog_api'))
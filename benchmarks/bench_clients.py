@@ -0,0 +1,64 @@
+"""
+Compares warm retrieve_post latency when every invocation builds its own DynamoDB resource against the shared
+client pool. moto answers in process, so this isolates session, endpoint and client construction; deployed,
+the pooled connection additionally skips a TCP and TLS handshake per invocation.
+
+    python -m benchmarks.bench_clients --posts 200 --requests 1000
+"""
+import os
+import random
+import argparse
+
+from moto import mock_dynamodb
+
+from benchmarks import common
+
+import cache
+import clients
+
+
+def run(posts, requests):
+    common.aws_env()
+    os.environ['READ_CACHE_VERSION_CHECK'] = 'false'
+
+    import retrieve_post
+
+    with mock_dynamodb():
+        table = common.create_posts_table()
+        post_ids = common.seed_posts(table, posts)
+
+        rng = random.Random(5)
+        events = [{'pathParameters': {'slug': rng.choice(post_ids)}} for _ in range(requests)]
+
+        # The read cache would hide the DynamoDB round trip this is measuring
+        retrieve_post.read_cache = cache.TTLCache(maxsize=0)
+
+        def per_invocation(i):
+            clients.reset()
+            retrieve_post.retrieve_post_handler(events[i], None)
+
+        def pooled(i):
+            retrieve_post.retrieve_post_handler(events[i], None)
+
+        results = []
+        for label, invoke in [('per invocation', per_invocation), ('shared pool', pooled)]:
+            clients.reset()
+            invoke(0)
+            results.append(dict(mode=label, **common.summarize(common.timed(invoke, requests))))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    print('{:<16} {:>9} {:>9} {:>9} {:>9}'.format('mode', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'))
+    for row in run(args.posts, args.requests):
+        print('{mode:<16} {mean_ms:>9} {p50_ms:>9} {p95_ms:>9} {p99_ms:>9}'.format(**row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Measures compression ratio and CPU cost of gzip levels and brotli qualities on post and listing bodies.
+
+    python -m benchmarks.bench_compression --repeat 20
+"""
+import gzip
+import json
+import time
+import random
+import argparse
+
+from benchmarks import common
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+POST_SIZES = [1024, 8 * 1024, 32 * 1024, 128 * 1024]
+
+
+def bodies():
+    """
+    Single post bodies of increasing size and a 20 item listing page with full content
+    """
+    rng = random.Random(3)
+    samples = []
+
+    for size in POST_SIZES:
+        post = {'PostID': '{:032x}'.format(rng.getrandbits(128)), 'Title': 'Post', 'Slug': 'post',
+                'Content': common.synthetic_markdown(rng, size)}
+        samples.append(('post {}KB'.format(size // 1024), json.dumps([post]).encode('utf-8')))
+
+    listing = [{'PostID': '{:032x}'.format(rng.getrandbits(128)), 'Title': 'Post {}'.format(i),
+                'Content': common.synthetic_markdown(rng, 4096)} for i in range(20)]
+    samples.append(('listing 20x4KB', json.dumps({'items': listing}).encode('utf-8')))
+
+    return samples
+
+
+def codecs():
+    options = [('gzip-{}'.format(level), lambda data, level=level: gzip.compress(data, compresslevel=level),
+                gzip.decompress) for level in (1, 4, 6, 9)]
+
+    if brotli:
+        options += [('br-{}'.format(quality), lambda data, quality=quality: brotli.compress(data, quality=quality),
+                     brotli.decompress) for quality in (1, 4, 5, 8, 11)]
+
+    return options
+
+
+def measure(fn, data, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(data)
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    if not brotli:
+        print('brotli is not installed, only gzip is measured')
+
+    print('{:<16} {:<8} {:>10} {:>10} {:>7} {:>12} {:>12}'.format(
+        'body', 'codec', 'raw_bytes', 'out_bytes', 'ratio', 'compress_ms', 'decompress_ms'))
+    for label, data in bodies():
+        for name, compress, decompress in codecs():
+            compressed, compress_ms = measure(compress, data, args.repeat)
+            _, decompress_ms = measure(decompress, compressed, args.repeat)
+            print('{:<16} {:<8} {:>10} {:>10} {:>7.2f} {:>12.3f} {:>12.3f}'.format(
+                label, name, len(data), len(compressed), len(data) / len(compressed), compress_ms, decompress_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Reports the DynamoDB capacity units a post item costs with Content stored as a string and as content_codec
+stores it, and what encoding and decoding it costs.
+
+    python -m benchmarks.bench_content_codec --posts 20 --sizes 1000,4000,16000,60000
+    python -m benchmarks.bench_content_codec --corpus path/to/exported/posts
+
+Item sizes follow DynamoDB's rules: attribute name bytes plus value bytes, a write costs a WCU per started KB and
+a strongly consistent read a RCU per started 4 KB, an eventually consistent one half of that. Summary listings
+only read the date index, which holds no Content, so the listing column is for listings of the Content field:
+an eventually consistent BatchGetItem that bills every item on its own. The generated posts draw from a small
+vocabulary and compress better than prose, --corpus measures a directory of real Markdown files (*.md, read
+recursively) instead. Posts over CONTENT_OFFLOAD_BYTES live in S3 and aren't counted.
+"""
+import os
+import math
+import time
+import random
+import decimal
+import argparse
+
+from boto3.dynamodb.types import Binary
+
+from benchmarks import common
+
+import content_codec
+import content_store
+
+def value_size(value):
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, (bytes, Binary)):
+        return content_codec.stored_size(value)
+    if isinstance(value, (int, decimal.Decimal)):
+        return len(str(value).lstrip('-').replace('.', '')) // 2 + 2
+    if isinstance(value, (list, set)):
+        return 3 + sum(value_size(element) + 1 for element in value)
+
+    raise TypeError('Unsized value {!r}'.format(type(value)))
+
+
+def item_size(item):
+    return sum(len(name.encode('utf-8')) + value_size(value) for name, value in item.items())
+
+
+def capacity(sizes):
+    return dict(wcu=sum(math.ceil(size / 1024.0) for size in sizes),
+                rcu=sum(math.ceil(size / 4096.0) for size in sizes),
+                page_rcu=sum(math.ceil(size / 4096.0) * 0.5 for size in sizes))
+
+
+def post_item(i, content):
+    """
+    A post item as the posts table holds it, see publishing.post_item
+    """
+    return {
+        'PostID': '{:032x}'.format(i),
+        'Author': 'bench_user',
+        'Title': 'Benchmark post {}'.format(i),
+        'Slug': 'benchmark-post-{}'.format(i),
+        'Description': 'Synthetic post number {}'.format(i),
+        'Content': content,
+        'ContentHash': '0' * 64,
+        'Tags': ['python', 'lambda', 'dynamodb'],
+        'DateCreated': '2023-01-01T00:00:00',
+        'DateUpdated': '2023-01-01T00:00:00',
+        'DateBucket': '2023-01#0',
+        'HtmlURL': 'https://bench.s3.amazonaws.com/bench_user/benchmark-post-{}.0123456789abcdef.html'.format(i),
+    }
+
+
+def measure(label, contents):
+    contents = [content for content in contents if len(content.encode('utf-8')) <= content_store.offload_bytes()]
+    if not contents:
+        return None
+
+    started_at = time.perf_counter()
+    encoded = [content_codec.encode(content) for content in contents]
+    encode_ms = (time.perf_counter() - started_at) * 1000
+
+    started_at = time.perf_counter()
+    for value in encoded:
+        content_codec.decode(value)
+    decode_ms = (time.perf_counter() - started_at) * 1000
+
+    plain = capacity([item_size(post_item(i, content)) for i, content in enumerate(contents)])
+    stored = capacity([item_size(post_item(i, value)) for i, value in enumerate(encoded)])
+
+    return dict(corpus=label, posts=len(contents),
+                content_kb=round(sum(len(content.encode('utf-8')) for content in contents) / 1024.0, 1),
+                stored_kb=round(sum(content_codec.stored_size(value) for value in encoded) / 1024.0, 1),
+                wcu=plain['wcu'], wcu_codec=stored['wcu'], rcu=plain['rcu'], rcu_codec=stored['rcu'],
+                page_rcu=plain['page_rcu'], page_rcu_codec=stored['page_rcu'],
+                encode_ms=round(encode_ms / len(contents), 3), decode_ms=round(decode_ms / len(contents), 3))
+
+
+def read_corpus(path):
+    contents = []
+    for directory, _, names in os.walk(path):
+        for name in sorted(names):
+            if name.endswith('.md'):
+                with open(os.path.join(directory, name), encoding='utf-8', errors='replace') as handle:
+                    contents.append(handle.read())
+
+    return contents
+
+
+def run(posts, sizes, corpus=None):
+    rng = random.Random(17)
+    rows = [measure(str(size), [common.synthetic_markdown(rng, size) for _ in range(posts)]) for size in sizes]
+    if corpus:
+        rows.append(measure(os.path.basename(os.path.normpath(corpus)), read_corpus(corpus)))
+
+    return [row for row in rows if row]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=20, help='generated posts per size')
+    parser.add_argument('--sizes', default='1000,4000,16000,60000', help='generated Markdown sizes in characters')
+    parser.add_argument('--corpus', help='directory of Markdown files to measure as well')
+    args = parser.parse_args()
+
+    rows = run(args.posts, [int(size) for size in args.sizes.split(',')], args.corpus)
+
+    print('{:<12} {:>6} {:>11} {:>10} {:>12} {:>12} {:>16} {:>10} {:>10}'.format(
+        'corpus', 'posts', 'content_kb', 'stored_kb', 'write WCU', 'get RCU', 'listed RCU', 'encode_ms',
+        'decode_ms'))
+    for row in rows:
+        print('{corpus:<12} {posts:>6} {content_kb:>11} {stored_kb:>10} {wcu:>5} -> {wcu_codec:<4} '
+              '{rcu:>5} -> {rcu_codec:<4} {page_rcu:>7} -> {page_rcu_codec:<6} {encode_ms:>10} '
+              '{decode_ms:>10}'.format(**row))
+
+    for name in ('wcu', 'rcu', 'page_rcu'):
+        before = sum(row[name] for row in rows)
+        after = sum(row[name + '_codec'] for row in rows)
+        print('{}: {:g} -> {:g} ({:.1f}% saved)'.format(name, before, after, 100.0 * (before - after) / before))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Reports the bytes the stored post HTML takes with each HTML_ENCODING over a sample corpus, and what encoding it
+once at write time costs.
+
+    python -m benchmarks.bench_html_objects --posts 20 --sizes 1000,4000,16000,64000
+
+Every reader downloads the stored bytes, so bytes saved per post is also bytes saved per uncached page view.
+"""
+import os
+import time
+import random
+import argparse
+
+from benchmarks import common
+
+import html_objects
+import rendering
+
+ENCODINGS = [('identity', {}), ('gzip 6', {'HTML_GZIP_LEVEL': '6'}), ('gzip 9', {'HTML_GZIP_LEVEL': '9'}),
+             ('br 11', {'HTML_BROTLI_QUALITY': '11'})]
+
+
+def run(posts, sizes):
+    rng = random.Random(13)
+    results = []
+
+    for size in sizes:
+        pages = [rendering.sanitize(rendering.to_html(common.synthetic_markdown(rng, size))) for _ in range(posts)]
+        html_bytes = sum(len(page.encode('utf-8')) for page in pages)
+
+        for label, settings in ENCODINGS:
+            coding = label.split()[0]
+            if coding == html_objects.BROTLI and html_objects.brotli is None:
+                continue
+
+            os.environ.update(settings, HTML_ENCODING=coding)
+            started_at = time.perf_counter()
+            stored = sum(len(html_objects.encode(page)[0]) for page in pages)
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+
+            results.append(dict(size=size, encoding=label, html_kb=round(html_bytes / 1024.0, 1),
+                                stored_kb=round(stored / 1024.0, 1),
+                                saved_pct=round(100.0 * (html_bytes - stored) / html_bytes, 1),
+                                encode_ms=round(elapsed_ms / posts, 2)))
+
+    os.environ.pop('HTML_ENCODING', None)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=20, help='posts per size')
+    parser.add_argument('--sizes', default='1000,4000,16000,64000', help='Markdown sizes in characters')
+    args = parser.parse_args()
+
+    rows = run(args.posts, [int(size) for size in args.sizes.split(',')])
+
+    print('{:>7} {:<9} {:>9} {:>10} {:>8} {:>13}'.format(
+        'size', 'encoding', 'html_kb', 'stored_kb', 'saved%', 'encode_ms/post'))
+    for row in rows:
+        print('{size:>7} {encoding:<9} {html_kb:>9} {stored_kb:>10} {saved_pct:>8} {encode_ms:>13}'.format(**row))
+
+    total_html = sum(row['html_kb'] for row in rows if row['encoding'] == 'identity')
+    for label, _ in ENCODINGS[1:]:
+        stored = sum(row['stored_kb'] for row in rows if row['encoding'] == label)
+        if stored:
+            print('{}: {:.1f} KB of {:.1f} KB saved across the corpus'.format(label, total_html - stored, total_html))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Measures handler CPU time and log volume with every payload logged in full (LOG_LEVEL=DEBUG, no truncation,
+what the handlers used to do on each request) against the default INFO level with 1% sampled debug detail.
+
+    python -m benchmarks.bench_logging --requests 500
+"""
+import os
+import time
+import random
+import logging
+import argparse
+
+from moto import mock_dynamodb
+
+from benchmarks import common
+
+import log
+import cache
+
+MODES = [
+    ('debug, untruncated', {'LOG_LEVEL': 'DEBUG', 'LOG_DEBUG_SAMPLE_RATE': '0', 'LOG_MAX_FIELD_BYTES': '0'}),
+    ('info, 1% sampled', {'LOG_LEVEL': 'INFO', 'LOG_DEBUG_SAMPLE_RATE': '0.01', 'LOG_MAX_FIELD_BYTES': '2048'}),
+]
+
+
+class CountingStream:
+    """
+    Stands in for the CloudWatch log stream, counting the bytes written to it
+    """
+
+    def __init__(self):
+        self.bytes = 0
+        self.lines = 0
+
+    def write(self, text):
+        self.bytes += len(text.encode('utf-8'))
+        self.lines += text.count('\n')
+
+    def flush(self):
+        pass
+
+
+def cpu_timed(fn, iterations):
+    """
+    Calls fn(i) iterations times and returns the process CPU time of each call in milliseconds
+    """
+    samples = []
+    for i in range(iterations):
+        start = time.process_time()
+        fn(i)
+        samples.append((time.process_time() - start) * 1000)
+    return samples
+
+
+def run(posts, requests):
+    common.aws_env()
+    os.environ['READ_CACHE_VERSION_CHECK'] = 'false'
+
+    import retrieve_post
+    import sanitize_markdown
+
+    root = log.get_logger()
+    stream = CountingStream()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(log.JsonFormatter())
+    previous_handlers = root.handlers[:]
+    root.handlers = [handler]
+
+    rng = random.Random(3)
+    documents = [{'content': common.synthetic_markdown(rng, 20000)} for _ in range(20)]
+
+    results = []
+    try:
+        with mock_dynamodb():
+            table = common.create_posts_table()
+            post_ids = common.seed_posts(table, posts)
+            retrieve_events = [{'pathParameters': {'slug': rng.choice(post_ids)}} for _ in range(requests)]
+            retrieve_post.read_cache = cache.TTLCache(maxsize=0)
+
+            for name, handle in [
+                ('sanitize_markdown', lambda i: sanitize_markdown.sanitize_markdown_handler(
+                    dict(documents[i % len(documents)]), None)),
+                ('retrieve_post', lambda i: retrieve_post.retrieve_post_handler(retrieve_events[i], None)),
+            ]:
+                for label, env in MODES:
+                    os.environ.update(env)
+                    handle(0)
+                    stream.bytes = stream.lines = 0
+
+                    samples = cpu_timed(handle, requests)
+
+                    results.append(dict(handler=name, mode=label, cpu_mean_ms=round(sum(samples) / len(samples), 3),
+                                        cpu_p95_ms=round(common.percentile(samples, 95), 3),
+                                        log_kb_per_request=round(stream.bytes / 1024.0 / requests, 2),
+                                        log_lines=stream.lines))
+    finally:
+        root.handlers = previous_handlers
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    print('{:<18} {:<20} {:>11} {:>10} {:>11} {:>9}'.format(
+        'handler', 'mode', 'cpu_mean_ms', 'cpu_p95_ms', 'log_kb/req', 'lines'))
+    for row in run(args.posts, args.requests):
+        print('{handler:<18} {mode:<20} {cpu_mean_ms:>11} {cpu_p95_ms:>10} {log_kb_per_request:>11} '
+              '{log_lines:>9}'.format(**row))
+
+
+if __name__ == '__main__':
+    main()
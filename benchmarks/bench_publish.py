@@ -0,0 +1,157 @@
+"""
+Compares end-to-end publish latency of PUBLISH_MODE=stepfunctions (validate_post, then the SanitizeMarkdown and
+MarkdownToHtml tasks and the SNS publish step of the state machine) with PUBLISH_MODE=inline (everything inside
+validate_post, with the S3 and DynamoDB writes issued concurrently).
+
+    python -m benchmarks.bench_publish --posts 50 --service-ms 15 --hop-ms 40 --cold-ratio 0.1 --cold-start-ms 300
+
+Handlers run in process against moto. --service-ms adds a fixed latency to every AWS call so the concurrent writes
+show up as they would against the real services. The Step Functions route is replayed task by task; every hop
+it adds (state transition plus Lambda invoke) is charged --hop-ms, and a --cold-ratio share of the hops that
+invoke a Lambda also pays --cold-start-ms. Those are modelled, not measured, so pick them from production traces.
+"""
+import os
+import json
+import time
+import random
+import argparse
+
+import boto3
+
+from moto import mock_dynamodb, mock_s3, mock_sns, mock_stepfunctions
+
+from benchmarks import common
+from benchmarks import suite
+
+import clients
+
+# Lambda tasks and the SNS task of the state machine
+LAMBDA_HOPS = 2
+HOPS = 3
+
+
+def add_service_latency(milliseconds):
+    """
+    Delays every AWS request, registered first so it runs before moto answers
+    """
+    def delay(**kwargs):
+        time.sleep(milliseconds / 1000.0)
+
+    session = boto3._get_default_session()
+    session.events.register_first('before-send', delay)
+    clients.reset()
+
+    return lambda: session.events.unregister('before-send', delay)
+
+
+def create_event(rng, content_size):
+    return {
+        'body': json.dumps({'title': 'Bench post {}'.format(rng.getrandbits(48)), 'description': 'Benchmark',
+                            'content': common.synthetic_markdown(rng, content_size),
+                            'tags': rng.sample(common.WORDS[:12], 3)}),
+        'requestContext': {'authorizer': {'principalId': suite.AUTHOR}}
+    }
+
+
+def step_functions_publish(event, payload_sizes):
+    """
+    Replays the state machine in process: each task gets the JSON state the previous one returned
+    """
+    import validate_post
+    import sanitize_markdown
+    import markdown_to_html
+
+    started = []
+    client = clients.get_client('stepfunctions')
+    original = client.start_execution
+
+    def capture(**kwargs):
+        started.append(kwargs['input'])
+        return original(**kwargs)
+
+    client.start_execution = capture
+    try:
+        validate_post.validate_post_handler(event, None)
+    finally:
+        client.start_execution = original
+
+    state = sanitize_markdown.sanitize_markdown_handler(json.loads(started[0]), None)
+    state_json = json.dumps(state)
+    payload_sizes.append(len(state_json))
+    markdown_to_html.markdown_to_html_handler(json.loads(state_json), None)
+
+    clients.get_client('sns').publish(TopicArn=os.environ['TOPIC_ARN'], Message='Post created successfully')
+
+
+def inline_publish(event, payload_sizes):
+    import validate_post
+
+    response = validate_post.validate_post_handler(event, None)
+    assert response['statusCode'] == 201, response
+
+
+def run(posts, content_size, service_ms, hop_ms, cold_ratio, cold_start_ms):
+    common.aws_env()
+    os.environ.update({
+        'POSTS_BUCKET': suite.BUCKET_NAME,
+        'TAGS_TABLE': suite.TAGS_TABLE_NAME,
+        'SEARCH_TABLE': suite.SEARCH_TABLE_NAME,
+        'METRICS_ENABLED': 'false',
+        'LOG_LEVEL': 'WARNING',
+    })
+
+    results = []
+    with mock_dynamodb(), mock_s3(), mock_sns(), mock_stepfunctions():
+        suite.seed(0, [content_size], 0)
+        suite.create_state_machine()
+        os.environ['TOPIC_ARN'] = boto3.client('sns').create_topic(Name='BenchTopic')['TopicArn']
+        remove_latency = add_service_latency(service_ms)
+
+        try:
+            for mode, publish, hops in [('stepfunctions', step_functions_publish, HOPS),
+                                        ('inline', inline_publish, 0)]:
+                os.environ['PUBLISH_MODE'] = mode
+                rng = random.Random(mode)
+                events = [create_event(rng, content_size) for _ in range(posts + 1)]
+                payload_sizes = []
+
+                publish(events[0], payload_sizes)
+                latencies = common.timed(lambda i: publish(events[i + 1], payload_sizes), posts)
+
+                # Modelled orchestration overhead, the same for every request
+                overhead = hops * hop_ms + (LAMBDA_HOPS if hops else 0) * cold_ratio * cold_start_ms
+                summary = common.summarize(latencies)
+                results.append(dict(mode=mode, handler_p50_ms=summary['p50_ms'], handler_p95_ms=summary['p95_ms'],
+                                    overhead_ms=round(overhead, 1),
+                                    end_to_end_p50_ms=round(summary['p50_ms'] + overhead, 1),
+                                    end_to_end_p95_ms=round(summary['p95_ms'] + overhead, 1),
+                                    invocations=1 + (LAMBDA_HOPS if hops else 0),
+                                    state_kb=round(max(payload_sizes) / 1024.0, 1) if payload_sizes else 0.0))
+        finally:
+            remove_latency()
+            os.environ.pop('PUBLISH_MODE', None)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=50)
+    parser.add_argument('--content-size', type=int, default=8000)
+    parser.add_argument('--service-ms', type=float, default=15.0, help='latency added to each AWS call')
+    parser.add_argument('--hop-ms', type=float, default=40.0, help='state transition and invoke cost per hop')
+    parser.add_argument('--cold-ratio', type=float, default=0.1, help='share of task invocations that are cold')
+    parser.add_argument('--cold-start-ms', type=float, default=300.0)
+    args = parser.parse_args()
+
+    rows = run(args.posts, args.content_size, args.service_ms, args.hop_ms, args.cold_ratio, args.cold_start_ms)
+
+    print('{:<14} {:>11} {:>11} {:>9} {:>11} {:>11} {:>12} {:>9}'.format(
+        'mode', 'handler_p50', 'handler_p95', 'overhead', 'e2e_p50_ms', 'e2e_p95_ms', 'invocations', 'state_kb'))
+    for row in rows:
+        print('{mode:<14} {handler_p50_ms:>11} {handler_p95_ms:>11} {overhead_ms:>9} {end_to_end_p50_ms:>11} '
+              '{end_to_end_p95_ms:>11} {invocations:>12} {state_kb:>9}'.format(**row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Compares retrieve_post and list_posts latency and read capacity with and without the warm-container cache.
+
+    python -m benchmarks.bench_read_cache --posts 1000 --requests 2000
+"""
+import os
+import random
+import argparse
+
+from moto import mock_dynamodb
+
+from benchmarks import common
+
+import cache
+
+
+def run(posts, requests, hot_posts):
+    common.aws_env()
+    os.environ['READ_CACHE_VERSION_CHECK'] = 'false'
+
+    import list_posts
+    import retrieve_post
+
+    with mock_dynamodb():
+        table = common.create_posts_table()
+        post_ids = common.seed_posts(table, posts)
+
+        rng = random.Random(11)
+        hot = post_ids[:hot_posts]
+        # Popular posts dominate real traffic, so requests follow a skewed distribution over the hot set
+        weights = [1.0 / (rank + 1) for rank in range(len(hot))]
+        retrieve_events = [{'pathParameters': {'slug': post_id}} for post_id in rng.choices(hot, weights, k=requests)]
+        list_events = [{'queryStringParameters': {'limit': '20'}} for _ in range(requests)]
+
+        results = []
+        for label, read_cache in [('no cache', cache.TTLCache(maxsize=0)),
+                                  ('lru+ttl cache', cache.TTLCache(maxsize=256, ttl=30))]:
+            for name, module, handler, events in [
+                ('retrieve_post', retrieve_post, retrieve_post.retrieve_post_handler, retrieve_events),
+                ('list_posts', list_posts, list_posts.list_posts_handler, list_events),
+            ]:
+                module.read_cache = read_cache
+                read_cache.clear()
+
+                meter = common.ReadMeter()
+                try:
+                    latencies = common.timed(lambda i: handler(events[i], None), requests)
+                finally:
+                    meter.stop()
+
+                results.append(dict(handler=name, mode=label, ddb_calls=meter.calls, est_rcu=meter.rcu,
+                                    **common.summarize(latencies), **read_cache.stats()))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--hot-posts', type=int, default=20)
+    args = parser.parse_args()
+
+    print('{:<14} {:<14} {:>9} {:>9} {:>9} {:>9} {:>9} {:>7} {:>7}'.format(
+        'handler', 'mode', 'mean_ms', 'p50_ms', 'p95_ms', 'ddb_calls', 'est_rcu', 'hits', 'misses'))
+    for row in run(args.posts, args.requests, args.hot_posts):
+        print('{handler:<14} {mode:<14} {mean_ms:>9} {p50_ms:>9} {p95_ms:>9} {ddb_calls:>9} {est_rcu:>9} '
+              '{hits:>7} {misses:>7}'.format(**row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Compares sanitize_markdown's render cost with fresh Markdown and Cleaner instances per call (the previous
+behaviour), with the per-container instances, and with the content-hash render cache serving repeats.
+
+    python -m benchmarks.bench_rendering --documents 200 --content-size 8000 --repeat-ratio 0.3
+"""
+import random
+import argparse
+
+from functools import partial
+
+from benchmarks import common
+
+import cache
+import rendering
+
+
+def fresh_render(markdown_content):
+    import markdown
+    from bleach.sanitizer import Cleaner
+    from bleach.linkifier import LinkifyFilter
+
+    cleaner = Cleaner(tags=rendering.ALLOWED_TAGS, attributes=rendering.ALLOWED_ATTRIBUTES, strip=True,
+                      filters=[partial(LinkifyFilter, skip_tags=['pre', 'code'])])
+
+    return cleaner.clean(markdown.markdown(markdown_content))
+
+
+def reused_render(markdown_content):
+    return rendering.sanitize(rendering.to_html(markdown_content))
+
+
+def run(documents, content_size, repeat_ratio):
+    rng = random.Random(5)
+    unique = [common.synthetic_markdown(rng, content_size) for _ in range(documents)]
+    # Re-submits and retried executions send content that was rendered before
+    contents = [rng.choice(unique[:i]) if i and rng.random() < repeat_ratio else unique[i] for i in range(documents)]
+
+    results = []
+    for mode, render, render_cache in [('fresh instances', fresh_render, None),
+                                       ('reused instances', reused_render, None),
+                                       ('render cache', rendering.render, cache.TTLCache(maxsize=256, ttl=3600))]:
+        if render_cache is not None:
+            rendering.render_cache = render_cache
+
+        render(unique[0])
+        latencies = common.timed(lambda i: render(contents[i]), documents)
+        stats = render_cache.stats() if render_cache else {'hits': '-', 'misses': '-'}
+        results.append(dict(mode=mode, total_ms=round(sum(latencies), 1), hits=stats['hits'],
+                            misses=stats['misses'], **common.summarize(latencies)))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--documents', type=int, default=200)
+    parser.add_argument('--content-size', type=int, default=8000)
+    parser.add_argument('--repeat-ratio', type=float, default=0.3)
+    args = parser.parse_args()
+
+    print('{:<18} {:>9} {:>9} {:>9} {:>10} {:>6} {:>7}'.format(
+        'mode', 'mean_ms', 'p50_ms', 'p95_ms', 'total_ms', 'hits', 'misses'))
+    for row in run(args.documents, args.content_size, args.repeat_ratio):
+        print('{mode:<18} {mean_ms:>9} {p50_ms:>9} {p95_ms:>9} {total_ms:>10} {hits:>6} {misses:>7}'.format(**row))
+
+
+if __name__ == '__main__':
+    main()
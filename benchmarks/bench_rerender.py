@@ -0,0 +1,112 @@
+"""
+Measures bulk re-render throughput in posts per second: a serial scan, render and put loop against the
+bulk_rerender job with more upload threads and render processes.
+
+    python -m benchmarks.bench_rerender --posts 500 --content-size 4000 --service-ms 15 --render-workers 4
+
+Runs against moto. --service-ms adds a fixed latency to every AWS call, see bench_publish, so the S3 puts cost
+what they would against the service. moto ignores Segment and hands every segment the whole table, so the job
+runs with one scan segment here; render processes only scale with the cores of the machine.
+"""
+import os
+import time
+import argparse
+
+import boto3
+
+from moto import mock_dynamodb, mock_s3
+
+from benchmarks import common
+from benchmarks import suite
+from benchmarks.bench_publish import add_service_latency
+
+import bulk_rerender
+import clients
+import content_store
+import publishing
+import scan
+
+
+def serial_rerender(table_name, bucket_name, page_size):
+    """
+    The loop the job replaces: one page, one post, one put at a time
+    """
+    dynamodb = clients.get_client('dynamodb')
+    params = {'TableName': table_name, 'Limit': page_size, 'ProjectionExpression': bulk_rerender.PROJECTION}
+    rendered = 0
+    started_at = time.perf_counter()
+
+    while True:
+        page = dynamodb.scan(**params)
+        for item in page['Items']:
+            if 'Content' not in item and 'ContentRef' not in item:
+                continue
+            item = content_store.load(scan.deserialize(item))
+            html, _ = bulk_rerender.render_html(item['Content'])
+            base_key = publishing.html_key({'author': item['Author'], 'slug': item['Slug']})
+            key = publishing.put_html(bucket_name, base_key, html)
+            publishing.point_at(table_name, item, publishing.html_url(bucket_name, key))
+            rendered += 1
+
+        if 'LastEvaluatedKey' not in page:
+            break
+        params['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+    elapsed = time.perf_counter() - started_at
+    return dict(rendered=rendered, seconds=round(elapsed, 2), posts_per_second=round(rendered / elapsed, 1))
+
+
+def run(posts, content_size, service_ms, page_size, render_workers, upload_workers):
+    common.aws_env()
+    os.environ['METRICS_ENABLED'] = 'false'
+
+    def serial():
+        return dict(mode='serial loop', render_workers=1, upload_workers=1,
+                    **serial_rerender(common.TABLE_NAME, suite.BUCKET_NAME, page_size))
+
+    def job(renderers, uploaders):
+        report = bulk_rerender.Job(common.TABLE_NAME, suite.BUCKET_NAME, segments=1, page_size=page_size,
+                                   render_workers=renderers, upload_workers=uploaders).run()
+        assert report['failed'] == 0, report['failures']
+        assert report['uploaded'] == posts, report
+
+        return dict(mode='bulk_rerender', render_workers=renderers, upload_workers=uploaders,
+                    rendered=report['rendered'], seconds=report['seconds'], posts_per_second=report['posts_per_second'])
+
+    results = []
+    for measure in [serial, lambda: job(1, 1), lambda: job(1, upload_workers),
+                    lambda: job(render_workers, upload_workers)]:
+        # A fresh table every run, posts whose stored HTML is current are skipped
+        with mock_dynamodb(), mock_s3():
+            common.seed_posts(common.create_posts_table(), posts, content_size)
+            boto3.client('s3').create_bucket(Bucket=suite.BUCKET_NAME)
+            remove_latency = add_service_latency(service_ms)
+
+            try:
+                results.append(measure())
+            finally:
+                remove_latency()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--content-size', type=int, default=4000)
+    parser.add_argument('--service-ms', type=float, default=15.0, help='latency added to each AWS call')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--render-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--upload-workers', type=int, default=16)
+    args = parser.parse_args()
+
+    print('{:<14} {:>15} {:>15} {:>9} {:>9} {:>10}'.format(
+        'mode', 'render_workers', 'upload_workers', 'rendered', 'seconds', 'posts/s'))
+    for row in run(args.posts, args.content_size, args.service_ms, args.page_size, args.render_workers,
+                   args.upload_workers):
+        print('{mode:<14} {render_workers:>15} {upload_workers:>15} {rendered:>9} {seconds:>9} '
+              '{posts_per_second:>10}'.format(**row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Compares serializing 1k item pages of DynamoDB items (Decimal numbers, string sets) with the stdlib encoder,
+with a convert-then-dump pass that copies the page into plain types first, and with serialization.dumps on
+both of its backends.
+
+    python -m benchmarks.bench_serialization --items 1000 --pages 50
+"""
+import os
+import json
+import random
+import argparse
+import tracemalloc
+
+from decimal import Decimal
+
+from benchmarks import common
+
+import serialization
+
+
+def synthetic_page(items, content_size, seed=5):
+    rng = random.Random(seed)
+
+    return {
+        'items': [{
+            'PostID': '{:032x}'.format(rng.getrandbits(128)),
+            'Author': 'bench_user',
+            'Title': 'Benchmark post {}'.format(i),
+            'Slug': 'benchmark-post-{}'.format(i),
+            'Description': 'Synthetic post number {}'.format(i),
+            'Content': common.synthetic_markdown(rng, content_size),
+            'Tags': set(rng.sample(common.WORDS[:12], 3)),
+            'Views': Decimal(rng.randint(0, 100000)),
+            'ReadingTime': Decimal(rng.randint(10, 300)) / Decimal(10),
+            'DateCreated': '2023-0{}-1{}T10:00:00'.format(rng.randint(1, 9), rng.randint(0, 9)),
+        } for i in range(items)],
+        'next_cursor': None
+    }
+
+
+def to_plain(value):
+    """
+    The usual workaround, rebuilding the page with Decimals and sets replaced before json.dumps
+    """
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, (list, set)):
+        return [to_plain(item) for item in value]
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def with_backend(name):
+    def dumps(page):
+        os.environ['SERIALIZER'] = name
+        return serialization.dumps(page)
+
+    return dumps
+
+
+ENCODERS = [
+    ('json.dumps(default=str)', lambda page: json.dumps(page, default=str)),
+    ('convert + json.dumps', lambda page: json.dumps(to_plain(page))),
+    ('serialization (json)', with_backend('json')),
+    ('serialization (orjson)', with_backend('orjson')),
+]
+
+
+def run(items, pages, content_size):
+    page = synthetic_page(items, content_size)
+    size = len(serialization.dumps(page).encode('utf-8'))
+
+    results = []
+    for name, encode in ENCODERS:
+        if name.endswith('(orjson)') and serialization.orjson is None:
+            continue
+
+        encode(page)
+        latencies = common.timed(lambda i: encode(page), pages)
+
+        tracemalloc.start()
+        encode(page)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        mean = sum(latencies) / len(latencies)
+        results.append(dict(encoder=name, pages_per_s=round(1000.0 / mean, 1), mb_per_s=round(size / 1024.0 / 1024 /
+                            (mean / 1000.0), 1), peak_kb=round(peak / 1024.0, 1), **common.summarize(latencies)))
+
+    os.environ.pop('SERIALIZER', None)
+
+    return size, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--content-size', type=int, default=2000)
+    args = parser.parse_args()
+
+    size, results = run(args.items, args.pages, args.content_size)
+
+    print('{} items, {:.1f} KB per page'.format(args.items, size / 1024.0))
+    print('{:<24} {:>9} {:>9} {:>9} {:>10} {:>9}'.format('encoder', 'p50_ms', 'p95_ms', 'pages/s', 'MB/s', 'peak_kb'))
+    for row in results:
+        print('{encoder:<24} {p50_ms:>9} {p95_ms:>9} {pages_per_s:>9} {mb_per_s:>10} {peak_kb:>9}'.format(**row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""
+Shared helpers for the benchmarks: moto environment, table seeding and timing
+"""
+import os
+import json
+import math
+import time
+import random
+
+import boto3
+
+import clients
+import feed
+import slugs
+
+TABLE_NAME = 'BENCH_POSTS_TABLE'
+
+WORDS = ['lambda', 'dynamodb', 'serverless', 'python', 'cache', 'latency', 'markdown', 'api', 'gateway', 'index',
+         'query', 'scan', 'bucket', 'request', 'response', 'function', 'deploy', 'stack', 'table', 'capacity',
+         'the', 'a', 'of', 'and', 'to', 'in', 'is', 'we', 'this', 'with', 'for', 'on', 'that', 'it', 'when']
+
+CODE_LINES = ['def handler(event, context):', '    table = dynamodb.Table(os.getenv("POSTS_TABLE"))',
+              '    items = table.query(KeyConditionExpression=Key("PostID").eq(post_id))',
+              '    return {"statusCode": 200, "body": json.dumps(items)}', 'aws s3 cp index.html s3://bucket/',
+              'sam build --use-container && sam deploy']
+
+
+def aws_env():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    os.environ['POSTS_TABLE'] = TABLE_NAME
+
+
+def create_posts_table():
+    dynamodb = boto3.resource('dynamodb')
+    dynamodb.create_table(
+        TableName=TABLE_NAME,
+        AttributeDefinitions=[
+            {'AttributeName': 'PostID', 'AttributeType': 'S'},
+            {'AttributeName': 'Author', 'AttributeType': 'S'},
+            {'AttributeName': 'DateBucket', 'AttributeType': 'S'},
+            {'AttributeName': 'DateCreated', 'AttributeType': 'S'},
+            {'AttributeName': 'Slug', 'AttributeType': 'S'},
+        ],
+        KeySchema=[
+            {'AttributeName': 'PostID', 'KeyType': 'HASH'},
+            {'AttributeName': 'Author', 'KeyType': 'RANGE'},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': feed.INDEX_NAME,
+                'KeySchema': [
+                    {'AttributeName': 'DateBucket', 'KeyType': 'HASH'},
+                    {'AttributeName': 'DateCreated', 'KeyType': 'RANGE'},
+                ],
+                'Projection': {'ProjectionType': 'INCLUDE',
+                               'NonKeyAttributes': ['Title', 'Slug', 'Description', 'Tags', 'HtmlURL']},
+            },
+            {
+                'IndexName': slugs.INDEX_NAME,
+                'KeySchema': [{'AttributeName': 'Slug', 'KeyType': 'HASH'}],
+                'Projection': {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': ['DateCreated']},
+            }
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    return dynamodb.Table(TABLE_NAME)
+
+
+def synthetic_markdown(rng, size):
+    """
+    Generates a blog post of roughly size characters with headings, paragraphs, lists, links and code blocks
+    """
+    blocks = []
+    total = 0
+
+    while total < size:
+        kind = rng.random()
+        if kind < 0.1:
+            block = '## ' + ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))).capitalize()
+        elif kind < 0.2:
+            block = '\n'.join('- ' + ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 9)))
+                              for _ in range(rng.randint(2, 5)))
+        elif kind < 0.3:
+            block = '```python\n' + '\n'.join(rng.choice(CODE_LINES) for _ in range(rng.randint(2, 6))) + '\n```'
+        else:
+            sentences = []
+            for _ in range(rng.randint(2, 6)):
+                sentence = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))).capitalize()
+                if rng.random() < 0.2:
+                    sentence += ' [see the docs](https://example.com/{})'.format(rng.choice(WORDS))
+                sentences.append(sentence + '.')
+            block = ' '.join(sentences)
+
+        blocks.append(block)
+        total += len(block) + 2
+
+    return '\n\n'.join(blocks)[:size]
+
+
+def seed_posts(table, count, content_size=4000, seed=7, author='bench_user'):
+    """
+    Writes count synthetic posts spread over the last twelve months and returns their PostIDs, content_size
+    may be a list of sizes the posts cycle through
+    """
+    rng = random.Random(seed)
+    content_sizes = content_size if isinstance(content_size, (list, tuple)) else [content_size]
+
+    month = feed.current_month()
+    months = [month]
+    for _ in range(11):
+        months.append(feed.previous_month(months[-1]))
+
+    post_ids = []
+    with table.batch_writer() as batch:
+        for i in range(count):
+            post_id = '{:032x}'.format(rng.getrandbits(128))
+            date_created = '{}-{:02d}T{:02d}:{:02d}:{:02d}'.format(months[i % 12], rng.randint(1, 28),
+                                                                 rng.randint(0, 23), rng.randint(0, 59), i % 60)
+            batch.put_item(Item={
+                'PostID': post_id,
+                'Author': author,
+                'Title': 'Benchmark post {}'.format(i),
+                'Slug': 'benchmark-post-{}'.format(i),
+                'Description': 'Synthetic post number {}'.format(i),
+                'Content': synthetic_markdown(rng, content_sizes[i % len(content_sizes)]),
+                'Tags': rng.sample(WORDS[:12], 3),
+                'DateCreated': date_created,
+                'DateUpdated': date_created,
+                'DateBucket': feed.date_bucket(date_created, post_id),
+                'HtmlURL': 'https://bench.s3.amazonaws.com/{}/benchmark-post-{}.html'.format(author, i),
+            })
+            post_ids.append(post_id)
+
+    return post_ids
+
+
+class ReadMeter:
+    """
+    Counts DynamoDB read calls made through the default boto3 session and estimates their RCUs
+    (0.5 per 4 KB read for eventually consistent reads, rounded up per call). Clients copy the session's
+    hooks when created, so the shared clients are dropped to be rebuilt with the meter attached.
+    """
+
+    OPERATIONS = ('Query', 'Scan', 'GetItem', 'BatchGetItem')
+
+    def __init__(self):
+        self.calls = 0
+        self.rcu = 0.0
+        self.session = boto3._get_default_session()
+        for operation in self.OPERATIONS:
+            self.session.events.register('after-call.dynamodb.' + operation, self.record)
+        clients.reset()
+
+    def record(self, parsed, **kwargs):
+        self.calls += 1
+        items = parsed.get('Items') or ([parsed['Item']] if 'Item' in parsed else [])
+        size = sum(len(json.dumps(item)) for item in items)
+        self.rcu += max(1, math.ceil(size / 4096)) * 0.5
+
+    def stop(self):
+        for operation in self.OPERATIONS:
+            self.session.events.unregister('after-call.dynamodb.' + operation, self.record)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(math.ceil(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def timed(fn, iterations):
+    """
+    Calls fn(i) iterations times and returns the latency of each call in milliseconds
+    """
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(latencies):
+    return {
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+    }
@@ -0,0 +1,224 @@
+"""
+In-process emulator of the REST API: maps the Api events of template.yaml onto the handler functions and runs
+the TokenAuthorizer step in front of the routes that use it, without Docker or sam local.
+
+    api = emulator.LocalApi.from_template()
+    response = api.invoke('GET', '/posts/my-first-post')
+    response = api.invoke('PUT', '/posts/my-first-post', headers={'Authorization': 'token'}, body='{...}')
+
+The handlers share the process, so environment variables are process wide: environment() returns the
+Globals of the template and callers point the resource variables (POSTS_TABLE, ...) at their stand-ins.
+"""
+import os
+import re
+import uuid
+import json
+import importlib
+import threading
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE = os.path.join(ROOT, 'template.yaml')
+
+REGION = 'us-east-1'
+ACCOUNT_ID = '123456789012'
+API_ID = 'local'
+STAGE = 'dev'
+
+PATH_PARAMETER = re.compile(r'{(\w+)\+?}')
+
+
+class Tag:
+    """
+    An unresolved CloudFormation intrinsic such as !Ref or !GetAtt
+    """
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def __repr__(self):
+        return '{} {!r}'.format(self.name, self.value)
+
+
+class TemplateLoader(yaml.SafeLoader):
+    pass
+
+
+def construct_tag(loader, suffix, node):
+    if isinstance(node, yaml.ScalarNode):
+        value = loader.construct_scalar(node)
+    elif isinstance(node, yaml.SequenceNode):
+        value = loader.construct_sequence(node, deep=True)
+    else:
+        value = loader.construct_mapping(node, deep=True)
+
+    return Tag('!' + suffix, value)
+
+
+TemplateLoader.add_multi_constructor('!', construct_tag)
+
+
+def load_template(path=TEMPLATE):
+    with open(path) as template_file:
+        return yaml.load(template_file, Loader=TemplateLoader)
+
+
+class Route:
+    def __init__(self, method, path, function, handler, authorizer):
+        self.method = method.upper()
+        self.path = path
+        self.function = function
+        self.handler = handler
+        self.authorizer = authorizer
+        self.pattern = re.compile('^' + PATH_PARAMETER.sub(r'(?P<\1>[^/]+)', path) + '$')
+        self.parameters = PATH_PARAMETER.findall(path)
+
+    def match(self, method, path):
+        if method.upper() != self.method and self.method != 'ANY':
+            return None
+
+        match = self.pattern.match(path)
+        return match.groupdict() if match else None
+
+
+class LambdaContext:
+    def __init__(self, function_name):
+        self.function_name = function_name
+        self.aws_request_id = str(uuid.uuid4())
+        self.memory_limit_in_mb = 128
+        self.invoked_function_arn = 'arn:aws:lambda:{}:{}:function:{}'.format(REGION, ACCOUNT_ID, function_name)
+
+
+def api_response(status, message):
+    return {'statusCode': status, 'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'message': message})}
+
+
+class LocalApi:
+    """
+    Routes API Gateway proxy requests to the handlers, static paths win over templated ones like API Gateway
+    """
+
+    def __init__(self, routes, authorizers, environment):
+        # /posts/search must win over /posts/{slug}
+        self.routes = sorted(routes, key=lambda route: (len(route.parameters), -len(route.path)))
+        self.authorizers = authorizers
+        self.globals = environment
+        self.handlers = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_template(cls, path=TEMPLATE):
+        template = load_template(path)
+        resources = template.get('Resources', {})
+
+        globals_environment = (template.get('Globals', {}).get('Function', {}).get('Environment', {})
+                               .get('Variables', {}))
+        environment = {name: value for name, value in globals_environment.items() if isinstance(value, str)}
+
+        authorizers = {}
+        default_authorizer = None
+        for resource in resources.values():
+            if resource.get('Type') != 'AWS::Serverless::Api':
+                continue
+
+            auth = resource.get('Properties', {}).get('Auth', {})
+            default_authorizer = auth.get('DefaultAuthorizer')
+            for name, authorizer in auth.get('Authorizers', {}).items():
+                function_arn = authorizer.get('FunctionArn')
+                # FunctionArn: !GetAtt TokenAuthorizerFunction.Arn
+                logical_id = function_arn.value.split('.')[0] if isinstance(function_arn, Tag) else function_arn
+                authorizers[name] = (logical_id, resources[logical_id]['Properties']['Handler'])
+
+        routes = []
+        for logical_id, resource in resources.items():
+            if resource.get('Type') != 'AWS::Serverless::Function':
+                continue
+
+            properties = resource.get('Properties', {})
+            for event in (properties.get('Events') or {}).values():
+                if event.get('Type') != 'Api':
+                    continue
+
+                event_properties = event.get('Properties', {})
+                authorizer = event_properties.get('Auth', {}).get('Authorizer', default_authorizer)
+                routes.append(Route(event_properties['Method'], event_properties['Path'], logical_id,
+                                    properties['Handler'], None if authorizer == 'NONE' else authorizer))
+
+        return cls(routes, authorizers, environment)
+
+    def environment(self):
+        return dict(self.globals)
+
+    def handler(self, handler):
+        """
+        Imports module.function on first use, the way a cold start would
+        """
+        function = self.handlers.get(handler)
+        if function is None:
+            with self.lock:
+                module_name, function_name = handler.rsplit('.', 1)
+                function = getattr(importlib.import_module(module_name), function_name)
+                self.handlers[handler] = function
+
+        return function
+
+    def route(self, method, path):
+        for route in self.routes:
+            parameters = route.match(method, path)
+            if parameters is not None:
+                return route, parameters
+
+        return None, None
+
+    def authorize(self, route, method, path, headers):
+        """
+        Runs the TOKEN authorizer and returns the requestContext authorizer, or an error response
+        """
+        logical_id, handler = self.authorizers[route.authorizer]
+        token = next((value for name, value in headers.items() if name.lower() == 'authorization'), None)
+        if not token:
+            return None, api_response(401, 'Unauthorized')
+
+        method_arn = 'arn:aws:execute-api:{}:{}:{}/{}/{}{}'.format(REGION, ACCOUNT_ID, API_ID, STAGE, method, path)
+        policy = self.handler(handler)({'type': 'TOKEN', 'authorizationToken': token, 'methodArn': method_arn},
+                                       LambdaContext(logical_id))
+
+        statements = policy.get('policyDocument', {}).get('Statement', [])
+        if not any(statement.get('Effect') == 'Allow' for statement in statements) or \
+                any(statement.get('Effect') == 'Deny' for statement in statements):
+            return None, api_response(403, 'User is not authorized to access this resource with an explicit deny')
+
+        return dict(policy.get('context') or {}, principalId=policy['principalId']), None
+
+    def invoke(self, method, path, headers=None, query=None, body=None, is_base64_encoded=False):
+        method = method.upper()
+        headers = dict(headers or {})
+
+        route, parameters = self.route(method, path)
+        if route is None:
+            return api_response(403, 'Missing Authentication Token')
+
+        request_context = {'resourcePath': route.path, 'httpMethod': method, 'stage': STAGE,
+                           'requestId': str(uuid.uuid4())}
+        if route.authorizer:
+            authorizer, error = self.authorize(route, method, path, headers)
+            if error:
+                return error
+            request_context['authorizer'] = authorizer
+
+        event = {
+            'resource': route.path,
+            'path': path,
+            'httpMethod': method,
+            'headers': headers,
+            'queryStringParameters': query or None,
+            'pathParameters': parameters or None,
+            'requestContext': request_context,
+            'body': body,
+            'isBase64Encoded': is_base64_encoded
+        }
+
+        return self.handler(route.handler)(event, LambdaContext(route.function))
@@ -0,0 +1,109 @@
+"""
+Profiles the cold start import cost of every handler module with `python -X importtime` and fails when one
+exceeds its budget in benchmarks/import_budgets.json.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --update      # rewrite the budgets from this machine's timings
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CODE_ROOT = os.path.join(ROOT, 'blog_api')
+BUDGETS_FILE = os.path.join(ROOT, 'benchmarks', 'import_budgets.json')
+
+HANDLERS = ['token_authorizer', 'retrieve_post', 'batch_get_posts', 'list_posts', 'search_posts', 'update_post',
+            'delete_post', 'upload_image', 'validate_post', 'sanitize_markdown', 'markdown_to_html',
+            'post_creation_topic', 'rerender_post']
+
+
+def parse_importtime(output):
+    """
+    Parses -X importtime output into (module, depth, self_us, cumulative_us) rows, in import order
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+
+    return rows
+
+
+def profile(module):
+    """
+    Imports a handler in a fresh interpreter, returning its cumulative import time in ms and its heaviest
+    direct imports
+    """
+    env = dict(os.environ, PYTHONPATH=CODE_ROOT, AWS_DEFAULT_REGION=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+                            cwd=CODE_ROOT, env=env, capture_output=True, text=True, check=True)
+
+    rows = parse_importtime(result.stderr)
+    total = next(cumulative for name, depth, _, cumulative in rows if name == module and depth == 0)
+
+    # Direct imports of the handler are the depth 1 rows listed before it, children print before parents
+    index = max(i for i, row in enumerate(rows) if row[0] == module and row[1] == 0)
+    children = []
+    for name, depth, _, cumulative in reversed(rows[:index]):
+        if depth == 0:
+            break
+        if depth == 1:
+            children.append((cumulative / 1000.0, name))
+
+    return total / 1000.0, sorted(children, reverse=True)[:3]
+
+
+def measure(runs):
+    """
+    Takes the fastest of several runs per handler, the minimum is the least noisy estimate
+    """
+    results = {}
+    for module in HANDLERS:
+        samples = [profile(module) for _ in range(runs)]
+        results[module] = min(samples, key=lambda sample: sample[0])
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--update', action='store_true', help='write budgets of measured time times --headroom')
+    parser.add_argument('--headroom', type=float, default=1.5)
+    args = parser.parse_args()
+
+    results = measure(args.runs)
+
+    if args.update:
+        budgets = {module: round(total * args.headroom, 1) for module, (total, _) in results.items()}
+        with open(BUDGETS_FILE, 'w') as budgets_file:
+            json.dump(budgets, budgets_file, indent=2, sort_keys=True)
+            budgets_file.write('\n')
+    else:
+        with open(BUDGETS_FILE) as budgets_file:
+            budgets = json.load(budgets_file)
+
+    failures = []
+    print('{:<20} {:>10} {:>10}  {}'.format('handler', 'import_ms', 'budget_ms', 'heaviest imports'))
+    for module, (total, children) in results.items():
+        budget = budgets.get(module)
+        heaviest = ', '.join('{} {:.1f}'.format(name, ms) for ms, name in children)
+        print('{:<20} {:>10.1f} {:>10}  {}'.format(module, total, budget if budget is not None else '-', heaviest))
+
+        if budget is not None and total > budget:
+            failures.append(module)
+
+    if failures:
+        print('Import budget exceeded: {}'.format(', '.join(failures)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Replays mixed read/write traffic from a thread pool against the in-process API emulator with moto stand-ins for
+DynamoDB, S3 and Step Functions, and reports how throughput and per-route latency scale with concurrency.
+
+    python -m benchmarks.load_test --posts 1000 --concurrency 1,4,16 --requests 500
+    python -m benchmarks.load_test --mix retrieve=80,list=20 --concurrency 1,8,32
+
+Every request goes through routing and, for the authenticated routes, the TokenAuthorizer. Throughput that
+stops growing with concurrency, or a route whose p95 grows much faster than the others, points at contention
+in the shared code paths (client pools, caches, locks) rather than in a single handler.
+"""
+import os
+import json
+import time
+import random
+import argparse
+import threading
+import collections
+
+from concurrent.futures import ThreadPoolExecutor
+
+from moto import mock_dynamodb, mock_s3, mock_stepfunctions
+
+from benchmarks import common
+from benchmarks import emulator
+from benchmarks import suite
+
+import clients
+import slugs
+
+AUTHOR = 'user'
+TOKEN = {'Authorization': 'token'}
+
+DEFAULT_MIX = 'retrieve=40,list=20,search=10,tag=5,batch_get=5,create=8,update=8,delete=2,upload=2'
+
+
+class Traffic:
+    """
+    Builds the requests of each operation, shared by the worker threads
+    """
+
+    def __init__(self, post_ids, image):
+        self.post_ids = post_ids
+        # Hot posts are read and edited, deletes take posts from the tail so reads keep finding theirs
+        self.hot = post_ids[:max(1, min(len(post_ids) // 2, 200))]
+        self.weights = [1.0 / (rank + 1) for rank in range(len(self.hot))]
+        self.doomed = collections.deque(post_ids[len(self.hot):])
+        self.upload_headers, self.upload_body = suite.multipart_body(image)
+
+    def request(self, operation, rng):
+        if operation == 'retrieve':
+            return 'GET', '/posts/' + rng.choices(self.hot, self.weights)[0], {}, None, None
+        if operation == 'list':
+            return 'GET', '/posts', {}, {'limit': str(rng.choice([10, 20, 50]))}, None
+        if operation == 'tag':
+            return 'GET', '/posts', {}, {'tag': rng.choice(common.WORDS[:12]), 'limit': '20'}, None
+        if operation == 'search':
+            return 'GET', '/posts/search', {}, {'q': ' '.join(rng.sample(common.WORDS[:20], 2))}, None
+        if operation == 'batch_get':
+            return 'POST', '/posts/batch-get', {}, None, json.dumps({'ids': rng.sample(self.post_ids, 25)})
+        if operation == 'create':
+            return 'POST', '/posts', TOKEN, None, json.dumps({
+                'title': 'Load post {}'.format(rng.getrandbits(32)), 'content': common.synthetic_markdown(rng, 2000),
+                'tags': rng.sample(common.WORDS[:12], 2)})
+        if operation == 'update':
+            return 'PUT', '/posts/' + rng.choice(self.hot), TOKEN, None, json.dumps(
+                {'description': 'Edited {}'.format(rng.getrandbits(32))})
+        if operation == 'delete':
+            try:
+                return 'DELETE', '/posts/' + self.doomed.pop(), TOKEN, None, None
+            except IndexError:
+                return self.request('retrieve', rng)
+        if operation == 'upload':
+            return 'POST', '/posts/images', dict(TOKEN, **{'Content-Type': self.upload_headers}), None, \
+                self.upload_body
+
+        raise ValueError('Unknown operation {}'.format(operation))
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        operation, weight = part.split('=')
+        mix[operation.strip()] = float(weight)
+
+    return mix
+
+
+def run_level(api, traffic, mix, concurrency, requests, seed):
+    """
+    Sends requests from concurrency threads and returns the wall time and (operation, ms, status) samples
+    """
+    rng = random.Random(seed)
+    operations = rng.choices(list(mix), list(mix.values()), k=requests)
+    samples = []
+    local = threading.local()
+
+    def send(index):
+        if not hasattr(local, 'rng'):
+            local.rng = random.Random('{}-{}'.format(seed, threading.get_ident()))
+
+        operation = operations[index]
+        method, path, headers, query, body = traffic.request(operation, local.rng)
+
+        start = time.perf_counter()
+        response = api.invoke(method, path, headers=headers, query=query, body=body,
+                              is_base64_encoded=operation == 'upload')
+        samples.append((operation, (time.perf_counter() - start) * 1000, response.get('statusCode', 200)))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, range(requests)))
+
+    return time.perf_counter() - started, samples
+
+
+def summarize_level(concurrency, elapsed, samples):
+    statuses = collections.Counter('{}xx'.format(status // 100) for _, _, status in samples)
+    by_operation = collections.defaultdict(list)
+    for operation, latency, _ in samples:
+        by_operation[operation].append(latency)
+
+    return dict(concurrency=concurrency, requests=len(samples), throughput_rps=round(len(samples) / elapsed, 1),
+                statuses=dict(statuses), **common.summarize([latency for _, latency, _ in samples]),
+                operations={operation: common.summarize(latencies) for operation, latencies in by_operation.items()})
+
+
+def run(posts, content_sizes, indexed, levels, requests, mix):
+    api = emulator.LocalApi.from_template()
+
+    common.aws_env()
+    os.environ.update(api.environment())
+    os.environ.update({
+        'POSTS_TABLE': common.TABLE_NAME,
+        'POSTS_BUCKET': suite.BUCKET_NAME,
+        'TAGS_TABLE': suite.TAGS_TABLE_NAME,
+        'SEARCH_TABLE': suite.SEARCH_TABLE_NAME,
+        'METRICS_ENABLED': 'false',
+        'LOG_LEVEL': os.getenv('BENCH_LOG_LEVEL', 'WARNING'),
+        'LOG_DEBUG_SAMPLE_RATE': '0',
+        'READ_CACHE_VERSION_CHECK': 'false',
+    })
+
+    results = []
+    with mock_dynamodb(), mock_s3(), mock_stepfunctions():
+        clients.reset()
+        slugs.slug_cache.clear()
+
+        post_ids = suite.seed(posts, content_sizes, min(indexed, posts), author=AUTHOR)
+        suite.create_state_machine()
+        traffic = Traffic(post_ids, suite.jpeg_bytes(random.Random(1)))
+
+        # One warm pass so the first level doesn't pay the imports and client creation
+        run_level(api, traffic, mix, 1, len(mix) * 2, seed=0)
+
+        for concurrency in levels:
+            elapsed, samples = run_level(api, traffic, mix, concurrency, requests, seed=concurrency)
+            results.append(summarize_level(concurrency, elapsed, samples))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--content-sizes', default='500,4000,20000')
+    parser.add_argument('--indexed', type=int, default=200, help='posts added to the tag and search indexes')
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--requests', type=int, default=400, help='requests per concurrency level')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='operation=weight pairs')
+    parser.add_argument('--save', help='write the results as JSON')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    mix = parse_mix(args.mix)
+    results = run(args.posts, [int(size) for size in args.content_sizes.split(',')], args.indexed, levels,
+                  args.requests, mix)
+
+    base = results[0]['throughput_rps'] / results[0]['concurrency']
+    print('{:>11} {:>9} {:>10} {:>9} {:>9} {:>9} {:>10}  {}'.format(
+        'concurrency', 'req/s', 'efficiency', 'p50_ms', 'p95_ms', 'p99_ms', 'errors', 'statuses'))
+    for row in results:
+        efficiency = row['throughput_rps'] / (base * row['concurrency'])
+        errors = row['statuses'].get('5xx', 0)
+        print('{:>11} {:>9} {:>10.0%} {:>9} {:>9} {:>9} {:>10}  {}'.format(
+            row['concurrency'], row['throughput_rps'], efficiency, row['p50_ms'], row['p95_ms'], row['p99_ms'],
+            errors, ' '.join('{}={}'.format(k, v) for k, v in sorted(row['statuses'].items()))))
+
+    print()
+    print('p95_ms by operation')
+    print('{:<10}'.format('operation') + ''.join('{:>10}'.format('c=' + str(level)) for level in levels))
+    for operation in mix:
+        print('{:<10}'.format(operation) + ''.join(
+            '{:>10}'.format(row['operations'].get(operation, {}).get('p95_ms', '-')) for row in results))
+
+    if args.save:
+        with open(args.save, 'w') as results_file:
+            json.dump(results, results_file, indent=2, sort_keys=True)
+            results_file.write('\n')
+
+
+if __name__ == '__main__':
+    main()
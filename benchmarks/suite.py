@@ -0,0 +1,418 @@
+"""
+Drives every API handler against moto DynamoDB and S3 seeded with a synthetic post corpus and reports p50/p95/p99
+latency, throughput and peak traced memory per handler. Events are built from the samples in events/*.json.
+
+    python -m benchmarks.suite --corpus medium
+    python -m benchmarks.suite --posts 5000 --content-sizes 500,4000,40000 --handlers list_posts,retrieve_post
+    python -m benchmarks.suite --corpus small --save benchmarks/baselines/small.json
+    python -m benchmarks.suite --corpus small --compare benchmarks/baselines/small.json --tolerance 0.25
+
+--compare exits non-zero when a handler's p95 latency or throughput regressed by more than the tolerance.
+Latency is measured without tracing; peak memory comes from a separate tracemalloc pass of --memory-requests.
+The read, search and render caches are cleared before every request so each one reaches DynamoDB and S3,
+--cached keeps them warm instead and is reported, and compared, as a separate variant.
+"""
+import io
+import os
+import sys
+import copy
+import json
+import time
+import base64
+import random
+import platform
+import argparse
+import datetime
+import tracemalloc
+
+import boto3
+
+from moto import mock_dynamodb, mock_s3, mock_stepfunctions
+
+from benchmarks import common
+
+import clients
+import search_index
+import slugs
+import tags
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVENTS_DIR = os.path.join(ROOT, 'events')
+
+BUCKET_NAME = 'bench-posts-bucket'
+TAGS_TABLE_NAME = 'BENCH_TAGS_TABLE'
+SEARCH_TABLE_NAME = 'BENCH_SEARCH_TABLE'
+AUTHOR = 'bench_user'
+
+# (posts, content sizes the posts cycle through)
+CORPORA = {
+    'small': (100, [2000]),
+    'medium': (1000, [500, 4000, 20000]),
+    'large': (10000, [500, 4000, 20000]),
+    'xlarge': (50000, [500, 4000, 20000, 100000]),
+}
+
+HANDLERS = ['token_authorizer', 'list_posts', 'list_posts_by_tag', 'retrieve_post', 'batch_get_posts',
+            'search_posts', 'validate_post', 'sanitize_markdown', 'markdown_to_html', 'upload_image', 'update_post',
+            'delete_post']
+
+COMPARED_METRICS = ('p95_ms', 'throughput_rps')
+
+# (module, attribute) of the in-process caches that answer repeated requests without reaching the tables
+RESPONSE_CACHES = [('list_posts', 'read_cache'), ('retrieve_post', 'read_cache'), ('search_posts', 'search_cache'),
+                   ('rendering', 'render_cache')]
+
+
+def load_event(name):
+    with open(os.path.join(EVENTS_DIR, name + '.json')) as event_file:
+        return json.load(event_file)
+
+
+def event_from(sample, **overrides):
+    event = copy.deepcopy(sample)
+    event.update(overrides)
+    return event
+
+
+def create_key_table(dynamodb, table_name, hash_key, range_key):
+    dynamodb.create_table(
+        TableName=table_name,
+        AttributeDefinitions=[
+            {'AttributeName': hash_key, 'AttributeType': 'S'},
+            {'AttributeName': range_key, 'AttributeType': 'S'},
+        ],
+        KeySchema=[
+            {'AttributeName': hash_key, 'KeyType': 'HASH'},
+            {'AttributeName': range_key, 'KeyType': 'RANGE'},
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    return dynamodb.Table(table_name)
+
+
+def seed(posts, content_sizes, indexed, author=AUTHOR):
+    """
+    Seeds the posts table, and the tag index, search index and S3 HTML objects of the first indexed posts.
+    Indexing writes one item per term, so the indexes of the largest corpora are kept to a sample.
+    """
+    dynamodb = boto3.resource('dynamodb')
+    s3 = boto3.client('s3')
+
+    posts_table = common.create_posts_table()
+    tags_table = create_key_table(dynamodb, TAGS_TABLE_NAME, 'Tag', 'TagSort')
+    search_table = create_key_table(dynamodb, SEARCH_TABLE_NAME, 'Term', 'PostID')
+    s3.create_bucket(Bucket=BUCKET_NAME)
+
+    post_ids = common.seed_posts(posts_table, posts, content_sizes, author=author)
+
+    for post_id in post_ids[:indexed]:
+        post = posts_table.get_item(Key={'PostID': post_id, 'Author': author})['Item']
+        tags.sync_post_tags(tags_table, None, post)
+        search_index.index_post(search_table, post)
+        s3.put_object(Bucket=BUCKET_NAME, Key='{}/{}.html'.format(author, post['Slug']),
+                      Body=post['Content'].encode('utf-8'), ContentType='text/html')
+
+    return post_ids
+
+
+def create_state_machine():
+    arn = boto3.client('stepfunctions').create_state_machine(
+        name='BenchPostStateMachine',
+        definition=json.dumps({'StartAt': 'Done', 'States': {'Done': {'Type': 'Pass', 'End': True}}}),
+        roleArn='arn:aws:iam::123456789012:role/bench'
+    )['stateMachineArn']
+    os.environ['STATE_MACHINE'] = arn
+
+
+def jpeg_bytes(rng):
+    from PIL import Image
+
+    image = Image.new('RGB', (320, 240), tuple(rng.randint(0, 255) for _ in range(3)))
+    output = io.BytesIO()
+    image.save(output, format='JPEG')
+    return output.getvalue()
+
+
+def multipart_body(image):
+    """
+    Returns the Content-Type header and base64 body API Gateway passes on for an image upload form
+    """
+    boundary = 'benchboundary'
+    body = (('--{}\r\nContent-Disposition: form-data; name="image"; filename="image.jpg"\r\n'
+             'Content-Type: image/jpeg\r\n\r\n').format(boundary).encode('utf-8') + image +
+            '\r\n--{}--\r\n'.format(boundary).encode('utf-8'))
+
+    return 'multipart/form-data; boundary=' + boundary, base64.b64encode(body).decode('ascii')
+
+
+def multipart_event(sample, image):
+    content_type, body = multipart_body(image)
+
+    return event_from(sample, resource='/posts/images', path='/posts/images', headers={'Content-Type': content_type},
+                      body=body, isBase64Encoded=True, requestContext={'authorizer': {'principalId': AUTHOR}})
+
+
+def build_events(name, post_ids, requests, rng):
+    """
+    Builds the events replayed against one handler, retrieval follows a skewed popularity distribution
+    """
+    hot = post_ids[:max(1, min(len(post_ids) // 2, 200))]
+    weights = [1.0 / (rank + 1) for rank in range(len(hot))]
+    authorizer = {'authorizer': {'principalId': AUTHOR}}
+
+    if name == 'token_authorizer':
+        return [load_event('authorizer_event')] * requests
+
+    if name == 'list_posts':
+        sample = load_event('list_event')
+        return [event_from(sample, queryStringParameters={'limit': str(rng.choice([10, 20, 50]))})
+                for _ in range(requests)]
+
+    if name == 'list_posts_by_tag':
+        sample = load_event('list_event')
+        return [event_from(sample, queryStringParameters={'tag': ','.join(rng.sample(common.WORDS[:12], 2)),
+                                                          'match': rng.choice(['any', 'all']), 'limit': '20'})
+                for _ in range(requests)]
+
+    if name == 'retrieve_post':
+        sample = load_event('retrieve_event')
+        slugs_by_rank = ['benchmark-post-{}'.format(post_ids.index(post_id)) for post_id in hot]
+        return [event_from(sample, pathParameters={'slug': slug})
+                for slug in rng.choices(slugs_by_rank, weights, k=requests)]
+
+    if name == 'batch_get_posts':
+        sample = load_event('batch_get_event')
+        return [event_from(sample, body=json.dumps({'ids': rng.sample(post_ids, min(25, len(post_ids)))}))
+                for _ in range(requests)]
+
+    if name == 'search_posts':
+        sample = load_event('search_event')
+        return [event_from(sample, queryStringParameters={'q': ' '.join(rng.sample(common.WORDS[:20], 2)),
+                                                          'limit': '10'})
+                for _ in range(requests)]
+
+    if name == 'validate_post':
+        sample = load_event('create_event')
+        return [event_from(sample, requestContext=authorizer, body=json.dumps({
+            'title': 'Bench post {}'.format(i), 'description': 'Created by the benchmark',
+            'content': common.synthetic_markdown(rng, 4000), 'tags': rng.sample(common.WORDS[:12], 3)}))
+            for i in range(requests)]
+
+    if name == 'sanitize_markdown':
+        documents = [common.synthetic_markdown(rng, size) for size in (1000, 4000, 20000)]
+        return [{'content': rng.choice(documents)} for _ in range(requests)]
+
+    if name == 'markdown_to_html':
+        now = datetime.datetime.now().isoformat()
+        return [{'post_id': '{:032x}'.format(rng.getrandbits(128)), 'title': 'Rendered {}'.format(i),
+                 'slug': 'rendered-{}'.format(i), 'description': '', 'author': AUTHOR,
+                 'content': common.synthetic_markdown(rng, 4000), 'sanitized_html': '<p>rendered</p>' * 200,
+                 'date_created': now, 'date_updated': now, 'tags': rng.sample(common.WORDS[:12], 3)}
+                for i in range(requests)]
+
+    if name == 'upload_image':
+        sample = load_event('create_event')
+        image = jpeg_bytes(rng)
+        return [multipart_event(sample, image)] * requests
+
+    if name == 'update_post':
+        sample = load_event('update_event')
+        return [event_from(sample, requestContext=authorizer, pathParameters={'slug': rng.choice(hot)},
+                           body=json.dumps({'description': 'Edited {}'.format(i)}))
+                for i in range(requests)]
+
+    if name == 'delete_post':
+        sample = load_event('delete_event')
+        # Every delete removes a distinct post, taken from the end of the corpus to leave the hot posts alone
+        doomed = post_ids[len(hot):][-requests:]
+        return [event_from(sample, requestContext=authorizer, pathParameters={'slug': post_id})
+                for post_id in reversed(doomed)]
+
+    raise ValueError('Unknown handler {}'.format(name))
+
+
+def resolve_handler(name):
+    if name == 'list_posts_by_tag':
+        name = 'list_posts'
+
+    module = __import__(name)
+    return getattr(module, name + '_handler')
+
+
+def failed(response):
+    return isinstance(response, dict) and response.get('statusCode', 200) >= 400
+
+
+def clear_response_caches():
+    for module, name in RESPONSE_CACHES:
+        if module in sys.modules:
+            getattr(sys.modules[module], name).clear()
+
+
+def measure(handler, events, traced_events, cached):
+    errors = 0
+    latencies = []
+
+    elapsed = 0.0
+    for event in events:
+        if not cached:
+            clear_response_caches()
+
+        start = time.perf_counter()
+        response = handler(event, None)
+        latency = time.perf_counter() - start
+        elapsed += latency
+        latencies.append(latency * 1000)
+        errors += failed(response)
+
+    # Peak memory comes from a separate pass, tracemalloc slows allocation heavy handlers too much to time them
+    tracemalloc.start()
+    try:
+        for event in traced_events:
+            if not cached:
+                clear_response_caches()
+            handler(event, None)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return dict(requests=len(events), errors=errors, throughput_rps=round(len(events) / elapsed, 1),
+                peak_kb=round(peak / 1024.0, 1) if traced_events else None,
+                **common.summarize(latencies))
+
+
+def run(posts, content_sizes, requests, handlers, indexed, memory_requests, warmup, cached=False):
+    common.aws_env()
+    os.environ.update({
+        'POSTS_BUCKET': BUCKET_NAME,
+        'TAGS_TABLE': TAGS_TABLE_NAME,
+        'SEARCH_TABLE': SEARCH_TABLE_NAME,
+        'METRICS_ENABLED': 'false',
+        'LOG_LEVEL': os.getenv('LOG_LEVEL', 'WARNING'),
+        'LOG_DEBUG_SAMPLE_RATE': '0',
+    })
+    indexed = min(indexed, posts)
+
+    results = {}
+    with mock_dynamodb(), mock_s3(), mock_stepfunctions():
+        clients.reset()
+        slugs.slug_cache.clear()
+
+        print('Seeding {} posts ({} indexed)...'.format(posts, indexed), file=sys.stderr)
+        post_ids = seed(posts, content_sizes, indexed)
+        create_state_machine()
+
+        for name in handlers:
+            handler = resolve_handler(name)
+            rng = random.Random(name)
+            events = build_events(name, post_ids, warmup + requests + memory_requests, rng)
+
+            for event in events[:warmup]:
+                handler(event, None)
+
+            results[name] = measure(handler, events[warmup:warmup + requests], events[warmup + requests:], cached)
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns (handler, metric, baseline, current, change) rows and whether any regressed beyond the tolerance
+    """
+    rows = []
+    regressed = False
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+
+        for metric in COMPARED_METRICS:
+            if not previous.get(metric):
+                continue
+
+            change = (current[metric] - previous[metric]) / previous[metric]
+            # Latency regresses when it grows, throughput when it shrinks
+            worse = change > tolerance if metric.endswith('_ms') else change < -tolerance
+            regressed = regressed or worse
+            rows.append((name, metric, previous[metric], current[metric], change, worse))
+
+    return rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', choices=sorted(CORPORA), default='small')
+    parser.add_argument('--posts', type=int, help='overrides the corpus post count')
+    parser.add_argument('--content-sizes', help='comma separated content sizes, overrides the corpus sizes')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--memory-requests', type=int, default=20)
+    parser.add_argument('--indexed', type=int, default=1000, help='posts added to the tag and search indexes')
+    parser.add_argument('--handlers', default=','.join(HANDLERS))
+    parser.add_argument('--save', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', help='JSON baseline to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--cached', action='store_true',
+                        help='keep the read, search and render caches warm between requests')
+    args = parser.parse_args()
+
+    posts, content_sizes = CORPORA[args.corpus]
+    posts = args.posts or posts
+    if args.content_sizes:
+        content_sizes = [int(size) for size in args.content_sizes.split(',')]
+    handlers = [name.strip() for name in args.handlers.split(',') if name.strip()]
+
+    results = run(posts, content_sizes, args.requests, handlers, args.indexed, args.memory_requests, args.warmup,
+                  args.cached)
+
+    print('Variant: {}'.format('cached' if args.cached else 'uncached'))
+    print('{:<18} {:>8} {:>7} {:>9} {:>9} {:>9} {:>9} {:>10}'.format(
+        'handler', 'requests', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'req/s', 'peak_kb'))
+    for name, row in results.items():
+        print('{name:<18} {requests:>8} {errors:>7} {p50_ms:>9} {p95_ms:>9} {p99_ms:>9} {throughput_rps:>9} '
+              '{peak:>10}'.format(name=name, peak='-' if row['peak_kb'] is None else row['peak_kb'], **row))
+
+    meta = {
+        'corpus': args.corpus,
+        'posts': posts,
+        'content_sizes': content_sizes,
+        'requests': args.requests,
+        'indexed': min(args.indexed, posts),
+        'cached': args.cached,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as baseline_file:
+            json.dump({'meta': meta, 'results': results}, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        if baseline.get('meta', {}).get('cached', False) != meta['cached']:
+            print('Error: the baseline and this run measured different cache variants, see --cached')
+            sys.exit(2)
+
+        for key in ('posts', 'content_sizes', 'requests'):
+            if baseline.get('meta', {}).get(key) != meta[key]:
+                print('Warning: baseline {} was {}, this run used {}'.format(
+                    key, baseline.get('meta', {}).get(key), meta[key]))
+
+        rows, regressed = compare(results, baseline, args.tolerance)
+        print()
+        print('{:<18} {:<15} {:>10} {:>10} {:>8}'.format('handler', 'metric', 'baseline', 'current', 'change'))
+        for name, metric, previous, current, change, worse in rows:
+            print('{:<18} {:<15} {:>10} {:>10} {:>+7.1%}{}'.format(name, metric, previous, current, change,
+                                                                  '  REGRESSED' if worse else ''))
+
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+Helpers shared by the API Gateway proxy handlers
+"""
+import os
+import re
+import gzip
+import base64
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODED_ETAG_SUFFIX = re.compile(r'-(gzip|br)"$')
+
+
+def get_header(event, name):
+    """
+    Reads a request header, API Gateway passes them through with the client's casing
+    """
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+
+    return None
+
+
+def etag_for(body):
+    """
+    Strong ETag derived from a hash of the response body
+    """
+    return '"{}"'.format(hashlib.sha256(body.encode('utf-8')).hexdigest()[:32])
+
+
+def cache_control():
+    """
+    Cache-Control for read responses, set with CACHE_CONTROL_MAX_AGE and CACHE_CONTROL_STALE_WHILE_REVALIDATE
+    """
+    max_age = int(os.getenv('CACHE_CONTROL_MAX_AGE', '60'))
+    stale_while_revalidate = int(os.getenv('CACHE_CONTROL_STALE_WHILE_REVALIDATE', '0'))
+
+    value = 'public, max-age={}'.format(max_age)
+    if stale_while_revalidate:
+        value += ', stale-while-revalidate={}'.format(stale_while_revalidate)
+
+    return value
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Weak comparison of an If-None-Match header against an ETag, as used for GET requests
+    """
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == '*':
+        return True
+
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        # Compressed representations carry the encoding in their ETag
+        if ENCODED_ETAG_SUFFIX.sub('"', candidate) == etag:
+            return True
+
+    return False
+
+
+def conditional_response(event, response):
+    """
+    Adds ETag and Cache-Control validators to a 200 response and turns it into a bodiless
+    304 Not Modified when the client already holds the same representation
+    """
+    if response.get('statusCode') != 200 or 'body' not in response:
+        return response
+
+    etag = etag_for(response['body'])
+    headers = dict(response.get('headers') or {}, ETag=etag)
+    headers['Cache-Control'] = cache_control()
+
+    if etag_matches(get_header(event, 'If-None-Match'), etag):
+        return {
+            'statusCode': 304,
+            'headers': headers
+        }
+
+    return dict(response, headers=headers)
+
+
+def decode_body(event):
+    """
+    Returns the request body as text, API Gateway base64 encodes bodies whose type is a binary media type
+    """
+    body = event['body']
+
+    if body and event.get('isBase64Encoded'):
+        return base64.b64decode(body).decode('utf-8')
+
+    return body
+
+
+def parse_accept_encoding(header):
+    """
+    Parses an Accept-Encoding header into a map of coding to quality
+    """
+    qualities = {}
+
+    for part in (header or '').split(','):
+        params = part.strip().split(';')
+        coding = params[0].strip().lower()
+        if not coding:
+            continue
+
+        quality = 1.0
+        for param in params[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        qualities[coding] = quality
+
+    return qualities
+
+
+def choose_encoding(event):
+    """
+    Picks the best supported content coding the client accepts, brotli winning ties over gzip
+    """
+    qualities = parse_accept_encoding(get_header(event, 'Accept-Encoding'))
+    supported = ['br', 'gzip'] if brotli else ['gzip']
+
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = qualities.get(coding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+
+    return best
+
+
+def accepts_binary(event):
+    """
+    API Gateway only turns a base64 body back into bytes when the Accept header names one of the
+    API's BinaryMediaTypes, listed in BINARY_MEDIA_TYPES
+    """
+    accept = (get_header(event, 'Accept') or '').lower()
+    binary_types = [media_type.strip() for media_type in
+                    os.getenv('BINARY_MEDIA_TYPES', 'application/json').lower().split(',') if media_type.strip()]
+
+    return any(media_type in accept for media_type in binary_types)
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=int(os.getenv('BROTLI_QUALITY', '5')))
+
+    return gzip.compress(data, compresslevel=int(os.getenv('GZIP_LEVEL', '6')))
+
+
+def compress_response(event, response):
+    """
+    Compresses a JSON body above COMPRESSION_MIN_SIZE bytes with the negotiated coding and returns it
+    base64 encoded for API Gateway to pass through as binary. A 304 gets the Vary of the 200 it stands for.
+    """
+    if response.get('statusCode') == 304:
+        return dict(response, headers=dict(response.get('headers') or {}, Vary='Accept-Encoding'))
+
+    if response.get('statusCode') != 200 or not response.get('body') or response.get('isBase64Encoded'):
+        return response
+
+    headers = dict(response.get('headers') or {}, Vary='Accept-Encoding')
+    data = response['body'].encode('utf-8')
+
+    encoding = choose_encoding(event)
+    if not encoding or len(data) < int(os.getenv('COMPRESSION_MIN_SIZE', '1024')) or not accepts_binary(event):
+        return dict(response, headers=headers)
+
+    headers['Content-Encoding'] = encoding
+    if 'ETag' in headers:
+        headers['ETag'] = '{}-{}"'.format(headers['ETag'][:-1], encoding)
+
+    return dict(response, headers=headers, body=base64.b64encode(compress(data, encoding)).decode('ascii'),
+                isBase64Encoded=True)
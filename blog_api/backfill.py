@@ -0,0 +1,191 @@
+"""
+Backfill job: writes what posts stored before a feature shipped are missing, for the deploy that ships it.
+
+    python blog_api/backfill.py date-bucket --table PostsTable --checkpoint date-bucket.json
+
+date-bucket sets the DateBucket of posts that have none, DateBucketIndex only holds posts that do, so /posts
+doesn't list older posts until it has run. With --rebucket it also moves every post whose DateBucket was built
+for another shard count, run it whenever DATE_BUCKET_SHARDS changes.
+
+    python blog_api/backfill.py tags --table PostsTable --tags-table PostTagsTable
+
+tags writes the tag index items of every post, ?tag= listings only find posts that have them.
+
+    python blog_api/backfill.py search --table PostsTable --search-table SearchIndexTable
+
+search indexes every post for /posts/search, reading offloaded content from --content-bucket.
+
+The segments of a parallel scan stream the posts page by page, see scan, and each page is written through a
+bounded pool of threads. Running a task again is safe, date-bucket only writes what is still missing and the
+index tasks write the same items again.
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+import clients
+import content_store
+import feed
+import projection
+import scan
+import search_index
+import tags
+
+
+def backfill_date_bucket(job, item):
+    """
+    Sets the DateBucket of a post that has none, or of every post in another bucket with rebucket.
+    Returns whether it wrote.
+    """
+    bucket = feed.date_bucket(item['DateCreated'], item['PostID'], job.shards)
+
+    if item.get('DateBucket') == bucket or ('DateBucket' in item and not job.rebucket):
+        return False
+
+    condition = 'attribute_exists(PostID)' if job.rebucket else \
+        'attribute_exists(PostID) AND attribute_not_exists(DateBucket)'
+
+    try:
+        clients.get_resource('dynamodb').Table(job.table_name).update_item(
+            Key={'PostID': item['PostID'], 'Author': item['Author']},
+            UpdateExpression='SET DateBucket = :b',
+            ConditionExpression=condition,
+            ExpressionAttributeValues={':b': bucket}
+        )
+    except ClientError as error:
+        if error.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        # Deleted, or written by the API with its DateBucket, since the scan
+        return False
+
+    return True
+
+
+def backfill_tags(job, item):
+    """
+    (Re)writes the tag index items of a post, returns whether it has any tags
+    """
+    tags.sync_post_tags(clients.get_resource('dynamodb').Table(job.tags_table_name), None, item)
+
+    return bool(tags.post_tags(item))
+
+
+def backfill_search(job, item):
+    """
+    Indexes a post, only the postings that differ from its indexed version are written
+    """
+    search_index.index_post(clients.get_resource('dynamodb').Table(job.search_table_name), content_store.load(item))
+
+    return True
+
+
+# Task name: (attributes the task reads, function run on every post)
+TASKS = {
+    'date-bucket': (('PostID', 'Author', 'DateCreated', 'DateBucket'), backfill_date_bucket),
+    'tags': (tags.INDEX_FIELDS, backfill_tags),
+    'search': (('PostID', 'Author', 'Title', 'Description', 'Content', 'ContentRef', 'DateCreated'), backfill_search),
+}
+
+
+class Job:
+    """
+    One backfill run of a task, counters are updated from the segment and writer threads
+    """
+
+    def __init__(self, table_name, task, segments=4, page_size=100, workers=4, checkpoint_path=None, shards=None,
+                 rebucket=False, tags_table_name=None, search_table_name=None):
+        self.table_name = table_name
+        self.fields, self.backfill = TASKS[task]
+        self.segments = segments
+        self.page_size = page_size
+        self.workers = workers
+        self.checkpoint = scan.Checkpoint(checkpoint_path, segments)
+        self.shards = feed.bucket_shards() if shards is None else shards
+        self.rebucket = rebucket
+        self.tags_table_name = tags_table_name or tags.tags_table_name()
+        self.search_table_name = search_table_name or search_index.search_table_name()
+        self.counts = dict(scanned=0, written=0, skipped=0, failed=0)
+        self.failures = []
+        self.lock = threading.Lock()
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counts[name] += value
+
+    def run(self):
+        started_at = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as writers:
+            with ThreadPoolExecutor(max_workers=self.segments) as scanners:
+                futures = [scanners.submit(self.backfill_segment, segment, writers)
+                           for segment in range(self.segments)]
+                for future in futures:
+                    future.result()
+
+        return dict(self.counts, seconds=round(time.perf_counter() - started_at, 2), failures=self.failures)
+
+    def backfill_segment(self, segment, writers):
+        for page in scan.scan_segment(self.table_name, segment, self.checkpoint, page_size=self.page_size,
+                                      **projection.projection_kwargs(self.fields)):
+            self.count('scanned', len(page))
+
+            for future in [writers.submit(self.write, item) for item in page]:
+                future.result()
+
+    def write(self, item):
+        try:
+            self.count('written' if self.backfill(self, item) else 'skipped')
+        except Exception as error:
+            with self.lock:
+                self.counts['failed'] += 1
+                self.failures.append({'PostID': item.get('PostID'), 'Author': item.get('Author'),
+                                      'error': str(error)})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('task', choices=sorted(TASKS))
+    parser.add_argument('--table', default=os.getenv('POSTS_TABLE'))
+    parser.add_argument('--segments', type=int, default=4, help='parallel scan segments')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=4, help='concurrent writes')
+    parser.add_argument('--checkpoint', help='file to resume from and record progress in')
+    parser.add_argument('--shards', type=int, default=None,
+                        help='shards per month for date-bucket, DATE_BUCKET_SHARDS by default')
+    parser.add_argument('--rebucket', action='store_true',
+                        help='date-bucket also moves posts bucketed for another shard count')
+    parser.add_argument('--tags-table', default=os.getenv('TAGS_TABLE'), help='tag index table for tags')
+    parser.add_argument('--search-table', default=os.getenv('SEARCH_TABLE'), help='search index table for search')
+    parser.add_argument('--content-bucket', default=os.getenv('CONTENT_BUCKET'), help='bucket of offloaded content')
+    args = parser.parse_args(argv)
+
+    if not args.table:
+        parser.error('--table is required, or POSTS_TABLE')
+    if args.task == 'tags' and not args.tags_table:
+        parser.error('tags needs --tags-table, or TAGS_TABLE')
+    if args.task == 'search' and not args.search_table:
+        parser.error('search needs --search-table, or SEARCH_TABLE')
+    if args.content_bucket:
+        os.environ['CONTENT_BUCKET'] = args.content_bucket
+
+    report = Job(args.table, args.task, segments=args.segments, page_size=args.page_size, workers=args.workers,
+                 checkpoint_path=args.checkpoint, shards=args.shards, rebucket=args.rebucket,
+                 tags_table_name=args.tags_table, search_table_name=args.search_table).run()
+
+    for failure in report['failures']:
+        print('failed {PostID} ({Author}): {error}'.format(**failure), file=sys.stderr)
+
+    print(' '.join('{}={}'.format(name, report[name]) for name in (
+        'scanned', 'written', 'skipped', 'failed', 'seconds')))
+
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
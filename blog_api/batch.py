@@ -0,0 +1,81 @@
+"""
+Helpers for concurrent BatchGetItem reads
+"""
+import os
+import time
+import random
+
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+
+MAX_BATCH_KEYS = 100
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 0.05
+BACKOFF_CAP = 1.0
+
+
+class BatchGetError(Exception):
+    """
+    Raised when keys are still unprocessed after every retry
+    """
+
+
+def chunk_size():
+    return min(int(os.getenv('BATCH_GET_CHUNK_SIZE', '25')), MAX_BATCH_KEYS)
+
+
+def max_workers():
+    return int(os.getenv('BATCH_GET_WORKERS', '4'))
+
+
+def backoff(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """
+    Full jitter exponential backoff, spreading retries of throttled chunks apart
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def get_chunk(client, table_name, keys, request_kwargs, sleep=time.sleep):
+    """
+    Reads one chunk of keys, retrying UnprocessedKeys until they are all served
+    """
+    items = []
+    request = {table_name: dict(request_kwargs, Keys=keys)}
+
+    for attempt in range(MAX_ATTEMPTS):
+        response = client.batch_get_item(RequestItems=request)
+        items.extend(response['Responses'].get(table_name, []))
+
+        request = response.get('UnprocessedKeys')
+        if not request:
+            return items
+
+        sleep(backoff(attempt))
+
+    raise BatchGetError('{} keys unprocessed after {} attempts'.format(
+        len(request[table_name]['Keys']), MAX_ATTEMPTS))
+
+
+def batch_get(dynamodb, table_name, keys, key_names=('PostID', 'Author'), **request_kwargs):
+    """
+    Fetches items by key with BatchGetItem chunks issued concurrently and returns them in a dict keyed by
+    the tuple of their key values. request_kwargs such as ProjectionExpression apply to every chunk.
+    """
+    keys = list({tuple(key[name] for name in key_names): key for key in keys}.values())
+    if not keys:
+        return {}
+
+    # Clients are thread safe where resources are not, the resource's client keeps its type conversion
+    client = dynamodb.meta.client
+    size = chunk_size()
+    chunks = [keys[start:start + size] for start in range(0, len(keys), size)]
+
+    if len(chunks) == 1:
+        results = [get_chunk(client, table_name, chunks[0], request_kwargs)]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers(), len(chunks))) as executor:
+            results = list(executor.map(instrumentation.propagate(
+                lambda chunk: get_chunk(client, table_name, chunk, request_kwargs)), chunks))
+
+    return {tuple(item[name] for name in key_names): item for items in results for item in items}
@@ -0,0 +1,166 @@
+"""
+Lambda function to get several posts from the database in one request
+"""
+import os
+import json
+
+from concurrent.futures import ThreadPoolExecutor
+
+import apigw
+import batch
+import cache
+import clients
+import content_store
+import instrumentation
+import log
+import projection
+import serialization
+import slugs
+
+logger = log.get_logger()
+
+
+@instrumentation.instrumented
+def batch_get_posts_handler(event, context):
+    """
+    Retrieves up to 100 blog posts in the requested order, optionally restricted to the attributes in the
+    fields query parameter. ids name posts by slug or PostID and are resolved through the slug cache first,
+    keys of PostID and Author go to BatchGetItem as they are.
+    """
+
+    try:
+        log.start(context)
+        logger.debug('Event', extra=log.data(event=event))
+
+        table_name = os.getenv('POSTS_TABLE')
+        if not table_name:
+            raise Exception('Table name missing')
+
+        query_params = event.get('queryStringParameters') or {}
+
+        try:
+            ids, post_keys = parse_request(json.loads(apigw.decode_body(event) or '{}'))
+            fields = projection.parse_fields(query_params.get('fields'))
+        except (ValueError, projection.ProjectionError) as error:
+            logger.info('Bad request', extra=log.data(error=str(error)))
+
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Access-Control-Allow-Headers': 'Content-Type',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Methods': 'OPTIONS,POST'
+                },
+                'body': json.dumps({'message': str(error)})
+            }
+
+        dynamodb = clients.get_resource('dynamodb')
+        table = dynamodb.Table(table_name)
+
+        # Slug lookups are served from the warm-container cache, misses are resolved concurrently
+        keys = {}
+        if ids:
+            with instrumentation.phase('resolve'), ThreadPoolExecutor(max_workers=batch.max_workers()) as executor:
+                keys = dict(zip(ids, executor.map(
+                    instrumentation.propagate(lambda value: slugs.resolve_id(table, value)), ids)))
+
+        try:
+            with instrumentation.phase('batch_get'):
+                posts = batch.batch_get(
+                    dynamodb,
+                    table_name,
+                    [{'PostID': key[0], 'Author': key[1]} for key in keys.values() if key] +
+                    # The table version marker is keyed like a post, it is reported missing
+                    [key for key in post_keys if not cache.is_version_key(key)],
+                    **projection.projection_kwargs(fields, required=('PostID', 'Author') +
+                                                   content_store.required_fields(fields))
+                )
+
+        except batch.BatchGetError as error:
+            logger.info('Bad request', extra=log.data(error=str(error)))
+
+            return {
+                'statusCode': 503,
+                'headers': {
+                    'Access-Control-Allow-Headers': 'Content-Type',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Methods': 'OPTIONS,POST',
+                    'Retry-After': '1'
+                },
+                'body': json.dumps({'message': 'Service Unavailable'})
+            }
+
+        if content_store.reads_content(fields):
+            content_store.load_all(list(posts.values()))
+
+        items, missing = [], []
+        for value in ids:
+            post = posts.get(keys[value])
+            if post is None:
+                missing.append(value)
+            else:
+                items.append(projection.select_fields(post, fields) if fields else post)
+        for key in post_keys:
+            post = posts.get((key['PostID'], key['Author']))
+            if post is None:
+                missing.append(key)
+            else:
+                items.append(projection.select_fields(post, fields) if fields else post)
+
+        response = {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'OPTIONS,POST'
+            },
+            'body': serialization.dumps({'items': items, 'missing': missing})
+        }
+
+        with instrumentation.phase('encode'):
+            response = apigw.compress_response(event, response)
+
+        logger.info('Response', extra=log.summary(response))
+
+        return response
+
+    except Exception:
+        logger.exception('Unhandled error')
+
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'OPTIONS,POST'
+            },
+            "body": {"message": 'Internal server error'}
+        }
+
+
+def parse_request(payload):
+    """
+    Reads the list of slugs or PostIDs and the list of post keys from the request body, dropping repeats
+    """
+    if not isinstance(payload, dict):
+        raise ValueError('ids or keys must be a non-empty list')
+
+    ids = payload.get('ids', [])
+    keys = payload.get('keys', [])
+
+    if not isinstance(ids, list) or not isinstance(keys, list) or not (ids or keys):
+        raise ValueError('ids or keys must be a non-empty list')
+
+    if not all(isinstance(value, str) and value for value in ids):
+        raise ValueError('ids must be strings')
+
+    if not all(isinstance(key, dict) and set(key) == {'PostID', 'Author'} and
+               all(isinstance(value, str) and value for value in key.values()) for key in keys):
+        raise ValueError('keys must hold a PostID and an Author')
+
+    ids = list(dict.fromkeys(ids))
+    keys = list({(key['PostID'], key['Author']): key for key in keys}.values())
+    if len(ids) + len(keys) > batch.MAX_BATCH_KEYS:
+        raise ValueError('At most {} posts can be fetched at once'.format(batch.MAX_BATCH_KEYS))
+
+    return ids, keys
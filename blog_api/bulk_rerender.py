@@ -0,0 +1,224 @@
+"""
+Bulk re-render job: renders every post's Markdown again and overwrites the HTML its HtmlURL serves, for when the
+allowed markup or the markdown and bleach versions change. Every render is stored as a new immutable object and
+the post's HtmlURL moves to it, in the tag index too, posts whose HTML comes out the same are left alone. Once
+URLs moved the table version is bumped, so warm read caches drop them.
+
+    python blog_api/bulk_rerender.py --table PostsTable --bucket posts-html-bucket --checkpoint rerender.json
+
+The segments of a parallel scan stream the posts page by page. Each page is rendered across a process pool,
+Markdown parsing and sanitizing being CPU bound, then uploaded through a bounded pool of S3 threads. Once a page
+is stored its segment's scan position goes to the checkpoint file, so a run that stops picks up where it left
+off when started again with the same checkpoint. --dry-run renders and compares with the stored HTML instead of
+writing it.
+"""
+import os
+import sys
+import time
+import difflib
+import argparse
+import threading
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+import cache
+import clients
+import content_store
+import html_objects
+import publishing
+import rendering
+import scan
+
+PROJECTION = 'PostID, Author, Slug, Content, ContentRef, ContentHash, HtmlURL, Tags, DateCreated'
+
+
+def render_html(content):
+    """
+    Renders in a worker process, errors come back as values so one bad post doesn't fail its page
+    """
+    try:
+        return rendering.sanitize(rendering.to_html(content)), None
+    except Exception as error:
+        return None, str(error)
+
+
+class Job:
+    """
+    One bulk re-render run, counters are updated from the segment and upload threads
+    """
+
+    def __init__(self, table_name, bucket_name, segments=4, page_size=100, render_workers=None, upload_workers=16,
+                 checkpoint_path=None, dry_run=False, diff_limit=0):
+        self.table_name = table_name
+        self.bucket_name = bucket_name
+        self.segments = segments
+        self.page_size = page_size
+        self.render_workers = render_workers or os.cpu_count() or 1
+        self.upload_workers = upload_workers
+        # A dry run writes nothing, progress included, or a later real run would skip what it only compared
+        self.checkpoint = scan.Checkpoint(None if dry_run else checkpoint_path, segments)
+        self.dry_run = dry_run
+        self.diff_limit = diff_limit
+        self.counts = dict(scanned=0, rendered=0, uploaded=0, moved=0, changed=0, unchanged=0, missing=0,
+                           superseded=0, failed=0)
+        self.failures = []
+        self.diffs = []
+        self.lock = threading.Lock()
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counts[name] += value
+
+    def fail(self, item, error):
+        with self.lock:
+            self.counts['failed'] += 1
+            self.failures.append({'PostID': item.get('PostID'), 'Author': item.get('Author'), 'error': error})
+
+    def run(self):
+        started_at = time.perf_counter()
+
+        # Spawned, not forked, the scan and upload threads are running when workers start
+        with ProcessPoolExecutor(max_workers=self.render_workers, mp_context=multiprocessing.get_context('spawn')) \
+                as renderers, ThreadPoolExecutor(max_workers=self.upload_workers) as uploaders:
+            with ThreadPoolExecutor(max_workers=self.segments) as scanners:
+                futures = [scanners.submit(self.rerender_segment, segment, renderers, uploaders)
+                           for segment in range(self.segments)]
+                for future in futures:
+                    future.result()
+
+        if self.counts['moved']:
+            # Warm read caches still serve the old HtmlURLs
+            cache.bump_table_version(clients.get_resource('dynamodb').Table(self.table_name))
+
+        elapsed = time.perf_counter() - started_at
+        return dict(self.counts, seconds=round(elapsed, 2),
+                    posts_per_second=round(self.counts['rendered'] / elapsed, 1) if elapsed else 0.0,
+                    failures=self.failures, diffs=self.diffs)
+
+    def rerender_segment(self, segment, renderers, uploaders):
+        for page in scan.scan_segment(self.table_name, segment, self.checkpoint, page_size=self.page_size,
+                                      ProjectionExpression=PROJECTION):
+            self.count('scanned', len(page))
+
+            # Offloaded content is fetched by the upload threads, they are there for S3 requests, and compressed
+            # content is decoded. Posts whose content can't be read are failed on their own
+            items = [item for item in uploaders.map(self.load, page) if item is not None]
+
+            self.store_page(items, renderers, uploaders)
+
+    def load(self, item):
+        try:
+            return content_store.load(item)
+        except Exception as error:
+            self.fail(item, str(error))
+            return None
+
+    def store_page(self, items, renderers, uploaders):
+        chunksize = max(1, len(items) // (self.render_workers * 4))
+        rendered = renderers.map(render_html, [item['Content'] for item in items], chunksize=chunksize)
+
+        futures = []
+        for item, (html, error) in zip(items, rendered):
+            if error is not None:
+                self.fail(item, error)
+                continue
+
+            self.count('rendered')
+            futures.append(uploaders.submit(self.store, item, html))
+
+        for future in futures:
+            future.result()
+
+    def store(self, item, html):
+        try:
+            if self.dry_run:
+                self.compare(publishing.stored_html_key(item), html)
+                return
+
+            base_key = publishing.html_key({'author': item['Author'], 'slug': item['Slug']})
+            if html_objects.versioned_key(base_key, html_objects.digest(html.encode('utf-8'))) == \
+                    publishing.stored_html_key(item):
+                self.count('unchanged')
+                return
+
+            key = publishing.put_html(self.bucket_name, base_key, html)
+            self.count('uploaded')
+
+            if publishing.point_at(self.table_name, item, publishing.html_url(self.bucket_name, key)):
+                self.count('moved')
+            else:
+                # The post was edited or deleted since the scan, whoever changed it rendered it
+                self.count('superseded')
+        except Exception as error:
+            self.fail(item, str(error))
+
+    def compare(self, key, html):
+        try:
+            response = clients.get_client('s3').get_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as error:
+            if error.response['Error']['Code'] not in ('NoSuchKey', '404'):
+                raise
+            self.count('missing')
+            return
+
+        current = html_objects.decode(response['Body'].read(), response.get('ContentEncoding', html_objects.IDENTITY))
+        if current == html:
+            self.count('unchanged')
+            return
+
+        self.count('changed')
+        with self.lock:
+            if len(self.diffs) < self.diff_limit:
+                self.diffs.append(''.join(difflib.unified_diff(
+                    current.splitlines(True), html.splitlines(True), fromfile=key + ' (stored)',
+                    tofile=key + ' (rendered)')))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default=os.getenv('POSTS_TABLE'))
+    parser.add_argument('--bucket', default=os.getenv('POSTS_BUCKET'))
+    parser.add_argument('--content-bucket', default=os.getenv('CONTENT_BUCKET'), help='bucket of offloaded content')
+    parser.add_argument('--tags-table', default=os.getenv('TAGS_TABLE'), help='tag index table to move HtmlURLs in')
+    parser.add_argument('--segments', type=int, default=4, help='parallel scan segments')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--render-workers', type=int, default=None, help='render processes, CPU count by default')
+    parser.add_argument('--upload-workers', type=int, default=16, help='concurrent S3 requests')
+    parser.add_argument('--checkpoint', help='file to resume from and record progress in')
+    parser.add_argument('--dry-run', action='store_true', help='compare with the stored HTML, write nothing')
+    parser.add_argument('--show-diffs', type=int, default=5, help='diffs to print in a dry run')
+    args = parser.parse_args(argv)
+
+    if not args.table or not args.bucket:
+        parser.error('--table and --bucket are required, or POSTS_TABLE and POSTS_BUCKET')
+    if args.dry_run and args.checkpoint:
+        parser.error('--dry-run records no progress, it can\'t be combined with --checkpoint')
+    if args.content_bucket:
+        os.environ['CONTENT_BUCKET'] = args.content_bucket
+    if args.tags_table:
+        os.environ['TAGS_TABLE'] = args.tags_table
+    # The functions check the table version (READ_CACHE_VERSION_CHECK in the template), bump it for them
+    os.environ.setdefault('READ_CACHE_VERSION_CHECK', 'true')
+
+    report = Job(args.table, args.bucket, segments=args.segments, page_size=args.page_size,
+                 render_workers=args.render_workers, upload_workers=args.upload_workers,
+                 checkpoint_path=args.checkpoint, dry_run=args.dry_run,
+                 diff_limit=args.show_diffs if args.dry_run else 0).run()
+
+    for diff in report['diffs']:
+        print(diff)
+    for failure in report['failures']:
+        print('failed {PostID} ({Author}): {error}'.format(**failure), file=sys.stderr)
+
+    print(' '.join('{}={}'.format(name, report[name]) for name in (
+        'scanned', 'rendered', 'uploaded', 'moved', 'changed', 'unchanged', 'missing', 'superseded', 'failed',
+        'seconds', 'posts_per_second')))
+
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
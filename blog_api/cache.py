@@ -0,0 +1,195 @@
+"""
+In-process read cache kept alive by warm Lambda containers
+"""
+import os
+import time
+import threading
+
+from collections import OrderedDict
+
+VERSION_KEY = {'PostID': '__table_version__', 'Author': '__table_version__'}
+
+
+class TTLCache:
+    """
+    Size bounded LRU cache with a time to live on every entry. With total_bytes it also evicts once the sizeof
+    of its values adds up to more than that
+    """
+
+    def __init__(self, maxsize=256, ttl=30, clock=time.monotonic, total_bytes=0, sizeof=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.total_bytes = total_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls, prefix='READ_CACHE', total_bytes=0, sizeof=None):
+        """
+        Builds a cache sized by <prefix>_SIZE entries and <prefix>_TTL seconds, a size or TTL of 0 disables it.
+        <prefix>_TOTAL_BYTES bounds the size of its values when sizeof is given, 0 leaves it unbounded
+        """
+        return cls(maxsize=int(os.getenv(prefix + '_SIZE', '256')),
+                   ttl=float(os.getenv(prefix + '_TTL', '30')),
+                   total_bytes=int(os.getenv(prefix + '_TOTAL_BYTES', str(total_bytes))) if sizeof else 0,
+                   sizeof=sizeof)
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                self.discard(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def set(self, key, value, ttl=None):
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.discard(key)
+            self.entries[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+            if self.total_bytes:
+                self.bytes += self.sizeof(value)
+
+            while len(self.entries) > self.maxsize or (self.total_bytes and self.bytes > self.total_bytes):
+                self.discard(next(iter(self.entries)))
+                self.evictions += 1
+
+    def discard(self, key):
+        """
+        Drops an entry, the lock is held by the caller
+        """
+        entry = self.entries.pop(key, None)
+        if entry is not None and self.total_bytes:
+            self.bytes -= self.sizeof(entry[1])
+
+        return entry
+
+    def pop(self, key):
+        with self.lock:
+            entry = self.discard(key)
+
+        return None if entry is None else entry[1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        stats = {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+        if self.total_bytes:
+            stats['bytes'] = self.bytes
+
+        return stats
+
+
+class TableVersion:
+    """
+    Reads the table version marker that write paths bump, at most once per check interval
+    """
+
+    def __init__(self, interval=None, clock=time.monotonic):
+        self.interval = float(os.getenv('READ_CACHE_VERSION_INTERVAL', '1')) if interval is None else interval
+        self.clock = clock
+        self.version = None
+        self.checked_at = None
+
+    def current(self, table):
+        now = self.clock()
+
+        if self.checked_at is None or now - self.checked_at >= self.interval:
+            item = table.get_item(Key=VERSION_KEY, ProjectionExpression='Version').get('Item', {})
+            self.version = int(item.get('Version', 0))
+            self.checked_at = now
+
+        return self.version
+
+
+def is_version_key(key):
+    """
+    Whether a post key or item is the table version marker, which shares the posts table but is no post
+    """
+    return key.get('PostID') == VERSION_KEY['PostID'] and key.get('Author') == VERSION_KEY['Author']
+
+
+def version_check_enabled():
+    return os.getenv('READ_CACHE_VERSION_CHECK', 'false').lower() == 'true'
+
+
+def bump_table_version(table):
+    """
+    Invalidates every read cache that checks the table version, called after each write to the posts table
+    """
+    if not version_check_enabled():
+        return
+
+    table.update_item(
+        Key=VERSION_KEY,
+        UpdateExpression='ADD Version :one',
+        ExpressionAttributeValues={':one': 1}
+    )
+
+
+def read_through(read_cache, table_version, table, key, loader):
+    """
+    Returns the cached value for key, calling loader on a miss. Keys are scoped to the table version when
+    READ_CACHE_VERSION_CHECK is enabled, so a bump makes older entries unreachable until they age out.
+    """
+    if not read_cache.enabled:
+        return loader()
+
+    if version_check_enabled():
+        key = (table_version.current(table),) + tuple(key)
+
+    value = read_cache.get(key)
+    if value is None:
+        value = loader()
+        if value is not None:
+            read_cache.set(key, value)
+
+    return value
+
+
+def evict(read_cache, table_version, key):
+    """
+    Drops an entry read_through stored, scoped to the table version this container last read, without
+    reading it again
+    """
+    if version_check_enabled():
+        if table_version.version is None:
+            return
+        key = (table_version.version,) + tuple(key)
+
+    read_cache.pop(key)
@@ -0,0 +1,70 @@
+"""
+Claim check for the markdown workflow: post bodies travel through the workflow bucket and the state machine
+state carries references to them, so the state stays the same size however long a post is.
+
+    {"post_id": "...", "title": "...", "content_ref": {"bucket": "...", "key": "posts/<id>/content.md", "size": 1048576}}
+
+validate_post checks the Markdown in, sanitize_markdown checks it out and checks in the sanitized HTML as
+html_ref, already encoded as the posts bucket stores it, and markdown_to_html copies that object into the posts
+bucket without downloading it. Without
+WORKFLOW_BUCKET the bodies stay inline in the state, which is also what states already in flight carry.
+"""
+import os
+
+import clients
+import html_objects
+import instrumentation
+
+CONTENT = 'content'
+HTML = 'html'
+
+OBJECT_NAMES = {CONTENT: 'content.md', HTML: 'content.html'}
+CONTENT_TYPES = {CONTENT: 'text/markdown; charset=utf-8', HTML: 'text/html; charset=utf-8'}
+
+
+def workflow_bucket():
+    return os.getenv('WORKFLOW_BUCKET')
+
+
+def object_key(post_id, kind):
+    return 'posts/{}/{}'.format(post_id, OBJECT_NAMES[kind])
+
+
+def check_in(post_id, kind, body, encoding=None):
+    """
+    Stores a body in the workflow bucket and returns the reference the state carries instead, an encoded body
+    is passed as bytes along with its content coding
+    """
+    bucket = workflow_bucket()
+    data = body if encoding else body.encode('utf-8')
+    args = {'ContentEncoding': encoding} if encoding else {}
+
+    with instrumentation.phase('check_in'):
+        clients.get_client('s3').put_object(Bucket=bucket, Key=object_key(post_id, kind), Body=data,
+                                            ContentType=CONTENT_TYPES[kind], **args)
+
+    ref = {'bucket': bucket, 'key': object_key(post_id, kind), 'size': len(data)}
+    if encoding:
+        ref['encoding'] = encoding
+
+    return ref
+
+
+def check_out(ref):
+    """
+    Reads a checked in body back from the workflow bucket
+    """
+    with instrumentation.phase('check_out'):
+        response = clients.get_client('s3').get_object(Bucket=ref['bucket'], Key=ref['key'])
+
+        return html_objects.decode(response['Body'].read(), ref.get('encoding', html_objects.IDENTITY))
+
+
+def content_of(state):
+    """
+    Markdown of a workflow state, inline or checked in
+    """
+    if 'content_ref' in state:
+        return check_out(state['content_ref'])
+
+    return state['content']
@@ -0,0 +1,73 @@
+"""
+Process wide AWS clients and resources, created on first use and reused by every warm invocation
+"""
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+import instrumentation
+
+_clients = {}
+_resources = {}
+_lock = threading.Lock()
+
+
+def client_config():
+    """
+    botocore Config shared by every client, tuned with the CLIENT_* environment variables
+    """
+    return Config(
+        max_pool_connections=int(os.getenv('CLIENT_MAX_POOL_CONNECTIONS', '16')),
+        tcp_keepalive=True,
+        connect_timeout=float(os.getenv('CLIENT_CONNECT_TIMEOUT', '2')),
+        read_timeout=float(os.getenv('CLIENT_READ_TIMEOUT', '5')),
+        retries={
+            'mode': os.getenv('CLIENT_RETRY_MODE', 'adaptive'),
+            'max_attempts': int(os.getenv('CLIENT_MAX_ATTEMPTS', '3'))
+        }
+    )
+
+
+def get_client(service_name):
+    """
+    Returns the cached low level client for a service, clients are thread safe and shared freely
+    """
+    client = _clients.get(service_name)
+    if client is None:
+        with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                client = boto3.client(service_name, config=client_config())
+                if service_name == 'dynamodb':
+                    instrumentation.attach(client)
+                _clients[service_name] = client
+
+    return client
+
+
+def get_resource(service_name):
+    """
+    Returns the cached resource for a service, threads should go through resource.meta.client
+    """
+    resource = _resources.get(service_name)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(service_name)
+            if resource is None:
+                resource = boto3.resource(service_name, config=client_config())
+                if service_name == 'dynamodb':
+                    instrumentation.attach(resource.meta.client)
+                _resources[service_name] = resource
+
+    return resource
+
+
+def reset():
+    """
+    Drops every cached client, so the next use picks up new environment, credentials or event hooks
+    """
+    with _lock:
+        _clients.clear()
+        _resources.clear()
@@ -0,0 +1,118 @@
+"""
+Large post bodies live in the content bucket and the post item keeps a pointer to them next to its ContentHash:
+
+    {"PostID": "...", "ContentHash": "<sha256>", "ContentRef": "<post_id>/<sha256>.md", ...}
+
+Bodies over CONTENT_OFFLOAD_BYTES UTF-8 bytes are offloaded when CONTENT_BUCKET is set, smaller ones stay in the
+Content attribute, so reads that skip the content pay for the small item only and posts may outgrow the
+DynamoDB item size limit. Objects are named by the hash of the body and never change; a content update writes
+a new object, points the item at it and deletes the old one. Content kept in the item is compressed by
+content_codec.
+"""
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+import clients
+import content_codec
+import instrumentation
+import log
+import rendering
+
+CONTENT = 'Content'
+CONTENT_REF = 'ContentRef'
+
+logger = log.get_logger()
+
+
+def content_bucket():
+    return os.getenv('CONTENT_BUCKET')
+
+
+def offload_bytes():
+    return int(os.getenv('CONTENT_OFFLOAD_BYTES', '65536'))
+
+
+def object_key(post_id, content):
+    return '{}/{}.md'.format(post_id, rendering.content_hash(content))
+
+
+def content_attributes(post_id, content, current_ref=None):
+    """
+    Attributes that store the content on the post item, either the encoded content or a reference to the
+    object it was uploaded to. Content the item already points at isn't uploaded again.
+    """
+    data = content.encode('utf-8')
+    if not content_bucket() or len(data) <= offload_bytes():
+        return {CONTENT: content_codec.encode(content)}
+
+    key = object_key(post_id, content)
+    if key != current_ref:
+        with instrumentation.phase('offload_content'):
+            clients.get_client('s3').put_object(Bucket=content_bucket(), Key=key, Body=data,
+                                                ContentType='text/markdown; charset=utf-8')
+
+    return {CONTENT_REF: key}
+
+
+def load(item):
+    """
+    Replaces the reference of an offloaded item with the content, or decodes the content kept in the item,
+    in place, and returns the item
+    """
+    if CONTENT_REF in item and CONTENT not in item:
+        with instrumentation.phase('load_content'):
+            response = clients.get_client('s3').get_object(Bucket=content_bucket(), Key=item[CONTENT_REF])
+            item[CONTENT] = response['Body'].read().decode('utf-8')
+    elif CONTENT in item:
+        item[CONTENT] = content_codec.decode(item[CONTENT])
+
+    item.pop(CONTENT_REF, None)
+
+    return item
+
+
+def load_all(items):
+    """
+    Loads the content of every item, fetching offloaded content concurrently when there is more than one
+    """
+    offloaded = [item for item in items if CONTENT_REF in item]
+    for item in items:
+        if CONTENT_REF not in item:
+            load(item)
+
+    if len(offloaded) > 1:
+        with ThreadPoolExecutor(max_workers=min(len(offloaded), 8)) as executor:
+            list(executor.map(instrumentation.propagate(load), offloaded))
+    else:
+        for item in offloaded:
+            load(item)
+
+    return items
+
+
+def delete(key):
+    """
+    Deletes an offloaded body that no item points at anymore, a failure only leaves an orphaned object
+    """
+    if not key or not content_bucket():
+        return
+
+    try:
+        with instrumentation.phase('delete_content'):
+            clients.get_client('s3').delete_object(Bucket=content_bucket(), Key=key)
+    except ClientError as error:
+        logger.warning('Content delete failed', extra=log.data(key=key, error=str(error)))
+
+
+def reads_content(fields):
+    """
+    Whether a read with these fields returns the content, and so has to read the reference too
+    """
+    return fields is None or CONTENT in fields
+
+
+def required_fields(fields):
+    return (CONTENT_REF,) if fields is not None and CONTENT in fields else ()
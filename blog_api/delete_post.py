@@ -3,64 +3,114 @@ Lambda function to delete a post from the database
 """
 import os
 import json
-import logging
 
-import boto3
+from botocore.exceptions import ClientError
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+import cache
+import clients
+import content_store
+import instrumentation
+import log
+import search_index
+import serialization
+import slugs
+import tags
 
+logger = log.get_logger()
 
+
+@instrumentation.instrumented
 def delete_post_handler(event, context):
     """
     Deletes a blog post from DynamoDB
     """
 
     try:
-        logger.info("Event: {}".format(event))
+        log.start(context)
+        logger.debug('Event', extra=log.data(event=event))
 
         table_name = os.getenv('POSTS_TABLE')
         if not table_name:
             raise Exception('Table name missing')
 
         try:
-            post_id = event['pathParameters']['slug']
+            slug = event['pathParameters']['slug']
         except KeyError as error:
-            logger.info('Error: {}'.format(error))
+            logger.info('Bad request', extra=log.data(error=str(error)))
 
             return {
                 'statusCode': 400,
                 'body': json.dumps({'message': 'Bad Request'})
             }
 
-        dynamodb = boto3.resource('dynamodb')
+        dynamodb = clients.get_resource('dynamodb')
         table = dynamodb.Table(table_name)
 
-        item = table.delete_item(
-            Key={
-                'PostID': post_id,
-                'Author': event['requestContext']['authorizer']['principalId']
+        author = event['requestContext']['authorizer']['principalId']
+        with instrumentation.phase('resolve'):
+            post_id = slugs.post_id_for(table, slug, author)
+
+        try:
+            with instrumentation.phase('delete_item'):
+                item = table.delete_item(
+                    Key={
+                        'PostID': post_id,
+                        'Author': author
+                    },
+                    ConditionExpression='attribute_exists(PostID)',
+                    ReturnValues='ALL_OLD'
+                )
+        except ClientError as error:
+            if error.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+            logger.info('Not found', extra=log.data(post_id=post_id))
+
+            return {
+                'statusCode': 404,
+                'body': json.dumps({'message': 'Not Found'})
             }
-        )
 
-        logger.info('DDB Response: {}'.format(item))
+        logger.debug('DDB response', extra=log.data(response=item))
+
+        tags_table_name = tags.tags_table_name()
+        if tags_table_name and item.get('Attributes'):
+            with instrumentation.phase('tags'):
+                tags.sync_post_tags(dynamodb.Table(tags_table_name), item['Attributes'], None)
+
+        # The deleted item is returned as it reads, without fetching offloaded content about to be deleted
+        content_store.delete(item.get('Attributes', {}).pop(content_store.CONTENT_REF, None))
+        if content_store.CONTENT in item.get('Attributes', {}):
+            content_store.load(item['Attributes'])
+
+        search_table_name = search_index.search_table_name()
+        if search_table_name and item.get('Attributes'):
+            with instrumentation.phase('search_index'):
+                search_index.remove_post(dynamodb.Table(search_table_name), post_id)
+
+        slugs.forget(slug, author)
+        if item.get('Attributes', {}).get('Slug'):
+            slugs.forget(item['Attributes']['Slug'], author)
+
+        with instrumentation.phase('invalidate'):
+            cache.bump_table_version(table)
 
         if 'Attributes' in item:
             response = {
                 'statusCode': 204,
-                'body': json.dumps(item['Attributes'])
+                'body': serialization.dumps(item['Attributes'])
             }
         else:
             response = {
                 'statusCode': item['ResponseMetadata']['HTTPStatusCode']
             }
 
-        logger.info("Response: %s", response)
+        logger.info('Response', extra=log.summary(response))
 
         return response
 
-    except Exception as error:
-        logger.info('Error: {}'.format(error))
+    except Exception:
+        logger.exception('Unhandled error')
 
         return {
             "statusCode": 500,
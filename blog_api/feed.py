@@ -0,0 +1,209 @@
+"""
+Helpers for the newest-first post feed served from the date bucketed index
+"""
+import os
+import re
+import zlib
+import datetime
+
+from boto3.dynamodb.conditions import Key
+
+import pagination
+
+INDEX_NAME = 'DateBucketIndex'
+INDEX_KEYS = ('PostID', 'Author', 'DateBucket', 'DateCreated')
+
+DEFAULT_START_MONTH = '2023-01'
+DEFAULT_MAX_BUCKETS = 24
+
+MONTH_PATTERN = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+
+def bucket_shards():
+    """
+    Number of shards each month is split into, set with DATE_BUCKET_SHARDS. Stored posts keep the bucket of
+    the count they were written with, a new count needs backfill.py date-bucket --rebucket
+    """
+    return max(1, int(os.getenv('DATE_BUCKET_SHARDS', '1')))
+
+
+def date_bucket(date_created, post_id, shards=None):
+    """
+    Builds the DateBucket partition key (YYYY-MM or YYYY-MM#shard) for a post
+    """
+    shards = bucket_shards() if shards is None else shards
+    month = date_created[:7]
+
+    if shards == 1:
+        return month
+
+    return '{}#{}'.format(month, zlib.crc32(post_id.encode('utf-8')) % shards)
+
+
+def bucket_keys(month, shards):
+    """
+    Lists the partition keys holding one month of posts
+    """
+    if shards == 1:
+        return [month]
+
+    return ['{}#{}'.format(month, shard) for shard in range(shards)]
+
+
+def parse_month(value):
+    """
+    Validates a YYYY-MM query parameter
+    """
+    if value is None or value == '':
+        return None
+
+    if not isinstance(value, str) or not MONTH_PATTERN.match(value):
+        raise pagination.PaginationError('Months must be formatted as YYYY-MM')
+
+    return value
+
+
+def current_month():
+    return datetime.datetime.utcnow().strftime('%Y-%m')
+
+
+def previous_month(month):
+    year, number = int(month[:4]), int(month[5:])
+    if number == 1:
+        return '{:04d}-12'.format(year - 1)
+
+    return '{:04d}-{:02d}'.format(year, number - 1)
+
+
+def decode_feed_cursor(cursor, newest, oldest):
+    """
+    Decodes a feed cursor, which holds the month being walked and, per shard number, the DateCreated, PostID and
+    Author of the last item read (or False once drained). The cap on its length grows with the shard count.
+    """
+    shards = bucket_shards()
+    state = pagination.decode_cursor(cursor, max_length=pagination.MAX_CURSOR_LENGTH * shards)
+    if state is None:
+        return None
+
+    if set(state) != {'b', 'k'} or not isinstance(state['k'], dict):
+        raise pagination.PaginationError('Invalid cursor')
+
+    if not isinstance(state['b'], str) or parse_month(state['b']) is None:
+        raise pagination.PaginationError('Invalid cursor')
+    if state['b'] > newest or state['b'] < oldest:
+        raise pagination.PaginationError('Invalid cursor')
+
+    for shard, position in state['k'].items():
+        if not re.fullmatch(r'[0-9]+', shard) or int(shard) >= shards:
+            raise pagination.PaginationError('Invalid cursor')
+        if position is not False and not (isinstance(position, list) and len(position) == 3 and
+                                          all(isinstance(value, str) and value for value in position)):
+            raise pagination.PaginationError('Invalid cursor')
+
+    return state
+
+
+def query_feed(table, limit, cursor=None, newest=None, oldest=None, max_buckets=None, **query_kwargs):
+    """
+    Walks the month buckets newest-first with one Query per shard, stopping as soon as the page is full.
+    Returns the page of items and the state for the next cursor, or None once the oldest month is drained.
+    """
+    shards = bucket_shards()
+    max_buckets = max_buckets or int(os.getenv('FEED_MAX_BUCKETS', DEFAULT_MAX_BUCKETS))
+
+    state = cursor or {'b': newest, 'k': {}}
+    month = state['b']
+    start_keys = start_keys_of(bucket_keys(month, shards), state['k'])
+
+    items = []
+    buckets_read = 0
+
+    while month >= oldest and len(items) < limit and buckets_read < max_buckets:
+        page, start_keys, drained = query_bucket(table, bucket_keys(month, shards), limit - len(items),
+                                                 start_keys, **query_kwargs)
+        items.extend(page)
+
+        if drained:
+            month = previous_month(month)
+            start_keys = {}
+            buckets_read += 1
+
+    if month < oldest:
+        return items, None
+
+    return items, {'b': month, 'k': positions_of(bucket_keys(month, shards), start_keys)}
+
+
+def start_keys_of(partitions, positions):
+    """
+    Rebuilds the start key of every shard in a cursor from its partition and (DateCreated, PostID, Author)
+    """
+    start_keys = {}
+    for shard, position in positions.items():
+        partition = partitions[int(shard)]
+        start_keys[partition] = position if position is False else {
+            'DateBucket': partition, 'DateCreated': position[0], 'PostID': position[1], 'Author': position[2]
+        }
+
+    return start_keys
+
+
+def positions_of(partitions, start_keys):
+    """
+    Shrinks the start keys of a month's shards to what a cursor needs, the partition follows from the month
+    """
+    return {str(partitions.index(partition)): key if key is False else
+            [key['DateCreated'], key['PostID'], key['Author']]
+            for partition, key in start_keys.items()}
+
+
+def query_bucket(table, partitions, limit, start_keys, **query_kwargs):
+    """
+    Reads up to limit items from the shards of one month and merges them newest-first.
+    Returns the merged items, the start key of every shard that was read (False once drained)
+    and whether the whole month is drained.
+    """
+    fetched = []
+    next_keys = {}
+
+    for partition in partitions:
+        start_key = start_keys.get(partition)
+        if start_key is False:
+            next_keys[partition] = False
+            continue
+
+        kwargs = dict(
+            IndexName=INDEX_NAME,
+            KeyConditionExpression=Key('DateBucket').eq(partition),
+            ScanIndexForward=False,
+            Limit=limit,
+            **query_kwargs
+        )
+        if start_key:
+            kwargs['ExclusiveStartKey'] = start_key
+
+        response = table.query(**kwargs)
+
+        fetched.extend((partition, item) for item in response['Items'])
+        next_keys[partition] = response.get('LastEvaluatedKey') or False
+
+    fetched.sort(key=lambda pair: (pair[1]['DateCreated'], pair[1]['PostID']), reverse=True)
+    page, overflow = fetched[:limit], fetched[limit:]
+
+    # Shards with items past the end of the page resume right after their last item on the page
+    last_kept = {partition: item for partition, item in page}
+    for partition in {partition for partition, _ in overflow}:
+        if partition in last_kept:
+            next_keys[partition] = key_of(last_kept[partition])
+        elif start_keys.get(partition):
+            next_keys[partition] = start_keys[partition]
+        else:
+            del next_keys[partition]
+
+    drained = len(next_keys) == len(partitions) and all(key is False for key in next_keys.values())
+
+    return [item for _, item in page], next_keys, drained
+
+
+def key_of(item):
+    return {name: item[name] for name in INDEX_KEYS}
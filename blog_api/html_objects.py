@@ -0,0 +1,84 @@
+"""
+Post HTML as stored in the posts bucket: encoded once when it is written and addressed by a hash of the HTML,
+
+    <author>/<slug>.<digest>.html
+
+so an object never changes after it is written and readers may cache it for a year. A new render is a new
+object and HtmlURL moves to it. HTML_ENCODING picks the stored coding: gzip (the default, which every client
+decodes), br when brotli is installed, else gzip, or identity.
+"""
+import os
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP = 'gzip'
+BROTLI = 'br'
+IDENTITY = 'identity'
+
+CONTENT_TYPE = 'text/html; charset=utf-8'
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def encoding():
+    name = os.getenv('HTML_ENCODING', GZIP).lower()
+    if name not in (GZIP, BROTLI, IDENTITY):
+        raise ValueError('Unknown HTML_ENCODING {}'.format(name))
+    if name == BROTLI and brotli is None:
+        return GZIP
+
+    return name
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def versioned_key(base_key, html_digest):
+    """
+    author/slug.html becomes author/slug.<digest>.html
+    """
+    return '{}.{}.html'.format(base_key[:-len('.html')] if base_key.endswith('.html') else base_key, html_digest)
+
+
+def encode(html):
+    """
+    Returns the stored body, its coding and the digest of the HTML. The objects are written once and read
+    many times, so they get the highest compression levels by default
+    """
+    data = html.encode('utf-8')
+    coding = encoding()
+
+    if coding == BROTLI:
+        body = brotli.compress(data, quality=int(os.getenv('HTML_BROTLI_QUALITY', '11')))
+    elif coding == GZIP:
+        # mtime=0 keeps the bytes of equal HTML equal
+        body = gzip.compress(data, compresslevel=int(os.getenv('HTML_GZIP_LEVEL', '9')), mtime=0)
+    else:
+        body = data
+
+    return body, coding, digest(data)
+
+
+def decode(body, coding):
+    if coding == BROTLI:
+        return brotli.decompress(body).decode('utf-8')
+    if coding == GZIP:
+        return gzip.decompress(body).decode('utf-8')
+
+    return body.decode('utf-8')
+
+
+def object_args(coding):
+    """
+    Headers S3 serves the object with
+    """
+    args = {'ContentType': CONTENT_TYPE, 'CacheControl': CACHE_CONTROL}
+    if coding != IDENTITY:
+        args['ContentEncoding'] = coding
+
+    return args
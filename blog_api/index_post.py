@@ -0,0 +1,58 @@
+"""
+Lambda function to update the search index of a post after it was stored
+"""
+import os
+
+import cache
+import clients
+import content_store
+import instrumentation
+import log
+import search_index
+
+logger = log.get_logger()
+
+INDEXED_FIELDS = 'PostID, Author, Title, Description, Content, ContentRef'
+
+
+@instrumentation.instrumented
+def index_post_handler(event, context):
+    """
+    Indexes the post publishing or update_post hands over asynchronously as it is stored now, so a handover that
+    arrives after a later one indexes the same version
+    """
+    try:
+        log.start(context)
+        logger.debug('Event', extra=log.data(event=event))
+
+        table_name = os.getenv('POSTS_TABLE')
+        search_table_name = search_index.search_table_name()
+        if not table_name or not search_table_name:
+            raise Exception('Table name missing')
+
+        dynamodb = clients.get_resource('dynamodb')
+        table = dynamodb.Table(table_name)
+
+        with instrumentation.phase('get_item'):
+            item = table.get_item(Key={'PostID': event['PostID'], 'Author': event['Author']},
+                                  ProjectionExpression=INDEXED_FIELDS).get('Item')
+
+        if item is None:
+            # Deleted since, delete_post removed its postings
+            logger.info('Post gone', extra=log.data(post_id=event['PostID']))
+            return {'indexed': False}
+
+        with instrumentation.phase('search_index'):
+            search_index.index_post(dynamodb.Table(search_table_name), content_store.load(item))
+
+        # Warm search containers cache postings by table version, the write that handed the post over is older
+        with instrumentation.phase('invalidate'):
+            cache.bump_table_version(table)
+
+        logger.info('Indexed', extra=log.data(post_id=event['PostID']))
+
+        return {'indexed': True}
+
+    except Exception as error:
+        logger.exception('Unhandled error')
+        raise error
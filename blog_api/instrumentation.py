@@ -0,0 +1,247 @@
+"""
+Per-invocation latency and resource metrics for the handlers, emitted as CloudWatch Embedded Metric Format.
+
+    @instrumentation.instrumented
+    def handler(event, context):
+        with instrumentation.phase('parse'):
+            ...
+
+Every invocation records its duration, cold or warm start, request and response payload sizes, the wall time
+of each phase and the DynamoDB capacity consumed by the shared clients. METRICS_NAMESPACE names the
+CloudWatch namespace and METRICS_ENABLED=false turns the output off.
+
+The current invocation is tracked per thread (and per asyncio task), so handlers running concurrently in one
+process each record their own metrics. Work handed to a thread pool reports to the submitting invocation when
+it is wrapped in propagate:
+
+    executor.map(instrumentation.propagate(load), items)
+"""
+import os
+import json
+import time
+import threading
+import functools
+import contextlib
+import contextvars
+
+DEFAULT_NAMESPACE = 'ServerlessBlog'
+
+# Operations that accept ReturnConsumedCapacity
+CAPACITY_OPERATIONS = frozenset(['GetItem', 'PutItem', 'UpdateItem', 'DeleteItem', 'Query', 'Scan', 'BatchGetItem',
+                                 'BatchWriteItem', 'TransactGetItems', 'TransactWriteItems'])
+
+_cold_start = True
+_current = contextvars.ContextVar('instrumentation_invocation', default=None)
+_collectors = []
+
+
+class Invocation:
+    """
+    Metrics of one handler invocation, phases and capacity may be added from worker threads
+    """
+
+    def __init__(self, function_name, request_id, cold_start):
+        self.function_name = function_name
+        self.request_id = request_id
+        self.cold_start = cold_start
+        self.started_at = time.perf_counter()
+        self.phases = {}
+        self.capacity = 0.0
+        self.dynamodb_calls = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.custom = {}
+        self.units = {}
+        self.lock = threading.Lock()
+
+    def add_phase(self, name, milliseconds):
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + milliseconds
+
+    def add_capacity(self, units):
+        with self.lock:
+            self.capacity += units
+            self.dynamodb_calls += 1
+
+    def add_metric(self, name, value, unit):
+        with self.lock:
+            self.custom[name] = self.custom.get(name, 0) + value
+            self.units[name] = unit
+
+    def metrics(self):
+        values = {
+            'Duration': (time.perf_counter() - self.started_at) * 1000,
+            'ColdStart': 1 if self.cold_start else 0,
+            'ConsumedCapacity': self.capacity,
+            'DynamoDBCalls': self.dynamodb_calls,
+            'RequestBytes': self.request_bytes,
+            'ResponseBytes': self.response_bytes
+        }
+        values.update(('Phase.' + name, milliseconds) for name, milliseconds in self.phases.items())
+        values.update(self.custom)
+
+        return values
+
+
+def unit(metric):
+    if metric == 'Duration' or metric.startswith('Phase.'):
+        return 'Milliseconds'
+    if metric.endswith('Bytes'):
+        return 'Bytes'
+
+    return 'Count'
+
+
+def to_emf(invocation):
+    """
+    Builds the Embedded Metric Format document CloudWatch extracts the metrics from
+    """
+    metrics = {name: round(value, 3) for name, value in invocation.metrics().items()}
+
+    document = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': os.getenv('METRICS_NAMESPACE', DEFAULT_NAMESPACE),
+                'Dimensions': [['FunctionName']],
+                'Metrics': [{'Name': name, 'Unit': invocation.units.get(name) or unit(name)} for name in metrics]
+            }]
+        },
+        'FunctionName': invocation.function_name,
+        'RequestId': invocation.request_id
+    }
+    document.update(metrics)
+
+    return document
+
+
+def payload_size(payload):
+    """
+    Size in bytes of an API Gateway body, or of the whole event or result for other event sources
+    """
+    if payload is None:
+        return 0
+
+    if isinstance(payload, dict) and isinstance(payload.get('body'), str):
+        return len(payload['body'])
+
+    return len(json.dumps(payload, default=str))
+
+
+def emit(invocation):
+    document = to_emf(invocation)
+
+    for collector in _collectors:
+        collector.append(document)
+
+    if os.getenv('METRICS_ENABLED', 'true').lower() == 'true':
+        # Lambda ships stdout to CloudWatch Logs, where an EMF line becomes metrics
+        print(json.dumps(document))
+
+
+def instrumented(handler):
+    """
+    Decorates a Lambda handler so each invocation emits its metrics
+    """
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        global _cold_start
+
+        invocation = Invocation(
+            getattr(context, 'function_name', None) or os.getenv('AWS_LAMBDA_FUNCTION_NAME') or handler.__name__,
+            getattr(context, 'aws_request_id', None),
+            _cold_start
+        )
+        _cold_start = False
+        token = _current.set(invocation)
+
+        try:
+            invocation.request_bytes = payload_size(event)
+            response = handler(event, context)
+            invocation.response_bytes = payload_size(response)
+
+            return response
+        finally:
+            _current.reset(token)
+            emit(invocation)
+
+    return wrapper
+
+
+def propagate(function):
+    """
+    Wraps a function run on a worker thread so its phases and capacity count towards the invocation that
+    wrapped it and its records carry the invocation's log context, pool threads don't inherit either
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time, every call runs in a copy
+        return context.copy().run(function, *args, **kwargs)
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def phase(name):
+    """
+    Times a block of the current invocation, repeated phases add up
+    """
+    invocation = _current.get()
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        if invocation is not None:
+            invocation.add_phase(name, (time.perf_counter() - start) * 1000)
+
+
+def add_metric(name, value=1, unit='Count'):
+    """
+    Adds to a custom metric of the current invocation, repeated calls add up
+    """
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.add_metric(name, value, unit)
+
+
+def request_capacity(params, model, **kwargs):
+    if model.name in CAPACITY_OPERATIONS:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def record_capacity(parsed, model, **kwargs):
+    invocation = _current.get()
+    if invocation is None or model.name not in CAPACITY_OPERATIONS:
+        return
+
+    consumed = parsed.get('ConsumedCapacity') or []
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+
+    invocation.add_capacity(sum(float(entry.get('CapacityUnits', 0)) for entry in consumed))
+
+
+def attach(client):
+    """
+    Hooks a DynamoDB client so every call reports its consumed capacity to the current invocation
+    """
+    client.meta.events.register('provide-client-params.dynamodb', request_capacity)
+    client.meta.events.register('after-call.dynamodb', record_capacity)
+
+
+@contextlib.contextmanager
+def collect():
+    """
+    Collects the EMF documents emitted inside the block, so tests can assert on them
+    """
+    documents = []
+    _collectors.append(documents)
+
+    try:
+        yield documents
+    finally:
+        _collectors.remove(documents)
@@ -1,64 +1,132 @@
 """
 Lambda function to list posts
 """
-# TODO: Add pagination
-# TODO: Add filtering
-
 import os
 import json
-import logging
 
-import boto3
+import apigw
+import batch
+import cache
+import clients
+import content_store
+import feed
+import instrumentation
+import log
+import pagination
+import projection
+import serialization
+import tags
+
+logger = log.get_logger()
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+read_cache = cache.TTLCache.from_env()
+table_version = cache.TableVersion()
 
 
+@instrumentation.instrumented
 def list_posts_handler(event, context):
     """
-    Lists blog posts from DynamoDB
+    Lists one page of blog posts from DynamoDB, newest first.
+    The month query parameter (or from/to) restricts the listing to an archive of months,
+    tag=a,b with match=any|all lists tagged posts from the tag index,
+    and fields picks the returned attributes instead of the summary projection.
+    The indexes only hold the summary, other fields are read from the posts table for the page.
     """
 
     try:
-        logger.info("Event: {}".format(event))
+        log.start(context)
+        logger.debug('Event', extra=log.data(event=event))
 
         table_name = os.getenv('POSTS_TABLE')
         if not table_name:
             raise Exception('Table name missing')
 
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(table_name)
+        query_params = event.get('queryStringParameters') or {}
 
-        items = table.scan()
+        try:
+            limit = pagination.parse_limit(query_params.get('limit'))
 
-        logger.info('DDB Response: {}'.format(items))
+            month = feed.parse_month(query_params.get('month'))
+            newest = month or feed.parse_month(query_params.get('to')) or feed.current_month()
+            oldest = month or feed.parse_month(query_params.get('from')) or \
+                os.getenv('FEED_START_MONTH', feed.DEFAULT_START_MONTH)
 
-        if 'Items' in items:
-            response = {
-                'statusCode': 200,
-                'headers': {
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'OPTIONS,GET'
-                },
-                'body': json.dumps(items['Items'])
-            }
-        else:
-            response = {
-                'statusCode': items['HTTPStatusCode'],
+            tag_filter = tags.parse_tags(query_params.get('tag'))
+            match = tags.parse_match(query_params.get('match'))
+
+            if tag_filter:
+                cursor = tags.decode_tag_cursor(query_params.get('cursor'))
+            else:
+                cursor = feed.decode_feed_cursor(query_params.get('cursor'), newest, oldest)
+
+            fields = projection.parse_fields(query_params.get('fields'), default=projection.SUMMARY_FIELDS)
+        except (pagination.PaginationError, projection.ProjectionError) as error:
+            logger.info('Bad request', extra=log.data(error=str(error)))
+
+            return {
+                'statusCode': 400,
                 'headers': {
                     'Access-Control-Allow-Headers': 'Content-Type',
                     'Access-Control-Allow-Origin': '*',
                     'Access-Control-Allow-Methods': 'OPTIONS,GET'
                 },
+                'body': json.dumps({'message': str(error)})
             }
 
-        logger.info("Response: %s", response)
+        dynamodb = clients.get_resource('dynamodb')
+        table = dynamodb.Table(table_name)
+
+        def load_page():
+            with instrumentation.phase('query'):
+                if tag_filter:
+                    tags_table = dynamodb.Table(tags.tags_table_name())
+                    items, next_state = tags.query_tags(tags_table, tag_filter, match, limit, after=cursor,
+                                                        newest=newest, oldest=oldest)
+                else:
+                    index_fields = fields if projection.in_index(fields) else ()
+                    items, next_state = feed.query_feed(table, limit, cursor=cursor, newest=newest, oldest=oldest,
+                                                        **projection.projection_kwargs(index_fields,
+                                                                                       required=feed.INDEX_KEYS))
+
+            logger.debug('DDB items', extra=log.data(count=len(items)))
+
+            if not projection.in_index(fields):
+                with instrumentation.phase('batch_get'):
+                    items = read_posts(dynamodb, table_name, items, fields)
+
+            if content_store.reads_content(fields):
+                content_store.load_all(items)
+
+            with instrumentation.phase('serialize'):
+                return serialization.dumps({
+                    'items': [projection.select_fields(item, fields) for item in items],
+                    'next_cursor': pagination.encode_cursor(next_state)
+                })
+
+        cache_key = ('list', limit, query_params.get('cursor'), newest, oldest, fields, tag_filter, match)
+        body = cache.read_through(read_cache, table_version, table, cache_key, load_page)
+
+        logger.debug('Cache stats', extra=log.data(**read_cache.stats()))
+
+        response = {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'OPTIONS,GET'
+            },
+            'body': body
+        }
+
+        with instrumentation.phase('encode'):
+            response = apigw.compress_response(event, apigw.conditional_response(event, response))
+
+        logger.info('Response', extra=log.summary(response))
 
         return response
 
-    except Exception as error:
-        logger.info('Error: {}'.format(error))
+    except Exception:
+        logger.exception('Unhandled error')
 
         return {
             "statusCode": 500,
@@ -69,3 +137,16 @@ def list_posts_handler(event, context):
             },
             "body": {"message": 'Internal server error'}
         }
+
+
+def read_posts(dynamodb, table_name, items, fields):
+    """
+    Reads the fields the index doesn't hold for a page of index items, keeping the page order and dropping
+    posts deleted since
+    """
+    required = ('PostID', 'Author') + content_store.required_fields(fields)
+    posts = batch.batch_get(dynamodb, table_name, [{'PostID': item['PostID'], 'Author': item['Author']}
+                                                   for item in items],
+                            **projection.projection_kwargs(fields, required=required))
+
+    return [posts[(item['PostID'], item['Author'])] for item in items if (item['PostID'], item['Author']) in posts]
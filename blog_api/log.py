@@ -0,0 +1,146 @@
+"""
+Structured JSON logging shared by the handlers.
+
+Payloads go in as extra fields (logger.debug('Event', extra=log.data(event=event))) and are only serialized,
+and truncated to LOG_MAX_FIELD_BYTES, when the record is actually emitted. LOG_LEVEL sets the level of a
+function and LOG_DEBUG_SAMPLE_RATE turns on debug detail for that fraction of invocations. The request id and
+the sampled level belong to the invocation's context, so invocations sharing a process don't see each other's.
+"""
+import os
+import json
+import random
+import logging
+import contextvars
+
+DEFAULT_LEVEL = 'INFO'
+DEFAULT_MAX_FIELD_BYTES = 2048
+
+# Library loggers inherit the root level, sampled debug invocations shouldn't dump their wire traces
+QUIET_LOGGERS = ('boto3', 'botocore', 'urllib3', 's3transfer')
+
+# Fields added to every record of the invocation and the level it logs at, see start
+_invocation = contextvars.ContextVar('log_invocation', default=None)
+_configured = False
+
+
+def data(**fields):
+    """
+    Wraps structured fields for the extra argument of a logging call
+    """
+    return {'data': fields}
+
+
+def summary(response):
+    """
+    Fields describing an API Gateway response without logging its body
+    """
+    return data(status=response.get('statusCode'), body_bytes=len(response.get('body') or ''))
+
+
+def truncate(text, limit):
+    if limit and len(text) > limit:
+        return '{}...[{} bytes truncated]'.format(text[:limit], len(text) - limit)
+
+    return text
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, with the invocation's request id
+    """
+
+    def format(self, record):
+        limit = int(os.getenv('LOG_MAX_FIELD_BYTES', DEFAULT_MAX_FIELD_BYTES))
+
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'message': truncate(record.getMessage(), limit)
+        }
+        invocation = _invocation.get()
+        if invocation:
+            entry.update(invocation['fields'])
+
+        for name, value in (getattr(record, 'data', None) or {}).items():
+            if not isinstance(value, (int, float, bool)) and value is not None:
+                value = truncate(value if isinstance(value, str) else json.dumps(value, default=str), limit)
+            entry[name] = value
+
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
+class InvocationFilter(logging.Filter):
+    """
+    Drops records below the level of the current invocation, LOG_LEVEL outside of one
+    """
+
+    def filter(self, record):
+        invocation = _invocation.get()
+
+        return record.levelno >= (invocation['level'] if invocation else configured_level())
+
+
+def configured_level():
+    level = logging.getLevelName(os.getenv('LOG_LEVEL', DEFAULT_LEVEL).upper())
+
+    return level if isinstance(level, int) else logging.INFO
+
+
+def sample_rate():
+    return float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '0'))
+
+
+def lowest_level():
+    """
+    The most detailed level any invocation logs at, records below it aren't created at all
+    """
+    return logging.DEBUG if sample_rate() > 0 else configured_level()
+
+
+def get_logger():
+    """
+    Returns the root logger with JSON formatting, the Lambda runtime attaches its handler to the root logger
+    """
+    global _configured
+
+    logger = logging.getLogger()
+
+    if not _configured:
+        if not logger.handlers:
+            logger.addHandler(logging.StreamHandler())
+        for handler in logger.handlers:
+            if not isinstance(handler.formatter, JsonFormatter):
+                handler.setFormatter(JsonFormatter())
+
+        logger.addFilter(InvocationFilter())
+        logger.setLevel(lowest_level())
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+        _configured = True
+
+    return logger
+
+
+def start(context):
+    """
+    Called at the top of each invocation: tags records with the request id and decides whether this
+    invocation logs debug detail
+    """
+    rate = sample_rate()
+    sampled = rate > 0 and random.random() < rate
+
+    fields = {}
+    request_id = getattr(context, 'aws_request_id', None)
+    if request_id:
+        fields['request_id'] = request_id
+    if sampled:
+        fields['sampled'] = True
+
+    _invocation.set({'fields': fields, 'level': logging.DEBUG if sampled else configured_level()})
+
+    # Only follows the configuration, the same for every invocation
+    logging.getLogger().setLevel(lowest_level())
@@ -0,0 +1,84 @@
+"""
+Helpers for cursor based pagination of DynamoDB reads
+"""
+import json
+import base64
+import binascii
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_CURSOR_LENGTH = 1024
+
+
+class PaginationError(Exception):
+    """
+    Raised when a limit or cursor query parameter is invalid
+    """
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    """
+    Parses the limit query parameter, falling back to the default page size
+    """
+    if value is None or value == '':
+        return default
+
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError('Invalid limit')
+
+    if limit < 1 or limit > maximum:
+        raise PaginationError('Limit must be between 1 and {}'.format(maximum))
+
+    return limit
+
+
+def encode_cursor(key):
+    """
+    Encodes pagination state such as a LastEvaluatedKey as an opaque, URL safe cursor
+    """
+    if not key:
+        return None
+
+    raw = json.dumps(key, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, key_names=None, max_length=MAX_CURSOR_LENGTH):
+    """
+    Decodes a cursor back into a dict, checking that it only holds the expected key attributes when given
+    """
+    if cursor is None or cursor == '':
+        return None
+
+    if len(cursor) > max_length:
+        raise PaginationError('Invalid cursor')
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        state = json.loads(raw.decode('utf-8'))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise PaginationError('Invalid cursor')
+
+    if not isinstance(state, dict):
+        raise PaginationError('Invalid cursor')
+
+    if key_names is not None:
+        validate_key(state, key_names)
+
+    return state
+
+
+def validate_key(key, key_names):
+    """
+    Checks that a decoded start key holds exactly the given string key attributes
+    """
+    if not isinstance(key, dict) or set(key) != set(key_names):
+        raise PaginationError('Invalid cursor')
+
+    if not all(isinstance(value, str) and value for value in key.values()):
+        raise PaginationError('Invalid cursor')
+
+    return key
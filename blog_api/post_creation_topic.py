@@ -3,25 +3,27 @@ Lambda function used for post creation SNS topic
 """
 import os
 import json
-import logging
 
-import boto3
+import clients
+import instrumentation
+import log
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = log.get_logger()
 
 
+@instrumentation.instrumented
 def post_creation_topic_handler(event, context):
     """
     Handles post creation SNS topic
     """
     try:
-        logger.info("Event: {}".format(event))
+        log.start(context)
+        logger.debug('Event', extra=log.data(event=event))
 
-        sns_client = boto3.client('sns')
+        sns_client = clients.get_client('sns')
         topic_arn = os.getenv('TOPIC_ARN')
 
-        logger.info('Topic ARN: {}'.format(topic_arn))
+        logger.debug('Topic ARN', extra=log.data(topic_arn=topic_arn))
 
         if 'Records' in event:
             for record in event['Records']:
@@ -30,11 +32,9 @@ def post_creation_topic_handler(event, context):
                 subject = record['Sns']['Subject']
                 timestamp = record['Sns']['Timestamp']
 
-                print('Received SNS message:')
-                print('Message ID:', message_id)
-                print('Subject:', subject)
-                print('Timestamp:', timestamp)
-                print('Message:', message)
+                logger.info('Received SNS message', extra=log.data(message_id=message_id, subject=subject,
+                                                                   timestamp=timestamp))
+                logger.debug('SNS message', extra=log.data(message=message))
 
             return {
                 'statusCode': 200,
@@ -51,9 +51,9 @@ def post_creation_topic_handler(event, context):
                 )
 
                 if response['ResponseMetadata']['HTTPStatusCode'] == 200:
-                    print('Subscription confirmed successfully.')
+                    logger.info('Subscription confirmed')
                 else:
-                    print('Failed to confirm subscription:', response)
+                    logger.warning('Failed to confirm subscription', extra=log.data(response=response))
 
                 return {
                     'statusCode': 200,
@@ -61,5 +61,5 @@ def post_creation_topic_handler(event, context):
                 }
 
     except Exception as error:
-        logger.info('Error: {}'.format(error))
+        logger.exception('Unhandled error')
         raise error
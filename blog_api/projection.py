@@ -0,0 +1,66 @@
+"""
+Helpers to turn a fields query parameter into a DynamoDB ProjectionExpression
+"""
+POST_FIELDS = ('PostID', 'Title', 'Slug', 'Description', 'Author', 'Content', 'Tags', 'DateCreated',
+               'DateUpdated', 'HtmlURL')
+
+SUMMARY_FIELDS = ('PostID', 'Title', 'Slug', 'Description', 'Tags', 'DateCreated', 'HtmlURL')
+
+# Attributes the date and tag indexes hold, listings asking for others read the posts from the table
+INDEX_FIELDS = SUMMARY_FIELDS + ('Author',)
+
+
+class ProjectionError(Exception):
+    """
+    Raised when the fields query parameter names an unknown attribute
+    """
+
+
+def parse_fields(value, default=None):
+    """
+    Parses a comma separated fields query parameter, returning the default when it is missing
+    """
+    if value is None or value.strip() == '':
+        return default
+
+    fields = []
+    for field in value.split(','):
+        field = field.strip()
+        if field not in POST_FIELDS:
+            raise ProjectionError('Unknown field: {}'.format(field[:64]))
+        if field not in fields:
+            fields.append(field)
+
+    return tuple(fields)
+
+
+def in_index(fields):
+    """
+    Whether a listing of these fields is served from the index items alone
+    """
+    return fields is not None and set(fields) <= set(INDEX_FIELDS)
+
+
+def projection_kwargs(fields, required=()):
+    """
+    Builds the ProjectionExpression arguments for a read, always including the required attributes
+    """
+    if fields is None:
+        return {}
+
+    names = list(fields) + [name for name in required if name not in fields]
+
+    return {
+        'ProjectionExpression': ', '.join('#f{}'.format(i) for i in range(len(names))),
+        'ExpressionAttributeNames': {'#f{}'.format(i): name for i, name in enumerate(names)}
+    }
+
+
+def select_fields(item, fields):
+    """
+    Drops attributes that were only read for bookkeeping, such as the keys a cursor needs
+    """
+    if fields is None:
+        return item
+
+    return {name: item[name] for name in fields if name in item}
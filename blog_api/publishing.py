@@ -0,0 +1,336 @@
+"""
+Stores a validated post: the rendered HTML goes to the posts bucket and the post item to the posts table, then the
+tag and search indexes are updated.
+
+PUBLISH_MODE selects the path validate_post takes. stepfunctions (the default) starts the MarkDownWorkFlow state
+machine, which runs SanitizeMarkdown and MarkdownToHtml as two more invocations and publishes to the topic.
+inline renders, stores and publishes within the validate_post invocation.
+
+Post items carry the ContentHash of the Markdown they were rendered from. update_post re-renders the HTML only
+when an update changes it, in the same invocation with RERENDER_MODE=sync or through an asynchronous invoke of
+RERENDER_FUNCTION with RERENDER_MODE=async. SEARCH_INDEX_MODE and SEARCH_INDEX_FUNCTION choose the same way for
+search indexing, which writes an item per indexed term.
+
+HTML objects are immutable, see html_objects: a render is stored under a key of its own and HtmlURL moves to it
+in a single conditional update once the object exists, so readers see either the old or the new page.
+"""
+import os
+import json
+
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+import cache
+import claim_check
+import clients
+import content_store
+import feed
+import html_objects
+import instrumentation
+import log
+import rendering
+import search_index
+import tags
+
+STEP_FUNCTIONS = 'stepfunctions'
+INLINE = 'inline'
+
+SYNC = 'sync'
+ASYNC = 'async'
+
+PUBLISHED_MESSAGE = 'Post created successfully'
+
+logger = log.get_logger()
+
+
+def publish_mode():
+    mode = os.getenv('PUBLISH_MODE', STEP_FUNCTIONS).lower()
+    if mode not in (STEP_FUNCTIONS, INLINE):
+        raise ValueError('Unknown PUBLISH_MODE {}'.format(mode))
+
+    return mode
+
+
+def rerender_mode():
+    mode = os.getenv('RERENDER_MODE', SYNC).lower()
+    if mode not in (SYNC, ASYNC):
+        raise ValueError('Unknown RERENDER_MODE {}'.format(mode))
+
+    return mode
+
+
+def search_index_mode():
+    mode = os.getenv('SEARCH_INDEX_MODE', SYNC).lower()
+    if mode not in (SYNC, ASYNC):
+        raise ValueError('Unknown SEARCH_INDEX_MODE {}'.format(mode))
+
+    return mode
+
+
+def html_key(post):
+    return post['author'] + '/' + post['slug'] + '.html'
+
+
+def html_url(bucket_name, key):
+    return f'https://{bucket_name}.s3.amazonaws.com/{key}'
+
+
+def stored_html_key(item):
+    """
+    Key of the HTML a post item points at
+    """
+    if '.s3.amazonaws.com/' in item.get('HtmlURL', ''):
+        return item['HtmlURL'].split('.s3.amazonaws.com/', 1)[1]
+
+    return html_key({'author': item['Author'], 'slug': item['Slug']})
+
+
+def post_item(post, bucket_name, content, key):
+    """
+    Builds the posts table item of a post in the state machine's payload format
+    """
+    return {
+        'PostID': post['post_id'],
+        'Title': post['title'],
+        'Slug': post['slug'],
+        'Description': post['description'],
+        'Author': post['author'],
+        'Content': content,
+        'DateCreated': post['date_created'],
+        'DateBucket': feed.date_bucket(post['date_created'], post['post_id']),
+        'DateUpdated': post['date_updated'],
+        'Tags': post['tags'],
+        'ContentHash': rendering.content_hash(content),
+        'HtmlURL': html_url(bucket_name, key)
+    }
+
+
+def store(post):
+    """
+    Uploads the sanitized HTML and writes the post item concurrently, neither depends on the other's result,
+    then indexes the post. Returns the post item.
+
+    Checked in HTML (html_ref) is already encoded and is copied from the workflow bucket within S3 instead of
+    passing through here.
+    """
+    bucket_name = os.getenv('POSTS_BUCKET')
+    if not bucket_name:
+        raise Exception('Bucket name missing')
+
+    if 'html_ref' in post and 'digest' not in post['html_ref']:
+        # Checked in before the workflow stored HTML encoded
+        post = dict(post, sanitized_html=claim_check.check_out(post['html_ref']))
+        del post['html_ref']
+
+    if 'html_ref' in post:
+        body, coding, html_digest = None, post['html_ref']['encoding'], post['html_ref']['digest']
+    else:
+        with instrumentation.phase('encode'):
+            body, coding, html_digest = html_objects.encode(post['sanitized_html'])
+
+    key = html_objects.versioned_key(html_key(post), html_digest)
+
+    s3 = clients.get_client('s3')
+    ddb = clients.get_resource('dynamodb')
+    table = ddb.Table(os.getenv('POSTS_TABLE'))
+    item = post_item(post, bucket_name, claim_check.content_of(post), key)
+
+    def put_object():
+        if 'html_ref' in post:
+            with instrumentation.phase('copy_object'):
+                return s3.copy_object(
+                    CopySource={'Bucket': post['html_ref']['bucket'], 'Key': post['html_ref']['key']},
+                    Bucket=bucket_name,
+                    Key=key,
+                    MetadataDirective='REPLACE',
+                    ACL='public-read',
+                    **html_objects.object_args(coding)
+                )
+
+        with instrumentation.phase('put_object'):
+            return s3.put_object(
+                Bucket=bucket_name,
+                Key=key,
+                Body=body,
+                ACL='public-read',
+                **html_objects.object_args(coding)
+            )
+
+    def put_item():
+        # Large content goes to the content bucket first, the item must not point at a missing object
+        stored = dict(item, **content_store.content_attributes(item['PostID'], item['Content']))
+        if content_store.CONTENT_REF in stored:
+            del stored[content_store.CONTENT]
+
+        with instrumentation.phase('put_item'):
+            table.put_item(Item=stored)
+
+        return stored
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        upload = executor.submit(instrumentation.propagate(put_object))
+        write = executor.submit(instrumentation.propagate(put_item))
+
+    if upload.exception() and not write.exception():
+        # Don't leave a post whose HTML was never stored
+        table.delete_item(Key={'PostID': item['PostID'], 'Author': item['Author']})
+        content_store.delete(write.result().get(content_store.CONTENT_REF))
+    for future in (upload, write):
+        future.result()
+
+    logger.debug('Stored', extra=log.data(key=key))
+
+    tags_table_name = tags.tags_table_name()
+    if tags_table_name:
+        with instrumentation.phase('tags'):
+            tags.sync_post_tags(ddb.Table(tags_table_name), None, item)
+
+    request_search_index(item)
+
+    with instrumentation.phase('invalidate'):
+        cache.bump_table_version(table)
+
+    return item
+
+
+def rerender(item):
+    """
+    Renders the content of a post item again, stores it and points HtmlURL at it. Returns the new HtmlURL, or
+    None when the content changed again in the meantime.
+    """
+    bucket_name = os.getenv('POSTS_BUCKET')
+    if not bucket_name:
+        raise Exception('Bucket name missing')
+
+    key = put_html(bucket_name, html_key({'author': item['Author'], 'slug': item['Slug']}),
+                   rendering.render(item['Content']))
+
+    url = html_url(bucket_name, key)
+    if not point_at(os.getenv('POSTS_TABLE'), item, url):
+        logger.info('Superseded', extra=log.data(key=key))
+        return None
+
+    logger.debug('Rerendered', extra=log.data(key=key))
+
+    return url
+
+
+def put_html(bucket_name, base_key, html):
+    """
+    Stores an encoded version of the HTML next to base_key and returns its key
+    """
+    with instrumentation.phase('encode'):
+        body, coding, html_digest = html_objects.encode(html)
+
+    key = html_objects.versioned_key(base_key, html_digest)
+
+    with instrumentation.phase('put_object'):
+        clients.get_client('s3').put_object(
+            Bucket=bucket_name,
+            Key=key,
+            Body=body,
+            ACL='public-read',
+            **html_objects.object_args(coding)
+        )
+
+    return key
+
+
+def point_at(table_name, item, url):
+    """
+    Moves HtmlURL to a stored version, unless the post's content changed since the item was read or the post
+    is gone, and the copies in the tag index after it. Returns whether it did.
+    """
+    if item.get('HtmlURL') == url:
+        return True
+
+    condition, values = 'attribute_exists(PostID)', {':u': url}
+    if 'ContentHash' in item:
+        condition, values = 'ContentHash = :h', dict(values, **{':h': item['ContentHash']})
+
+    try:
+        with instrumentation.phase('update_item'):
+            clients.get_resource('dynamodb').Table(table_name).update_item(
+                Key={'PostID': item['PostID'], 'Author': item['Author']},
+                UpdateExpression='SET HtmlURL = :u',
+                ConditionExpression=condition,
+                ExpressionAttributeValues=values
+            )
+    except ClientError as error:
+        if error.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False
+
+    tags_table_name = tags.tags_table_name()
+    if tags_table_name:
+        try:
+            with instrumentation.phase('tags'):
+                tags.set_html_url(clients.get_resource('dynamodb').Table(tags_table_name), item, url)
+        except Exception as error:
+            # The post points at the new version, backfill.py tags brings the tag index in line
+            logger.warning('Tag index update failed', extra=log.data(error=str(error)))
+
+    return True
+
+
+def request_rerender(item):
+    """
+    Re-renders now, returning the new HtmlURL, or hands the post to the rerender function, which renders it
+    unless a later update got there
+    """
+    if rerender_mode() == SYNC:
+        return rerender(item)
+
+    payload = {'PostID': item['PostID'], 'Author': item['Author'], 'ContentHash': item['ContentHash']}
+
+    with instrumentation.phase('invoke'):
+        clients.get_client('lambda').invoke(FunctionName=os.getenv('RERENDER_FUNCTION'), InvocationType='Event',
+                                            Payload=json.dumps(payload).encode('utf-8'))
+
+
+def request_search_index(item):
+    """
+    Indexes a post item, which holds its content, now or hands the post to the search index function, which
+    indexes the post as stored by then. A failure is logged, the post is stored and is left out of search
+    results until it is edited or backfilled.
+    """
+    search_table_name = search_index.search_table_name()
+    if not search_table_name:
+        return
+
+    try:
+        if search_index_mode() == SYNC:
+            with instrumentation.phase('search_index'):
+                search_index.index_post(clients.get_resource('dynamodb').Table(search_table_name), item)
+            return
+
+        payload = {'PostID': item['PostID'], 'Author': item['Author']}
+
+        with instrumentation.phase('invoke'):
+            clients.get_client('lambda').invoke(FunctionName=os.getenv('SEARCH_INDEX_FUNCTION'),
+                                                InvocationType='Event', Payload=json.dumps(payload).encode('utf-8'))
+    except Exception as error:
+        logger.warning('Search indexing failed', extra=log.data(error=str(error)))
+
+
+def notify():
+    """
+    Publishes to the post creation topic, as the state machine's PublishToTopic step does
+    """
+    topic_arn = os.getenv('TOPIC_ARN')
+    if not topic_arn:
+        return
+
+    with instrumentation.phase('publish'):
+        clients.get_client('sns').publish(TopicArn=topic_arn, Message=PUBLISHED_MESSAGE)
+
+
+def publish_inline(post):
+    """
+    Renders, stores and announces a post within the current invocation
+    """
+    item = store(dict(post, sanitized_html=rendering.render(post['content'])))
+    notify()
+
+    return item
@@ -0,0 +1,186 @@
+"""
+Markdown rendering shared by the publish paths: Markdown to HTML, then sanitized down to the allowed tags.
+
+The Markdown and Cleaner instances are built once per container and reused. Rendered HTML is memoized by a hash
+of the Markdown and the renderer configuration, so re-submits and retried executions skip parsing: in memory
+(RENDER_CACHE_SIZE entries of at most RENDER_CACHE_MAX_BYTES, RENDER_CACHE_TOTAL_BYTES in all, for
+RENDER_CACHE_TTL seconds) and, when RENDER_CACHE_BUCKET is set, in S3 where other containers find it too.
+"""
+import os
+import json
+import time
+import hashlib
+
+from functools import partial
+
+from botocore.exceptions import ClientError
+
+import cache
+import clients
+import instrumentation
+import log
+
+ALLOWED_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'strong', 'em', 'a', 'img', 'blockquote',
+                'pre', 'code', 'hr', 'br']
+
+ALLOWED_ATTRIBUTES = {'a': ['href', 'title'], 'img': ['src', 'alt']}
+
+RENDER_CACHE_PREFIX = 'renders/'
+RENDER_MS_METADATA = 'render-ms'
+
+logger = log.get_logger()
+
+# Entries hold (html, render_ms), sized by the HTML. Without the byte bound 256 renders of up to 256 KB could
+# take 64 MB of a 128 MB function
+render_cache = cache.TTLCache.from_env('RENDER_CACHE', total_bytes=8 * 1024 * 1024, sizeof=lambda entry: len(entry[0]))
+
+_markdown = None
+_cleaner = None
+_version = None
+
+
+def markdown_renderer():
+    # markdown and bleach are only needed here, importing them lazily keeps them off the module import path
+    global _markdown
+    if _markdown is None:
+        import markdown
+        _markdown = markdown.Markdown()
+
+    return _markdown
+
+
+def cleaner():
+    global _cleaner
+    if _cleaner is None:
+        from bleach.sanitizer import Cleaner
+        from bleach.linkifier import LinkifyFilter
+
+        _cleaner = Cleaner(tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True,
+                           filters=[partial(LinkifyFilter, skip_tags=['pre', 'code'])])
+
+    return _cleaner
+
+
+def renderer_version():
+    """
+    Identifies the renderer output, a change to the allowed markup or the library versions starts a new key space
+    """
+    global _version
+    if _version is None:
+        import bleach
+        import markdown
+
+        configuration = json.dumps([ALLOWED_TAGS, ALLOWED_ATTRIBUTES, markdown.__version__, bleach.__version__],
+                                   sort_keys=True)
+        _version = hashlib.sha256(configuration.encode('utf-8')).hexdigest()[:16]
+
+    return _version
+
+
+def content_hash(markdown_content):
+    """
+    Hash of the Markdown alone, stored on post items as ContentHash
+    """
+    return hashlib.sha256(markdown_content.encode('utf-8')).hexdigest()
+
+
+def render_key(markdown_content):
+    digest = hashlib.sha256(renderer_version().encode('utf-8'))
+    digest.update(markdown_content.encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def to_html(markdown_content):
+    renderer = markdown_renderer()
+
+    with instrumentation.phase('markdown'):
+        try:
+            return renderer.convert(markdown_content)
+        finally:
+            # Drops the parsed document and the state extensions keep between conversions
+            renderer.reset()
+
+
+def sanitize(html_content):
+    with instrumentation.phase('sanitize'):
+        return cleaner().clean(html_content)
+
+
+def render_cache_bucket():
+    return os.getenv('RENDER_CACHE_BUCKET')
+
+
+def max_cached_bytes():
+    return int(os.getenv('RENDER_CACHE_MAX_BYTES', '262144'))
+
+
+def remember(key, html_content, render_ms):
+    if render_cache.enabled and len(html_content) <= max_cached_bytes():
+        render_cache.set(key, (html_content, render_ms))
+
+
+def load_persisted(key):
+    """
+    Reads a render from the S3 tier, a missing or unreadable object is a miss
+    """
+    bucket = render_cache_bucket()
+    if not bucket:
+        return None
+
+    try:
+        with instrumentation.phase('render_cache_get'):
+            response = clients.get_client('s3').get_object(Bucket=bucket, Key=RENDER_CACHE_PREFIX + key + '.html')
+            html_content = response['Body'].read().decode('utf-8')
+    except ClientError as error:
+        if error.response['Error']['Code'] not in ('NoSuchKey', '404'):
+            logger.warning('Render cache read failed', extra=log.data(error=str(error)))
+        return None
+
+    return html_content, float(response.get('Metadata', {}).get(RENDER_MS_METADATA, 0))
+
+
+def persist(key, html_content, render_ms):
+    bucket = render_cache_bucket()
+    if not bucket:
+        return
+
+    try:
+        with instrumentation.phase('render_cache_put'):
+            clients.get_client('s3').put_object(Bucket=bucket, Key=RENDER_CACHE_PREFIX + key + '.html',
+                                                Body=html_content.encode('utf-8'),
+                                                ContentType='text/html; charset=utf-8',
+                                                Metadata={RENDER_MS_METADATA: str(round(render_ms, 1))})
+    except ClientError as error:
+        # The render is still good, only the next container misses out
+        logger.warning('Render cache write failed', extra=log.data(error=str(error)))
+
+
+def render(markdown_content):
+    """
+    Sanitized HTML of the Markdown, from the render cache when the same content was rendered before
+    """
+    key = render_key(markdown_content)
+
+    cached = render_cache.get(key)
+    if cached is None:
+        cached = load_persisted(key)
+        if cached is not None:
+            remember(key, *cached)
+
+    if cached is not None:
+        html_content, render_ms = cached
+        instrumentation.add_metric('RenderCacheHits')
+        instrumentation.add_metric('RenderTimeSaved', render_ms, 'Milliseconds')
+        return html_content
+
+    instrumentation.add_metric('RenderCacheMisses')
+
+    started_at = time.perf_counter()
+    html_content = sanitize(to_html(markdown_content))
+    render_ms = (time.perf_counter() - started_at) * 1000
+
+    remember(key, html_content, render_ms)
+    persist(key, html_content, render_ms)
+
+    return html_content
@@ -0,0 +1,52 @@
+"""
+Lambda function to render a post's HTML again after its content changed
+"""
+import os
+
+import cache
+import clients
+import content_store
+import instrumentation
+import log
+import publishing
+
+logger = log.get_logger()
+
+
+@instrumentation.instrumented
+def rerender_post_handler(event, context):
+    """
+    Renders the post update_post hands over asynchronously, unless the post is gone or a later update changed
+    its content again, that update hands the post over itself
+    """
+    try:
+        log.start(context)
+        logger.debug('Event', extra=log.data(event=event))
+
+        table_name = os.getenv('POSTS_TABLE')
+        if not table_name:
+            raise Exception('Table name missing')
+
+        table = clients.get_resource('dynamodb').Table(table_name)
+
+        with instrumentation.phase('get_item'):
+            item = table.get_item(Key={'PostID': event['PostID'], 'Author': event['Author']}).get('Item')
+
+        if item is None or item.get('ContentHash') != event['ContentHash']:
+            logger.info('Superseded', extra=log.data(post_id=event['PostID']))
+            return {'rerendered': False}
+
+        url = publishing.rerender(content_store.load(item))
+        if url is None:
+            return {'rerendered': False}
+
+        with instrumentation.phase('invalidate'):
+            cache.bump_table_version(table)
+
+        logger.info('Rerendered', extra=log.data(post_id=event['PostID'], url=url))
+
+        return {'rerendered': True}
+
+    except Exception as error:
+        logger.exception('Unhandled error')
+        raise error
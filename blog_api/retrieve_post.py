@@ -3,76 +3,133 @@ Lambda function to get a post from the database
 """
 import os
 import json
-import logging
-import datetime
 
-import boto3
-from slugify import slugify
+import apigw
+import cache
+import clients
+import content_store
+import instrumentation
+import log
+import projection
+import serialization
+import slugs
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = log.get_logger()
 
+read_cache = cache.TTLCache.from_env()
+table_version = cache.TableVersion()
 
+
+@instrumentation.instrumented
 def retrieve_post_handler(event, context):
     """
-    Retrieves a blog post from DynamoDB
+    Retrieves a blog post by slug (or PostID) from DynamoDB, optionally restricted to the attributes in the fields query parameter
     """
 
     try:
-        logger.info("Event: {}".format(event))
+        log.start(context)
+        logger.debug('Event', extra=log.data(event=event))
 
         table_name = os.getenv('POSTS_TABLE')
         if not table_name:
             raise Exception('Table name missing')
 
-        dynamodb = boto3.resource('dynamodb')
+        dynamodb = clients.get_resource('dynamodb')
         table = dynamodb.Table(table_name)
 
         try:
-            post_id = event['pathParameters']['slug']
+            slug = event['pathParameters']['slug']
         except KeyError as error:
-            logger.info('Error: {}'.format(error))
+            logger.info('Bad request', extra=log.data(error=str(error)))
 
             return {
                 'statusCode': 400,
                 'body': json.dumps({'message': 'Bad Request'})
             }
 
-        item = table.query(
-            KeyConditionExpression='PostID = :post_id',
-            ExpressionAttributeValues={
-                ':post_id': post_id
-            }
-        )
+        query_params = event.get('queryStringParameters') or {}
 
-        logger.info('DDB Response: {}'.format(item))
+        try:
+            fields = projection.parse_fields(query_params.get('fields'))
+        except projection.ProjectionError as error:
+            logger.info('Bad request', extra=log.data(error=str(error)))
 
-        if 'Items' in item:
-            response = {
-                'statusCode': 200,
-                'headers': {
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'OPTIONS,GET'
-                },
-                'body': json.dumps(item['Items'])
-            }
-        else:
-            response = {
-                'statusCode': item['ResponseMetadata']['HTTPStatusCode'],
+            return {
+                'statusCode': 400,
                 'headers': {
                     'Access-Control-Allow-Headers': 'Content-Type',
                     'Access-Control-Allow-Origin': '*',
                     'Access-Control-Allow-Methods': 'OPTIONS,GET'
                 },
+                'body': json.dumps({'message': str(error)})
             }
 
-        logger.info("Response: %s", response)
+        def load_post():
+            with instrumentation.phase('resolve'):
+                key = slugs.resolve(table, slug)
+
+            if key:
+                post_id, author = key
+                with instrumentation.phase('get_item'):
+                    item = table.get_item(
+                        Key={'PostID': post_id, 'Author': author},
+                        **projection.projection_kwargs(fields, required=content_store.required_fields(fields))
+                    )
+
+                logger.debug('DDB response', extra=log.data(response=item))
+
+                if 'Item' not in item:
+                    slugs.forget(slug)
+                else:
+                    content_store.load(item['Item'])
+
+                with instrumentation.phase('serialize'):
+                    return serialization.dumps([item['Item']] if 'Item' in item else [])
+
+            # The table version marker shares the table, it is no post
+            if slug == cache.VERSION_KEY['PostID']:
+                return serialization.dumps([])
+
+            # Not a known slug, older links address the post by its PostID
+            with instrumentation.phase('query'):
+                item = table.query(
+                    KeyConditionExpression='PostID = :post_id',
+                    ExpressionAttributeValues={
+                        ':post_id': slug
+                    },
+                    **projection.projection_kwargs(fields, required=content_store.required_fields(fields))
+                )
+
+            logger.debug('DDB response', extra=log.data(response=item))
+
+            content_store.load_all(item['Items'])
+
+            with instrumentation.phase('serialize'):
+                return serialization.dumps(item['Items'])
+
+        body = cache.read_through(read_cache, table_version, table, ('post', slug, fields), load_post)
+
+        logger.debug('Cache stats', extra=log.data(**read_cache.stats()))
+
+        response = {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'OPTIONS,GET'
+            },
+            'body': body
+        }
+
+        with instrumentation.phase('encode'):
+            response = apigw.compress_response(event, apigw.conditional_response(event, response))
+
+        logger.info('Response', extra=log.summary(response))
 
         return response
 
-    except Exception as error:
-        logger.info('Error: {}'.format(error))
+    except Exception:
+        logger.exception('Unhandled error')
 
         return {
             'statusCode': 500,
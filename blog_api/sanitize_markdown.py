@@ -3,54 +3,49 @@ Lambda function to sanitize markdown
 """
 import os
 import json
-import logging
 
-from functools import partial
+import claim_check
+import html_objects
+import instrumentation
+import log
+import rendering
 
-import boto3
-import markdown
-from bleach.sanitizer import Cleaner
-from bleach.linkifier import LinkifyFilter
-
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = log.get_logger()
 
 
+@instrumentation.instrumented
 def sanitize_markdown_handler(event, context):
     """
     Sanitizes markdown
     """
     try:
-        logger.info("Event: {}".format(event))
+        log.start(context)
+        logger.debug('Event', extra=log.data(event=event))
 
-        markdown_content = event['content']
+        markdown_content = claim_check.content_of(event)
 
-        logger.info('Markdown Content: {}'.format(markdown_content))
+        logger.debug('Markdown content', extra=log.data(content=markdown_content))
 
         try:
-            html_content = markdown.markdown(markdown_content)
+            sanitized_html = rendering.render(markdown_content)
         except Exception as error:
-            logger.info('Error: {}'.format(error))
+            logger.warning('Markdown conversion failed', extra=log.data(error=str(error)))
             raise error
 
-        logger.info('HTML Content: {}'.format(html_content))
-
-        cleaner = Cleaner(tags=['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'strong', 'em',
-                                'a', 'img', 'blockquote', 'pre', 'code', 'hr', 'br'],
-                          attributes={'a': ['href', 'title'], 'img': ['src', 'alt']},
-                          strip=True,
-                          filters=[partial(LinkifyFilter, skip_tags=['pre', 'code'])])
-
-        sanitized_html = cleaner.clean(html_content)
-
-        logger.info('Sanitized HTML: {}'.format(sanitized_html))
+        logger.info('Sanitized', extra=log.data(markdown_bytes=len(markdown_content), html_bytes=len(sanitized_html)))
 
-        event['sanitized_html'] = sanitized_html
+        if 'content_ref' in event:
+            # Claim checked states carry a reference to the HTML too, not the HTML itself
+            with instrumentation.phase('encode'):
+                body, coding, html_digest = html_objects.encode(sanitized_html)
 
-        logger.info('Event: {}'.format(event))
+            event['html_ref'] = dict(claim_check.check_in(event['post_id'], claim_check.HTML, body, coding),
+                                     digest=html_digest)
+        else:
+            event['sanitized_html'] = sanitized_html
 
         return event
 
     except Exception as error:
-        logger.info('Error: {}'.format(error))
+        logger.exception('Unhandled error')
         raise error
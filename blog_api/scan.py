@@ -0,0 +1,81 @@
+"""
+Parallel scans for the maintenance jobs run over the posts table: every segment streams its pages and the scan
+position of each segment goes to a checkpoint file once its page is handled, so a run that stops picks up
+where it left off when started again with the same checkpoint.
+"""
+import os
+import json
+import threading
+
+from boto3.dynamodb.types import TypeDeserializer
+
+import cache
+import clients
+
+_deserializer = TypeDeserializer()
+
+
+def deserialize(item):
+    return {name: _deserializer.deserialize(value) for name, value in item.items()}
+
+
+class Checkpoint:
+    """
+    Scan position of every segment, written after each handled page
+    """
+
+    def __init__(self, path, total_segments):
+        self.path = path
+        self.total_segments = total_segments
+        self.segments = {}
+        self.lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            with open(path) as checkpoint_file:
+                state = json.load(checkpoint_file)
+            if state['total_segments'] != total_segments:
+                raise ValueError('Checkpoint was written for {} segments'.format(state['total_segments']))
+            self.segments = {int(segment): position for segment, position in state['segments'].items()}
+
+    def position(self, segment):
+        return self.segments.get(segment, {'start_key': None, 'done': False})
+
+    def save(self, segment, start_key):
+        with self.lock:
+            self.segments[segment] = {'start_key': start_key, 'done': start_key is None}
+            if not self.path:
+                return
+
+            # Replaced in one step, a crash mid write leaves the previous checkpoint
+            with open(self.path + '.tmp', 'w') as checkpoint_file:
+                json.dump({'total_segments': self.total_segments, 'segments': self.segments}, checkpoint_file)
+            os.replace(self.path + '.tmp', self.path)
+
+
+def scan_segment(table_name, segment, checkpoint, page_size=100, **scan_kwargs):
+    """
+    Yields the deserialized posts of one segment page by page, from where the checkpoint left it, without the
+    table version marker. The position after a page is saved when the next one is asked for, so a page that
+    fails is read again on the next run. The marker is only recognized when the projection keeps the key.
+    """
+    position = checkpoint.position(segment)
+    if position['done']:
+        return
+
+    dynamodb = clients.get_client('dynamodb')
+    start_key = position['start_key']
+
+    while True:
+        params = dict(scan_kwargs, TableName=table_name, Segment=segment, TotalSegments=checkpoint.total_segments,
+                      Limit=page_size)
+        if start_key:
+            params['ExclusiveStartKey'] = start_key
+
+        page = dynamodb.scan(**params)
+        items = [deserialize(item) for item in page['Items']]
+        yield [item for item in items if not cache.is_version_key(item)]
+
+        start_key = page.get('LastEvaluatedKey')
+        checkpoint.save(segment, start_key)
+        if start_key is None:
+            return
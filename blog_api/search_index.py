@@ -0,0 +1,182 @@
+"""
+Inverted full-text index of posts kept in the search index table.
+
+    Term=<term>, PostID=<id>          posting with the term frequency (TF), the post Author and its Length
+    Term=#doc, PostID=<id>            the post's term frequency map and length, used to diff edits
+    Term=#stats, PostID=#stats        document count and total token count for BM25
+
+Every posting is an item of its own and costs a write unit, so a post only gets postings for its
+SEARCH_MAX_TERMS most frequent terms (100 by default, 0 for all of them). Its Length still counts every term.
+Edits only write the postings whose frequency or post length changed.
+"""
+import os
+import re
+import math
+
+from collections import Counter
+
+DOC_TERM = '#doc'
+STATS_KEY = {'Term': '#stats', 'PostID': '#stats'}
+
+TITLE_WEIGHT = 3
+DESCRIPTION_WEIGHT = 2
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+MAX_QUERY_TERMS = 10
+
+DEFAULT_MAX_TERMS = 100
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'has', 'have', 'how', 'i', 'if', 'in',
+    'into', 'is', 'it', 'its', 'not', 'of', 'on', 'or', 'our', 'so', 'that', 'the', 'their', 'then', 'there',
+    'these', 'this', 'to', 'was', 'we', 'were', 'what', 'when', 'which', 'will', 'with', 'you', 'your'
+])
+
+
+def search_table_name():
+    return os.getenv('SEARCH_TABLE')
+
+
+def max_terms():
+    return int(os.getenv('SEARCH_MAX_TERMS', DEFAULT_MAX_TERMS)) or None
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall((text or '').lower())
+            if len(token) > 1 and token not in STOPWORDS]
+
+
+def term_frequencies(post):
+    """
+    Counts the terms of a post, with title and description terms weighted above content terms
+    """
+    frequencies = Counter(tokenize(post.get('Content')))
+
+    for token in tokenize(post.get('Title')):
+        frequencies[token] += TITLE_WEIGHT
+    for token in tokenize(post.get('Description')):
+        frequencies[token] += DESCRIPTION_WEIGHT
+
+    return frequencies
+
+
+def index_post(search_table, post):
+    """
+    Indexes a new or edited post, only writing the postings whose frequency or post length changed
+    """
+    frequencies = term_frequencies(post)
+    length = sum(frequencies.values())
+    frequencies = dict(frequencies.most_common(max_terms()))
+
+    previous = search_table.get_item(Key={'Term': DOC_TERM, 'PostID': post['PostID']}).get('Item')
+    old_frequencies = {term: int(tf) for term, tf in (previous or {}).get('Terms', {}).items()}
+    old_length = int((previous or {}).get('Length', 0))
+
+    with search_table.batch_writer() as batch:
+        for term in set(old_frequencies) - set(frequencies):
+            batch.delete_item(Key={'Term': term, 'PostID': post['PostID']})
+
+        # Postings carry the post length so a search doesn't read every #doc item for it
+        for term, tf in frequencies.items():
+            if old_frequencies.get(term) != tf or old_length != length:
+                batch.put_item(Item={'Term': term, 'PostID': post['PostID'], 'Author': post['Author'], 'TF': tf,
+                                     'Length': length})
+
+        batch.put_item(Item={
+            'Term': DOC_TERM,
+            'PostID': post['PostID'],
+            'Author': post['Author'],
+            'Terms': dict(frequencies),
+            'Length': length
+        })
+
+    update_stats(search_table, 0 if previous else 1, length - old_length)
+
+
+def remove_post(search_table, post_id):
+    """
+    Removes every posting of a deleted post
+    """
+    previous = search_table.get_item(Key={'Term': DOC_TERM, 'PostID': post_id}).get('Item')
+    if not previous:
+        return
+
+    with search_table.batch_writer() as batch:
+        for term in previous.get('Terms', {}):
+            batch.delete_item(Key={'Term': term, 'PostID': post_id})
+        batch.delete_item(Key={'Term': DOC_TERM, 'PostID': post_id})
+
+    update_stats(search_table, -1, -int(previous.get('Length', 0)))
+
+
+def update_stats(search_table, docs, tokens):
+    search_table.update_item(
+        Key=STATS_KEY,
+        UpdateExpression='ADD #docs :docs, #tokens :tokens',
+        ExpressionAttributeNames={'#docs': 'Docs', '#tokens': 'Tokens'},
+        ExpressionAttributeValues={':docs': docs, ':tokens': tokens}
+    )
+
+
+def load_stats(search_table):
+    """
+    Reads the document count and the average document length
+    """
+    item = search_table.get_item(Key=STATS_KEY).get('Item', {})
+
+    docs = int(item.get('Docs', 0))
+    average_length = int(item.get('Tokens', 0)) / docs if docs else 0.0
+
+    return {'docs': docs, 'average_length': average_length}
+
+
+def load_postings(search_table, term):
+    """
+    Reads every posting of a term as a list of (PostID, Author, TF, Length), Length is None for postings
+    written before they carried it
+    """
+    postings = []
+    kwargs = dict(
+        KeyConditionExpression='#term = :term',
+        ProjectionExpression='PostID, Author, TF, #length',
+        ExpressionAttributeNames={'#term': 'Term', '#length': 'Length'},
+        ExpressionAttributeValues={':term': term}
+    )
+    while True:
+        response = search_table.query(**kwargs)
+        postings.extend((posting['PostID'], posting['Author'], int(posting['TF']),
+                         int(posting['Length']) if 'Length' in posting else None)
+                        for posting in response['Items'])
+
+        if 'LastEvaluatedKey' not in response:
+            return postings
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def rank(terms, stats, postings_by_term):
+    """
+    Scores documents with Okapi BM25 and returns (score, PostID, Author) tuples, best first
+    """
+    scores = {}
+    docs = stats['docs']
+    average_length = stats['average_length'] or 1.0
+
+    for term in terms:
+        postings = postings_by_term.get(term) or []
+        if not postings:
+            continue
+
+        idf = math.log(1 + (docs - len(postings) + 0.5) / (len(postings) + 0.5))
+
+        for post_id, author, tf, length in postings:
+            length = average_length if length is None else length
+            norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+            key = (post_id, author)
+            scores[key] = scores.get(key, 0.0) + idf * norm
+
+    return sorted(((score, post_id, author) for (post_id, author), score in scores.items()),
+                  key=lambda result: (-result[0], result[1]))
@@ -0,0 +1,150 @@
+"""
+Lambda function to search posts
+"""
+import os
+import json
+
+import apigw
+import batch
+import cache
+import clients
+import instrumentation
+import log
+import pagination
+import projection
+import search_index
+import serialization
+
+logger = log.get_logger()
+
+search_cache = cache.TTLCache.from_env('SEARCH_CACHE')
+table_version = cache.TableVersion()
+
+MAX_RESULTS = 1000
+
+
+@instrumentation.instrumented
+def search_posts_handler(event, context):
+    """
+    Searches posts with BM25 over the full-text index, returning one page of post summaries
+    """
+
+    try:
+        log.start(context)
+        logger.debug('Event', extra=log.data(event=event))
+
+        table_name = os.getenv('POSTS_TABLE')
+        search_table_name = search_index.search_table_name()
+        if not table_name or not search_table_name:
+            raise Exception('Table name missing')
+
+        query_params = event.get('queryStringParameters') or {}
+
+        try:
+            terms = list(dict.fromkeys(search_index.tokenize(query_params.get('q'))))
+            if not terms:
+                raise pagination.PaginationError('Missing search terms')
+            terms = terms[:search_index.MAX_QUERY_TERMS]
+
+            limit = pagination.parse_limit(query_params.get('limit'))
+            offset = decode_offset(query_params.get('cursor'))
+        except pagination.PaginationError as error:
+            logger.info('Bad request', extra=log.data(error=str(error)))
+
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Access-Control-Allow-Headers': 'Content-Type',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Methods': 'OPTIONS,GET'
+                },
+                'body': json.dumps({'message': str(error)})
+            }
+
+        dynamodb = clients.get_resource('dynamodb')
+        table = dynamodb.Table(table_name)
+        search_table = dynamodb.Table(search_table_name)
+
+        # The index is read through the warm-container cache, a post write bumps the table version
+        with instrumentation.phase('index'):
+            stats = cache.read_through(search_cache, table_version, table, ('stats',),
+                                       lambda: search_index.load_stats(search_table))
+            postings = {
+                term: cache.read_through(search_cache, table_version, table, ('term', term),
+                                         lambda term=term: search_index.load_postings(search_table, term))
+                for term in terms
+            }
+
+        logger.debug('Cache stats', extra=log.data(**search_cache.stats()))
+
+        with instrumentation.phase('rank'):
+            ranked = search_index.rank(terms, stats, postings)[:MAX_RESULTS]
+            page = ranked[offset:offset + limit]
+
+        with instrumentation.phase('summaries'):
+            summaries = get_summaries(dynamodb, table_name, [(post_id, author) for _, post_id, author in page])
+
+        items = []
+        for score, post_id, author in page:
+            summary = summaries.get((post_id, author))
+            if summary:
+                items.append(dict(projection.select_fields(summary, projection.SUMMARY_FIELDS),
+                                  Score=round(score, 4)))
+
+        next_offset = offset + limit
+        response = {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'OPTIONS,GET'
+            },
+            'body': serialization.dumps({
+                'items': items,
+                'next_cursor': pagination.encode_cursor({'o': next_offset}) if next_offset < len(ranked) else None
+            })
+        }
+
+        with instrumentation.phase('encode'):
+            response = apigw.compress_response(event, response)
+
+        logger.info('Response', extra=log.summary(response))
+
+        return response
+
+    except Exception:
+        logger.exception('Unhandled error')
+
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'OPTIONS,GET'
+            },
+            "body": {"message": 'Internal server error'}
+        }
+
+
+def decode_offset(cursor):
+    state = pagination.decode_cursor(cursor)
+    if state is None:
+        return 0
+
+    offset = state.get('o')
+    if set(state) != {'o'} or type(offset) is not int or offset < 0 or offset >= MAX_RESULTS:
+        raise pagination.PaginationError('Invalid cursor')
+
+    return offset
+
+
+def get_summaries(dynamodb, table_name, keys):
+    """
+    Fetches the summary of each ranked post with BatchGetItem
+    """
+    return batch.batch_get(
+        dynamodb,
+        table_name,
+        [{'PostID': post_id, 'Author': author} for post_id, author in keys],
+        **projection.projection_kwargs(projection.SUMMARY_FIELDS, required=('Author',))
+    )
@@ -0,0 +1,69 @@
+"""
+JSON serialization of DynamoDB items for the API responses.
+
+The resource API returns numbers as Decimal, string and number sets as set and binary values as Binary, none of
+which json.dumps accepts. dumps() writes integral Decimals as integers and the others as floats, sets as sorted
+lists and binary values as base64. Values are converted by the encoder's default hook while it writes, so large
+listings aren't copied into plain Python types first.
+
+orjson is used when it is installed, SERIALIZER=json selects the stdlib encoder. Both write compact JSON, the stdlib
+encoder escapes non-ASCII characters (its ensure_ascii=False path is much slower).
+"""
+import os
+import json
+import base64
+
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from boto3.dynamodb.types import Binary
+
+
+def default(value):
+    """
+    Converts the DynamoDB types the encoders don't know about
+    """
+    if isinstance(value, Decimal):
+        if value == value.to_integral_value():
+            return int(value)
+        return float(value)
+
+    if isinstance(value, (set, frozenset)):
+        try:
+            return sorted(value)
+        except TypeError:
+            # Binary sets don't order, keep them in iteration order
+            return list(value)
+
+    if isinstance(value, Binary):
+        value = value.value
+
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode('ascii')
+
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(value).__name__))
+
+
+def backend():
+    if orjson is not None and os.getenv('SERIALIZER', 'orjson').lower() != 'json':
+        return 'orjson'
+
+    return 'json'
+
+
+def dumps(value):
+    """
+    Serializes a response body to a string
+    """
+    if backend() == 'orjson':
+        try:
+            return orjson.dumps(value, default=default).decode('utf-8')
+        except TypeError:
+            # orjson stops at 64 bit integers, the stdlib encoder doesn't
+            pass
+
+    return json.dumps(value, default=default, separators=(',', ':'))
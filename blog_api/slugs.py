@@ -0,0 +1,94 @@
+"""
+Resolves the {slug} path parameter to a post key through the slug index
+"""
+from boto3.dynamodb.conditions import Key
+
+import cache
+
+INDEX_NAME = 'SlugLookupIndex'
+
+slug_cache = cache.TTLCache.from_env('SLUG_CACHE')
+table_version = cache.TableVersion()
+
+# Cached for lookups that found nothing, read_through doesn't cache None
+NOT_FOUND = ()
+
+
+def lookup(table, slug, author=None):
+    """
+    Queries the slug index, returning the (PostID, Author) of the newest post with that slug, of the given
+    author when there is one, or None
+    """
+    response = table.query(
+        IndexName=INDEX_NAME,
+        KeyConditionExpression=Key('Slug').eq(slug),
+        ProjectionExpression='PostID, Author, DateCreated'
+    )
+
+    items = [item for item in response['Items'] if author is None or item['Author'] == author]
+    if not items:
+        return None
+
+    newest = max(items, key=lambda item: item.get('DateCreated', ''))
+
+    return newest['PostID'], newest['Author']
+
+
+def cache_key(slug, author=None):
+    return ('slug', slug) if author is None else ('slug', slug, author)
+
+
+def resolve(table, slug, author=None):
+    """
+    Returns the (PostID, Author) a slug points to, served from the warm-container cache when possible.
+    Misses are cached too, as NOT_FOUND, PostIDs are tried as slugs first on every read that names one.
+    """
+    return cache.read_through(slug_cache, table_version, table, cache_key(slug, author),
+                              lambda: lookup(table, slug, author) or NOT_FOUND) or None
+
+
+def forget(slug, author=None):
+    """
+    Drops a slug from this container's cache, used when a post is re-slugified or deleted
+    """
+    cache.evict(slug_cache, table_version, cache_key(slug))
+    if author is not None:
+        cache.evict(slug_cache, table_version, cache_key(slug, author))
+
+
+def post_id_for(table, value, author):
+    """
+    Returns the PostID of the author's post a path value names, values that aren't a slug of one of the
+    author's posts are taken to be a PostID
+    """
+    key = resolve(table, value, author)
+
+    return key[0] if key else value
+
+
+def lookup_post_id(table, post_id):
+    """
+    Reads the key of a post by PostID alone, returning (PostID, Author) or None
+    """
+    response = table.query(
+        KeyConditionExpression=Key('PostID').eq(post_id),
+        ProjectionExpression='PostID, Author',
+        Limit=1
+    )
+
+    # The table version marker is keyed like a post
+    items = [item for item in response['Items'] if not cache.is_version_key(item)]
+
+    return (items[0]['PostID'], items[0]['Author']) if items else None
+
+
+def resolve_id(table, value):
+    """
+    Returns the (PostID, Author) of a post named by slug or by PostID, or None when neither matches
+    """
+    key = resolve(table, value)
+    if key:
+        return key
+
+    return cache.read_through(slug_cache, table_version, table, ('id', value),
+                              lambda: lookup_post_id(table, value) or NOT_FOUND) or None
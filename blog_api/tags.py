@@ -0,0 +1,204 @@
+"""
+Helpers for the inverted tag index kept in the post tags table.
+Every (tag, post) pair is one item keyed by Tag and TagSort (DateCreated#PostID), carrying the post summary
+so a tag listing is served by Query alone.
+"""
+import os
+import heapq
+import itertools
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+import pagination
+
+INDEX_FIELDS = ('PostID', 'Author', 'Title', 'Slug', 'Description', 'Tags', 'DateCreated', 'HtmlURL')
+
+MAX_TAGS = 5
+
+
+def tags_table_name():
+    return os.getenv('TAGS_TABLE')
+
+
+def normalize_tag(tag):
+    return tag.strip().lower()
+
+
+def parse_tags(value):
+    """
+    Parses the comma separated tag query parameter
+    """
+    if value is None or value.strip() == '':
+        return None
+
+    tags = []
+    for tag in value.split(','):
+        tag = normalize_tag(tag)
+        if not tag:
+            raise pagination.PaginationError('Empty tag')
+        if tag not in tags:
+            tags.append(tag)
+
+    if len(tags) > MAX_TAGS:
+        raise pagination.PaginationError('At most {} tags can be combined'.format(MAX_TAGS))
+
+    return tuple(tags)
+
+
+def parse_match(value):
+    if value is None or value == '':
+        return 'any'
+
+    if value not in ('any', 'all'):
+        raise pagination.PaginationError('match must be any or all')
+
+    return value
+
+
+def sort_key(post):
+    return '{}#{}'.format(post['DateCreated'], post['PostID'])
+
+
+def post_tags(post):
+    if not post:
+        return set()
+
+    return {normalize_tag(tag) for tag in post.get('Tags') or [] if normalize_tag(tag)}
+
+
+def sync_post_tags(tags_table, old_post, new_post):
+    """
+    Brings the tag index in line with a post write: removes pairs for dropped tags and (re)writes the
+    summary of every current tag. Pass None as new_post for a delete.
+    """
+    post = new_post or old_post
+    if not post or 'DateCreated' not in post:
+        return
+
+    old_tags = post_tags(old_post)
+    new_tags = post_tags(new_post)
+
+    with tags_table.batch_writer() as batch:
+        for tag in old_tags - new_tags:
+            batch.delete_item(Key={'Tag': tag, 'TagSort': sort_key(post)})
+
+        for tag in new_tags:
+            item = {name: new_post[name] for name in INDEX_FIELDS if name in new_post}
+            item.update({'Tag': tag, 'TagSort': sort_key(new_post)})
+            batch.put_item(Item=item)
+
+
+def set_html_url(tags_table, post, url):
+    """
+    Moves the HtmlURL kept in the index items of a post's tags after a re-render, items of tags removed in the
+    meantime aren't written again
+    """
+    if 'DateCreated' not in post:
+        return
+
+    for tag in post_tags(post):
+        try:
+            tags_table.update_item(
+                Key={'Tag': tag, 'TagSort': sort_key(post)},
+                UpdateExpression='SET HtmlURL = :u',
+                ConditionExpression='attribute_exists(Tag)',
+                ExpressionAttributeValues={':u': url}
+            )
+        except ClientError as error:
+            if error.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+
+def decode_tag_cursor(cursor):
+    state = pagination.decode_cursor(cursor)
+    if state is None:
+        return None
+
+    if set(state) != {'after'} or not isinstance(state['after'], str) or not state['after']:
+        raise pagination.PaginationError('Invalid cursor')
+
+    return state['after']
+
+
+def iter_tag(tags_table, tag, low, high, page_size):
+    """
+    Streams the index items of one tag newest-first, one Query per page, between two TagSort bounds
+    where high is exclusive
+    """
+    kwargs = dict(
+        KeyConditionExpression=Key('Tag').eq(tag) & Key('TagSort').between(low, high),
+        ScanIndexForward=False,
+        Limit=page_size,
+        ReturnConsumedCapacity='TOTAL'
+    )
+
+    while True:
+        response = tags_table.query(**kwargs)
+
+        for item in response['Items']:
+            if item['TagSort'] != high:
+                yield item
+
+        if 'LastEvaluatedKey' not in response:
+            return
+
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def intersect(streams):
+    """
+    Yields the items present in every newest-first stream
+    """
+    heads = [next(stream, None) for stream in streams]
+
+    while all(head is not None for head in heads):
+        oldest = min(head['TagSort'] for head in heads)
+
+        if all(head['TagSort'] == oldest for head in heads):
+            yield heads[0]
+            heads = [next(stream, None) for stream in streams]
+            continue
+
+        # Every stream whose head is newer than the oldest head can skip past it
+        heads = [head if head['TagSort'] == oldest else next(stream, None) for head, stream in zip(heads, streams)]
+
+
+def query_tags(tags_table, tags, match, limit, after=None, newest=None, oldest=None):
+    """
+    Returns one page of posts tagged with any (or all) of tags, newest first, and the cursor state for the
+    next page. Each tag is read by its own paginated Query and the sorted streams are merged.
+    """
+    low = '{}-00'.format(oldest)
+    high = after or '{}-32'.format(newest)
+    if high <= low:
+        return [], None
+
+    # The item at the cursor comes back from the inclusive range and is skipped, so read one extra
+    page_size = limit + 1 if after else limit
+    streams = [iter_tag(tags_table, tag, low, high, page_size) for tag in tags]
+
+    if len(streams) == 1:
+        merged = streams[0]
+    elif match == 'all':
+        merged = intersect(streams)
+    else:
+        merged = unique(heapq.merge(*streams, key=lambda item: item['TagSort'], reverse=True))
+
+    items = list(itertools.islice(merged, limit))
+
+    if len(items) < limit:
+        return items, None
+
+    return items, {'after': items[-1]['TagSort']}
+
+
+def unique(stream):
+    """
+    Drops repeated posts from a merged newest-first stream
+    """
+    last = None
+    for item in stream:
+        if item['TagSort'] != last:
+            last = item['TagSort']
+            yield item
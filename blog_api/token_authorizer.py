@@ -4,23 +4,25 @@ Function to authorize the token and grant access to the API
 # TODO: Add the code to authorize the token and grant access to the API
 
 import json
-import logging
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+import instrumentation
+import log
 
+logger = log.get_logger()
 
+
+@instrumentation.instrumented
 def token_authorizer_handler(event, context):
     """
     Authorizes the token and grants access to the API
     """
 
-    logger.info("Event: {}".format(event))
-    logger.info("Method ARN: {}".format(event['methodArn']))
+    log.start(context)
+    logger.debug('Event', extra=log.data(event=event))
 
     base_method_arn = event['methodArn'].split('/')[0]
 
-    logger.info("Base method ARN: {}".format(base_method_arn))
+    logger.debug('Base method ARN', extra=log.data(method_arn=base_method_arn))
 
     if event['authorizationToken'] == 'token':
         return generate_policy('user', 'Allow', base_method_arn + '/*/*')
@@ -40,6 +42,6 @@ def generate_policy(principal_id, effect, resource):
         policy_document['Statement'].append(statement_one)
         auth_response['policyDocument'] = policy_document
 
-    logger.info("Auth response: {}".format(auth_response))
+    logger.info('Auth response', extra=log.data(effect=effect))
 
     return auth_response
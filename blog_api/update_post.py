@@ -3,45 +3,58 @@ Lambda function to update a post in the database
 """
 import os
 import json
-import logging
-import datetime
 
-import boto3
+from botocore.exceptions import ClientError
 from slugify import slugify
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+import apigw
+import cache
+import clients
+import content_store
+import instrumentation
+import log
+import publishing
+import rendering
+import search_index
+import serialization
+import slugs
+import tags
 
+logger = log.get_logger()
 
+
+@instrumentation.instrumented
 def update_post_handler(event, context):
     """
     Updates a blog post in DynamoDB
     """
 
     try:
-        logger.info("Event: {}".format(event))
+        log.start(context)
+        logger.debug('Event', extra=log.data(event=event))
 
         table_name = os.getenv('POSTS_TABLE')
         if not table_name:
             raise Exception('Table name missing')
 
         try:
-            post_id = event['pathParameters']['slug']
+            slug = event['pathParameters']['slug']
         except KeyError as error:
-            logger.info('Error: {}'.format(error))
+            logger.info('Bad request', extra=log.data(error=str(error)))
 
             return {
                 'statusCode': 400,
                 'body': json.dumps({'message': 'Bad Request'})
             }
 
-        dynamodb = boto3.resource('dynamodb')
+        dynamodb = clients.get_resource('dynamodb')
         table = dynamodb.Table(table_name)
 
         try:
-            payload = json.loads(event['body'])
+            with instrumentation.phase('parse'):
+                payload = json.loads(apigw.decode_body(event))
         except KeyError as error:
-            logger.info('Error: {}'.format(error))
+            logger.info('Bad request', extra=log.data(error=str(error)))
 
             return {
                 'statusCode': 400,
@@ -54,19 +67,118 @@ def update_post_handler(event, context):
                 'body': json.dumps({'message': 'No fields to update'})
             }
 
-        item = table.update_item(
-            Key={
-                'PostID': post_id,
-                'Author': event['requestContext']['authorizer']['principalId']
-            },
-            UpdateExpression=build_update_expression(payload),
-            ExpressionAttributeValues=build_attribute_values(payload),
-            ReturnValues='ALL_NEW'
-        )
+        author = event['requestContext']['authorizer']['principalId']
+        with instrumentation.phase('resolve'):
+            key = {
+                'PostID': slugs.post_id_for(table, slug, author),
+                'Author': author
+            }
+
+        tags_table_name = tags.tags_table_name()
+
+        # Only a tag change needs the old tags, to remove the index items of dropped tags, only a title
+        # change needs the old slug, to drop it from the slug cache, and only a content change needs the
+        # old content hash and offloaded content, to tell whether the HTML has to be rendered again and the
+        # old content object deleted
+        old_post = None
+        if (tags_table_name and 'tags' in payload) or 'title' in payload or 'content' in payload:
+            with instrumentation.phase('get_item'):
+                old_post = table.get_item(Key=key,
+                                          ProjectionExpression='Tags, Slug, ContentHash, ContentRef').get('Item')
+
+        old_ref = (old_post or {}).get(content_store.CONTENT_REF)
+        content = None
+        if 'content' in payload:
+            content = content_store.content_attributes(key['PostID'], payload['content'], old_ref)
+        content_ref = (content or {}).get(content_store.CONTENT_REF)
+
+        update_expression = build_update_expression(payload, content)
+        attribute_values = build_attribute_values(payload, content)
+
+        try:
+            with instrumentation.phase('update_item'):
+                item = table.update_item(
+                    Key=key,
+                    UpdateExpression=update_expression,
+                    ConditionExpression='attribute_exists(PostID)',
+                    ExpressionAttributeValues=attribute_values,
+                    ReturnValues='ALL_NEW'
+                )
+        except ClientError as error:
+            if error.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+            # Not a post of this author, don't leave the content uploaded for it behind
+            if content_ref and content_ref != old_ref:
+                content_store.delete(content_ref)
+            logger.info('Not found', extra=log.data(post_id=key['PostID']))
+
+            return {
+                'statusCode': 404,
+                'headers': {
+                    'Access-Control-Allow-Headers': 'Content-Type',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Methods': 'OPTIONS,PUT'
+                },
+                'body': json.dumps({'message': 'Not Found'})
+            }
+
+        logger.debug('DDB response', extra=log.data(response=item))
+
+        if 'content' in payload and old_ref and old_ref != content_ref:
+            content_store.delete(old_ref)
 
-        logger.info('DDB Response: {}'.format(item))
+        search_table_name = search_index.search_table_name()
+        reindex = search_table_name and ({'title', 'description', 'content'} & set(payload))
 
         if 'Attributes' in item:
+            if 'content' in payload:
+                item['Attributes'][content_store.CONTENT] = payload['content']
+            # The search index function reads the content itself
+            if 'content' in payload or (reindex and publishing.search_index_mode() == publishing.SYNC):
+                content_store.load(item['Attributes'])
+
+        if tags_table_name and 'Attributes' in item:
+            new_post = item['Attributes']
+            if old_post is None:
+                old_post = {'Tags': new_post.get('Tags', [])}
+
+            with instrumentation.phase('tags'):
+                tags.sync_post_tags(dynamodb.Table(tags_table_name), dict(new_post, **old_post), new_post)
+
+        if 'title' in payload:
+            # The new slug may be cached as not found
+            for stale in {slug, attribute_values[':s'], (old_post or {}).get('Slug')} - {None}:
+                slugs.forget(stale, author)
+
+        if 'content' in payload and old_post is not None and 'Attributes' in item:
+            if old_post.get('ContentHash') != attribute_values[':h']:
+                try:
+                    with instrumentation.phase('rerender'):
+                        url = publishing.request_rerender(item['Attributes'])
+                    if url:
+                        item['Attributes']['HtmlURL'] = url
+                except Exception as error:
+                    # The update is stored, the HTML stays stale until the next content change
+                    logger.warning('Rerender failed', extra=log.data(error=str(error)))
+            else:
+                logger.info('Content unchanged')
+
+        if reindex and 'Attributes' in item:
+            publishing.request_search_index(item['Attributes'])
+
+        with instrumentation.phase('invalidate'):
+            cache.bump_table_version(table)
+
+        if 'Attributes' in item:
+            if 'content' not in payload:
+                # Only new content is sent back, inline or offloaded content that was left alone isn't read for it
+                item['Attributes'].pop(content_store.CONTENT, None)
+                item['Attributes'].pop(content_store.CONTENT_REF, None)
+
+            with instrumentation.phase('serialize'):
+                body = serialization.dumps(item['Attributes'])
+
             response = {
                 'statusCode': 200,
                 'headers': {
@@ -74,7 +186,7 @@ def update_post_handler(event, context):
                     'Access-Control-Allow-Origin': '*',
                     'Access-Control-Allow-Methods': 'OPTIONS,PUT'
                 },
-                'body': json.dumps(item['Attributes'])
+                'body': body
             }
         else:
             response = {
@@ -86,12 +198,12 @@ def update_post_handler(event, context):
                 },
             }
 
-        logger.info("Response: %s", response)
+        logger.info('Response', extra=log.summary(response))
 
         return response
 
-    except Exception as error:
-        logger.info('Error: {}'.format(error))
+    except Exception:
+        logger.exception('Unhandled error')
 
         return {
             'statusCode': 500,
@@ -104,36 +216,48 @@ def update_post_handler(event, context):
         }
 
 
-def build_update_expression(payload):
+def build_update_expression(payload, content=None):
+    """
+    Content is set as the attributes content_store stores it in, the other one is removed
+    """
+    content_ref = content_store.CONTENT_REF in (content or {})
     update_expression = 'set '
 
     if 'title' in payload:
         update_expression += 'Title = :t, Slug = :s, '
     if 'content' in payload:
-        update_expression += 'Content = :c, '
+        update_expression += 'ContentRef = :c, ' if content_ref else 'Content = :c, '
+        update_expression += 'ContentHash = :h, '
     if 'description' in payload:
         update_expression += 'Description = :d, '
     if 'tags' in payload:
-        update_expression += 'Tags = :t, '
+        update_expression += 'Tags = :g, '
+
+    update_expression = update_expression[:-2]
+    if 'content' in payload:
+        update_expression += ' remove Content' if content_ref else ' remove ContentRef'
 
-    logger.info('Update Expression: {}'.format(update_expression[:-2]))
+    logger.debug('Update expression', extra=log.data(expression=update_expression))
 
-    return update_expression[:-2]
+    return update_expression
 
 
-def build_attribute_values(payload):
+def build_attribute_values(payload, content=None):
     attributes = {}
 
     if 'title' in payload:
         attributes[':t'] = payload['title']
-        attributes[':s'] = slugify(payload['title'])
+        with instrumentation.phase('slugify'):
+            attributes[':s'] = slugify(payload['title'])
     if 'content' in payload:
-        attributes[':c'] = payload['content']
+        content = content or {content_store.CONTENT: payload['content']}
+        attributes[':c'] = content.get(content_store.CONTENT_REF, content.get(content_store.CONTENT))
+        attributes[':h'] = rendering.content_hash(payload['content'])
     if 'description' in payload:
         attributes[':d'] = payload['description']
     if 'tags' in payload:
-        attributes[':t'] = payload['tags']
+        attributes[':g'] = payload['tags']
 
-    logger.info('Attributes: {}'.format(attributes))
+    logger.debug('Attribute values', extra=log.data(attributes=attributes))
 
     return attributes
@@ -6,33 +6,38 @@ import io
 import json
 import uuid
 import base64
-import logging
 
-import boto3
+import clients
+import instrumentation
+import log
 
-from streaming_form_data import StreamingFormDataParser
-from streaming_form_data.targets import ValueTarget
-from PIL import Image
-
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = log.get_logger()
 
 
+@instrumentation.instrumented
 def upload_image_handler(event, context):
     """
     Processes an image and uploads it to S3
     """
+    from streaming_form_data import StreamingFormDataParser
+    from streaming_form_data.targets import ValueTarget
+
     try:
-        logger.info("Event: {}".format(event))
+        log.start(context)
+        logger.debug('Event', extra=log.data(event=event))
 
-        parser = StreamingFormDataParser(headers=event['headers'])
+        with instrumentation.phase('parse'):
+            parser = StreamingFormDataParser(headers=event['headers'])
 
-        image_target = ValueTarget()
-        parser.register('image', image_target)
-        image_data = base64.b64decode(event['body'])
-        parser.data_received(image_data)
+            image_target = ValueTarget()
+            parser.register('image', image_target)
+            image_data = base64.b64decode(event['body'])
+            parser.data_received(image_data)
 
-        if not validate_image(image_target.value):
+        with instrumentation.phase('validate'):
+            valid = validate_image(image_target.value)
+
+        if not valid:
             return {
                 'statusCode': 400,
                 'body': json.dumps({'error': 'Invalid image'})
@@ -43,16 +48,16 @@ def upload_image_handler(event, context):
         if not bucket_name:
             raise Exception('Bucket name missing')
 
-        logger.info("Object key: %s", object_key)
-        logger.info("Bucket name: %s", bucket_name)
+        logger.debug('Object key', extra=log.data(bucket=bucket_name, key=object_key))
 
-        s3_resource = boto3.resource('s3')
+        s3_resource = clients.get_resource('s3')
         s3_file = s3_resource.Object(bucket_name, object_key)
-        s3_file.put(Body=image_target.value, ACL='public-read', ContentType='image/jpeg')
+        with instrumentation.phase('put_object'):
+            s3_file.put(Body=image_target.value, ACL='public-read', ContentType='image/jpeg')
 
         image_url = f'https://{bucket_name}.s3.amazonaws.com/{object_key}'
 
-        logger.info("Image URL: %s", image_url)
+        logger.info('Image uploaded', extra=log.data(url=image_url, bytes=len(image_target.value)))
 
         response = {
             'statusCode': 200,
@@ -64,12 +69,12 @@ def upload_image_handler(event, context):
             'body': json.dumps({'url': image_url})
         }
 
-        logger.info("Response: %s", response)
+        logger.info('Response', extra=log.summary(response))
 
         return response
 
-    except Exception as error:
-        logger.info('Error: {}'.format(error))
+    except Exception:
+        logger.exception('Unhandled error')
         return {
             'statusCode': 500,
             'headers': {
@@ -85,6 +90,9 @@ def validate_image(image_data):
     """
     Validates the image data
     """
+    # Pillow is the heaviest import in the package and only this check needs it
+    from PIL import Image
+
     try:
         image = Image.open(io.BytesIO(image_data))
 
@@ -101,7 +109,7 @@ def validate_image(image_data):
         return True
 
     except Exception as e:
-        logger.info('Error: {}'.format(e))
+        logger.info('Bad request', extra=log.data(error=str(e)))
         return False
 
 
@@ -1,27 +1,31 @@
 import os
 import json
-import logging
 import datetime
 import uuid
 
-import boto3
 from slugify import slugify
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+import apigw
+import claim_check
+import clients
+import instrumentation
+import log
+import publishing
 
-step_functions = boto3.client('stepfunctions')
+logger = log.get_logger()
 
 
+@instrumentation.instrumented
 def validate_post_handler(event, context):
     try:
-        logger.info("Event: {}".format(event))
-        logger.info("Context: {}".format(context))
+        log.start(context)
+        logger.debug('Event', extra=log.data(event=event))
 
         try:
-            payload = json.loads(event['body'])
+            with instrumentation.phase('parse'):
+                payload = json.loads(apigw.decode_body(event))
         except KeyError as error:
-            logger.info('Error: {}'.format(error))
+            logger.info('Bad request', extra=log.data(error=str(error)))
 
             return {
                 'statusCode': 400,
@@ -34,12 +38,12 @@ def validate_post_handler(event, context):
                 'body': json.dumps({'message': 'Missing title or content field'})
             }
 
+        mode = publishing.publish_mode()
+
         state_machine_arn = os.getenv('STATE_MACHINE')
-        if not state_machine_arn:
+        if mode == publishing.STEP_FUNCTIONS and not state_machine_arn:
             raise Exception('State machine ARN missing')
 
-        logger.info('State Machine ARN: {}'.format(state_machine_arn))
-
         description = '' if 'description' not in payload else payload['description']
         tags = [] if 'tags' not in payload else payload['tags']
 
@@ -55,14 +59,37 @@ def validate_post_handler(event, context):
             'tags': tags,
         }
 
-        logger.info('Post: {}'.format(post))
+        logger.debug('Post', extra=log.data(post=post))
+
+        if mode == publishing.INLINE:
+            item = publishing.publish_inline(post)
+
+            logger.info('Post published', extra=log.data(post_id=item['PostID'], url=item['HtmlURL']))
+
+            return {
+                'statusCode': 201,
+                'headers': {
+                    'Access-Control-Allow-Headers': 'Content-Type',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Methods': 'OPTIONS,POST'
+                },
+                'body': json.dumps({'message': 'Post published', 'post_id': item['PostID'], 'slug': item['Slug'],
+                                    'url': item['HtmlURL']})
+            }
+
+        if claim_check.workflow_bucket():
+            # The state machine gets a reference to the Markdown, keeping its state small for any post length
+            post['content_ref'] = claim_check.check_in(post['post_id'], claim_check.CONTENT, post.pop('content'))
+
+        step_functions = clients.get_client('stepfunctions')
 
-        res = step_functions.start_execution(
-            stateMachineArn=state_machine_arn,
-            input=json.dumps(post)
-        )
+        with instrumentation.phase('start_execution'):
+            res = step_functions.start_execution(
+                stateMachineArn=state_machine_arn,
+                input=json.dumps(post)
+            )
 
-        logger.info('Step Functions Response: {}'.format(res))
+        logger.info('Execution started', extra=log.data(execution_arn=res.get('executionArn')))
 
         return {
             'statusCode': 200,
@@ -74,8 +101,8 @@ def validate_post_handler(event, context):
             'body': json.dumps({'message': 'Post is valid'})
         }
 
-    except Exception as error:
-        logger.info('Error: {}'.format(error))
+    except Exception:
+        logger.exception('Unhandled error')
 
         return {
             'statusCode': 500,
@@ -68,7 +68,8 @@ class TestApiGateway:
         response = requests.get(api_gateway_url)
 
         assert response.status_code == 200
-        assert isinstance(response.json(), list) is True
+        assert isinstance(response.json()['items'], list) is True
+        assert 'next_cursor' in response.json()
 
     # def test_create_post(self, api_gateway_url):
     #     """ Call the API Gateway endpoint using POST Method """
@@ -0,0 +1,67 @@
+import gzip
+import json
+import base64
+
+import pytest
+
+import apigw
+
+
+def make_event(accept_encoding='gzip, deflate, br', accept='application/json'):
+    return {'headers': {'Accept-Encoding': accept_encoding, 'Accept': accept}}
+
+
+def make_response(size=4096):
+    return {
+        'statusCode': 200,
+        'headers': {'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({'items': ['x' * 64] * (size // 64)})
+    }
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip', 'gzip'),
+    ('gzip;q=0, identity', None),
+    ('*', 'br' if apigw.brotli else 'gzip'),
+    ('deflate', None),
+    (None, None),
+])
+def test_choose_encoding(header, expected):
+    assert apigw.choose_encoding({'headers': {'Accept-Encoding': header} if header else {}}) == expected
+
+
+def test_gzip_round_trip():
+    response = make_response()
+    event = make_event(accept_encoding='gzip')
+
+    compressed = apigw.compress_response(event, apigw.conditional_response(event, response))
+
+    assert compressed['isBase64Encoded'] is True
+    assert compressed['headers']['Content-Encoding'] == 'gzip'
+    assert compressed['headers']['Vary'] == 'Accept-Encoding'
+    assert compressed['headers']['ETag'].endswith('-gzip"')
+    assert gzip.decompress(base64.b64decode(compressed['body'])).decode('utf-8') == response['body']
+
+    # Revalidating with the compressed representation's ETag still matches
+    revalidate = dict(event, headers=dict(event['headers'], **{'If-None-Match': compressed['headers']['ETag']}))
+    not_modified = apigw.compress_response(revalidate, apigw.conditional_response(revalidate, response))
+
+    assert not_modified['statusCode'] == 304
+    assert 'body' not in not_modified
+    assert not_modified['headers']['Vary'] == 'Accept-Encoding'
+    assert not_modified['headers']['Cache-Control'] == compressed['headers']['Cache-Control']
+
+
+def test_small_bodies_and_non_binary_accept_are_not_compressed():
+    small = apigw.compress_response(make_event(), make_response(size=256))
+    html_accept = apigw.compress_response(make_event(accept='text/html'), make_response())
+
+    assert 'isBase64Encoded' not in small and 'isBase64Encoded' not in html_accept
+    assert 'Content-Encoding' not in html_accept['headers']
+
+
+def test_decode_body():
+    body = '{"title": "Unit Testing"}'
+
+    assert apigw.decode_body({'body': body}) == body
+    assert apigw.decode_body({'body': base64.b64encode(body.encode()).decode(), 'isBase64Encoded': True}) == body
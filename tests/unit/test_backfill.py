@@ -0,0 +1,258 @@
+import os
+import json
+
+import boto3
+import pytest
+
+from moto import mock_dynamodb
+
+from blog_api import list_posts
+
+import backfill
+import clients
+import feed
+import search_index
+import tags
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    os.environ['POSTS_TABLE'] = 'POSTS_TABLE'
+    os.environ['FEED_START_MONTH'] = '2023-01'
+    os.environ['DATE_BUCKET_SHARDS'] = '1'
+    clients.reset()
+    list_posts.read_cache.clear()
+
+
+def run_job(task, **kwargs):
+    # moto ignores Segment and returns the whole table to every segment, so these runs scan with one
+    return backfill.Job('POSTS_TABLE', task, segments=1, page_size=3, **kwargs).run()
+
+
+def buckets(table):
+    return {item['PostID']: item.get('DateBucket') for item in table.scan()['Items'] if 'DateCreated' in item}
+
+
+@mock_dynamodb
+def test_date_bucket_lists_existing_posts(aws_credentials, tmp_path):
+    table = setup_posts(7)
+    table.update_item(Key={'PostID': 'post-6', 'Author': 'user'}, UpdateExpression='SET DateBucket = :b',
+                      ExpressionAttributeValues={':b': '2023-03#9'})
+
+    assert json.loads(list_posts.list_posts_handler({}, None)['body'])['items'] == []
+
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    report = run_job('date-bucket', checkpoint_path=checkpoint)
+
+    assert (report['scanned'], report['written'], report['skipped'], report['failed']) == (7, 6, 1, 0)
+    # A post that has a DateBucket keeps it without --rebucket
+    assert buckets(table)['post-6'] == '2023-03#9'
+
+    list_posts.read_cache.clear()
+    body = json.loads(list_posts.list_posts_handler({'queryStringParameters': {'month': '2023-03'}}, None)['body'])
+
+    assert [item['PostID'] for item in body['items']] == ['post-5', 'post-4', 'post-3', 'post-2', 'post-1',
+                                                          'post-0']
+    # A finished checkpoint leaves nothing to do
+    assert run_job('date-bucket', checkpoint_path=checkpoint)['scanned'] == 0
+
+
+@mock_dynamodb
+def test_rebucket_moves_posts_to_the_new_shards(aws_credentials):
+    table = setup_posts(7)
+    run_job('date-bucket')
+
+    report = run_job('date-bucket', shards=4, rebucket=True)
+
+    assert report['written'] == 7
+    assert buckets(table) == {post_id: feed.date_bucket('2023-03-01', post_id, 4) for post_id in buckets(table)}
+    assert run_job('date-bucket', shards=4, rebucket=True)['written'] == 0
+
+
+@mock_dynamodb
+def test_tags_lists_existing_posts_by_tag(aws_credentials):
+    setup_posts(7)
+    tags_table = create_mock_tags_table()
+    os.environ['TAGS_TABLE'] = 'TAGS_TABLE'
+
+    try:
+        report = run_job('tags')
+    finally:
+        del os.environ['TAGS_TABLE']
+
+    assert (report['scanned'], report['written'], report['failed']) == (7, 7, 0)
+
+    items, _ = tags.query_tags(tags_table, ('py',), 'any', 10, newest='2023-03', oldest='2023-01')
+
+    assert [item['PostID'] for item in items] == ['post-{}'.format(i) for i in reversed(range(7))]
+    assert items[0]['HtmlURL'] == 'https://POSTS_BUCKET.s3.amazonaws.com/user/post-6.html'
+
+
+@mock_dynamodb
+def test_search_indexes_existing_posts(aws_credentials):
+    setup_posts(7)
+    search_table = create_mock_search_table()
+
+    report = backfill.Job('POSTS_TABLE', 'search', segments=1, page_size=3, search_table_name='SEARCH_TABLE').run()
+
+    assert (report['scanned'], report['written'], report['failed']) == (7, 7, 0)
+    assert search_index.load_stats(search_table)['docs'] == 7
+    assert sorted(posting[0] for posting in search_index.load_postings(search_table, 'body')) == \
+        ['post-{}'.format(i) for i in range(7)]
+
+    # Indexing again leaves the counts alone
+    backfill.Job('POSTS_TABLE', 'search', segments=1, page_size=3, search_table_name='SEARCH_TABLE').run()
+
+    assert search_index.load_stats(search_table)['docs'] == 7
+
+
+def setup_posts(count):
+    table = create_mock_ddb_table()
+    for i in range(count):
+        table.put_item(Item={
+            'PostID': 'post-{}'.format(i),
+            'Author': 'user',
+            'Title': 'Post {}'.format(i),
+            'Slug': 'post-{}'.format(i),
+            'Content': 'Body of post {}'.format(i),
+            'Tags': ['py'],
+            'HtmlURL': 'https://POSTS_BUCKET.s3.amazonaws.com/user/post-{}.html'.format(i),
+            'DateCreated': '2023-03-{:02d}T10:00:00'.format(i + 1)
+        })
+    table.put_item(Item={'PostID': '__table_version__', 'Author': '__table_version__', 'Version': 1})
+
+    return table
+
+
+def create_mock_ddb_table():
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='POSTS_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'PostID',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Author',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'DateBucket',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'DateCreated',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'PostID',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'Author',
+                'KeyType': 'RANGE'
+            }
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'DateBucketIndex',
+                'KeySchema': [
+                    {
+                        'AttributeName': 'DateBucket',
+                        'KeyType': 'HASH'
+                    },
+                    {
+                        'AttributeName': 'DateCreated',
+                        'KeyType': 'RANGE'
+                    }
+                ],
+                'Projection': {
+                    'ProjectionType': 'INCLUDE',
+                    'NonKeyAttributes': ['Title', 'Slug', 'Description', 'Tags', 'HtmlURL']
+                },
+                'ProvisionedThroughput': {
+                    'ReadCapacityUnits': 123,
+                    'WriteCapacityUnits': 123
+                }
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 123,
+            'WriteCapacityUnits': 123
+        }
+    )
+    return mock_ddb.Table('POSTS_TABLE')
+
+
+def create_mock_tags_table():
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='TAGS_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'Tag',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'TagSort',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'Tag',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'TagSort',
+                'KeyType': 'RANGE'
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 123,
+            'WriteCapacityUnits': 123
+        }
+    )
+    return mock_ddb.Table('TAGS_TABLE')
+
+
+def create_mock_search_table():
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='SEARCH_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'Term',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'PostID',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'Term',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'PostID',
+                'KeyType': 'RANGE'
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 123,
+            'WriteCapacityUnits': 123
+        }
+    )
+    return mock_ddb.Table('SEARCH_TABLE')
@@ -0,0 +1,249 @@
+import os
+import json
+
+import boto3
+import pytest
+
+from moto import mock_dynamodb
+
+import batch
+import clients
+import instrumentation
+import slugs
+from blog_api import batch_get_posts
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    os.environ['POSTS_TABLE'] = 'POSTS_TABLE'
+    clients.reset()
+    slugs.slug_cache.clear()
+    yield
+    os.environ.pop('BATCH_GET_CHUNK_SIZE', None)
+
+
+class FlakyClient:
+    """
+    Serves one key per BatchGetItem call and returns the rest as UnprocessedKeys
+    """
+
+    def __init__(self, throttled_calls=None):
+        self.calls = 0
+        self.throttled_calls = throttled_calls
+
+    def batch_get_item(self, RequestItems):
+        self.calls += 1
+        request = RequestItems['TABLE']
+        keys = request['Keys']
+
+        if self.throttled_calls is not None and self.calls <= self.throttled_calls:
+            return {'Responses': {'TABLE': []}, 'UnprocessedKeys': RequestItems}
+
+        unprocessed = {'TABLE': dict(request, Keys=keys[1:])} if keys[1:] else {}
+
+        return {'Responses': {'TABLE': [dict(keys[0], Title='t')]}, 'UnprocessedKeys': unprocessed}
+
+
+def test_initialization(aws_credentials):
+    event = {'body': '{"ids": ["a"]}'}
+    context = None
+
+    os.environ['POSTS_TABLE'] = ''
+
+    payload = batch_get_posts.batch_get_posts_handler(event, context)
+
+    assert payload['statusCode'] == 500
+
+
+@pytest.mark.parametrize('body', [
+    '',
+    'not json',
+    '{"ids": []}',
+    '{"ids": "unit-testing"}',
+    '{"ids": ["unit-testing", 7]}',
+    '{"keys": []}',
+    '{"keys": [{"PostID": "post-1"}]}',
+    '{"keys": [{"PostID": "post-1", "Author": 1}]}',
+    json.dumps({'ids': ['post-{}'.format(number) for number in range(101)]}),
+])
+def test_invalid_body(aws_credentials, body):
+    event = {'body': body}
+    context = None
+
+    payload = batch_get_posts.batch_get_posts_handler(event, context)
+
+    assert payload['statusCode'] == 400
+
+
+@mock_dynamodb
+def test_valid_request(aws_credentials):
+    event = {
+        'body': json.dumps({'ids': ['post-3', 'slug-1', 'unknown', 'post-0', 'slug-1']}),
+        'queryStringParameters': {'fields': 'Title'}
+    }
+    context = None
+
+    create_mock_ddb_table(5)
+
+    payload = batch_get_posts.batch_get_posts_handler(event, context)
+    body = json.loads(payload['body'])
+
+    assert payload['statusCode'] == 200
+    assert body['items'] == [{'Title': 'Post 3'}, {'Title': 'Post 1'}, {'Title': 'Post 0'}]
+    assert body['missing'] == ['unknown']
+
+
+@mock_dynamodb
+def test_table_version_marker_is_not_a_post(aws_credentials):
+    create_mock_ddb_table(1)
+    boto3.resource('dynamodb').Table('POSTS_TABLE').put_item(
+        Item={'PostID': '__table_version__', 'Author': '__table_version__', 'Version': 1})
+    marker = {'PostID': '__table_version__', 'Author': '__table_version__'}
+    event = {'body': json.dumps({'ids': ['__table_version__'], 'keys': [marker]})}
+
+    body = json.loads(batch_get_posts.batch_get_posts_handler(event, None)['body'])
+
+    assert body == {'items': [], 'missing': ['__table_version__', marker]}
+
+
+@mock_dynamodb
+def test_concurrent_chunks(aws_credentials):
+    os.environ['BATCH_GET_CHUNK_SIZE'] = '7'
+    ids = ['post-{}'.format(number) for number in reversed(range(60))]
+    event = {'body': json.dumps({'ids': ids})}
+    context = None
+
+    create_mock_ddb_table(60)
+
+    calls = []
+    events = boto3._get_default_session().events
+
+    def record(params, **kwargs):
+        calls.append(len(params['RequestItems']['POSTS_TABLE']['Keys']))
+
+    events.register('provide-client-params.dynamodb.BatchGetItem', record)
+    try:
+        payload = batch_get_posts.batch_get_posts_handler(event, context)
+    finally:
+        events.unregister('provide-client-params.dynamodb.BatchGetItem', record)
+
+    body = json.loads(payload['body'])
+
+    assert [item['PostID'] for item in body['items']] == ids
+    assert sorted(calls) == [4] + [7] * 8
+
+
+@mock_dynamodb
+def test_dynamodb_calls(aws_credentials):
+    create_mock_ddb_table(50)
+    keys = [{'PostID': 'post-{}'.format(number), 'Author': 'user-{}'.format(number % 3)} for number in range(50)]
+    ids_event = {'body': json.dumps({'ids': [key['PostID'] for key in keys]})}
+
+    with instrumentation.collect() as documents:
+        keys_body = json.loads(batch_get_posts.batch_get_posts_handler(
+            {'body': json.dumps({'keys': keys + [{'PostID': 'post-1', 'Author': 'user-2'}]})}, None)['body'])
+        batch_get_posts.batch_get_posts_handler(ids_event, None)
+        ids_body = json.loads(batch_get_posts.batch_get_posts_handler(ids_event, None)['body'])
+
+    assert [item['PostID'] for item in keys_body['items']] == [key['PostID'] for key in keys]
+    assert keys_body['missing'] == [{'PostID': 'post-1', 'Author': 'user-2'}]
+    assert [item['PostID'] for item in ids_body['items']] == [key['PostID'] for key in keys]
+    # Keys go straight to two BatchGetItem chunks. PostIDs miss the slug index and are looked up by
+    # PostID once per container, both results are cached
+    assert [document['DynamoDBCalls'] for document in documents] == [3, 102, 2]
+
+
+def test_unprocessed_keys_retried():
+    keys = [{'PostID': 'p{}'.format(number), 'Author': 'a'} for number in range(3)]
+    client = FlakyClient()
+
+    items = batch.get_chunk(client, 'TABLE', keys, {'ProjectionExpression': 'Title'}, sleep=lambda delay: None)
+
+    assert client.calls == 3
+    assert [item['PostID'] for item in items] == ['p0', 'p1', 'p2']
+
+
+def test_unprocessed_keys_exhausted():
+    keys = [{'PostID': 'p0', 'Author': 'a'}]
+    delays = []
+
+    with pytest.raises(batch.BatchGetError):
+        batch.get_chunk(FlakyClient(throttled_calls=batch.MAX_ATTEMPTS), 'TABLE', keys, {}, sleep=delays.append)
+
+    assert len(delays) == batch.MAX_ATTEMPTS
+    assert all(0 <= delay <= batch.BACKOFF_CAP for delay in delays)
+
+
+@mock_dynamodb
+def create_mock_ddb_table(count):
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='POSTS_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'PostID',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Author',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Slug',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'PostID',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'Author',
+                'KeyType': 'RANGE'
+            }
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'SlugLookupIndex',
+                'KeySchema': [
+                    {
+                        'AttributeName': 'Slug',
+                        'KeyType': 'HASH'
+                    }
+                ],
+                'Projection': {
+                    'ProjectionType': 'INCLUDE',
+                    'NonKeyAttributes': ['DateCreated']
+                },
+                'ProvisionedThroughput': {
+                    'ReadCapacityUnits': 5,
+                    'WriteCapacityUnits': 5
+                }
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+
+    with mock_ddb.Table('POSTS_TABLE').batch_writer() as batch_writer:
+        for number in range(count):
+            batch_writer.put_item(
+                Item={
+                    'PostID': 'post-{}'.format(number),
+                    'Author': 'user-{}'.format(number % 3),
+                    'Slug': 'slug-{}'.format(number),
+                    'Title': 'Post {}'.format(number),
+                    'Content': 'Content {}'.format(number),
+                    'DateCreated': '2023-01-01T00:00:00.000Z'
+                }
+            )
@@ -0,0 +1,263 @@
+import os
+import json
+
+import boto3
+import pytest
+
+from moto import mock_dynamodb, mock_s3
+
+import bulk_rerender
+import clients
+import html_objects
+import publishing
+import tags
+
+BUCKET_NAME = 'POSTS_BUCKET'
+POSTS = 7
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    clients.reset()
+
+
+def stored_key(post_id):
+    item = boto3.resource('dynamodb').Table('POSTS_TABLE').get_item(Key={'PostID': post_id, 'Author': 'user'})['Item']
+
+    return publishing.stored_html_key(item)
+
+
+def html_of(post_id):
+    response = boto3.client('s3').get_object(Bucket=BUCKET_NAME, Key=stored_key(post_id))
+
+    return html_objects.decode(response['Body'].read(), response.get('ContentEncoding', html_objects.IDENTITY))
+
+
+def run_job(**kwargs):
+    # moto ignores Segment and returns the whole table to every segment, so these runs scan with one
+    return bulk_rerender.Job('POSTS_TABLE', BUCKET_NAME, segments=1, page_size=3, render_workers=1, **kwargs).run()
+
+
+@mock_dynamodb
+@mock_s3
+def test_rerenders_every_post(aws_credentials, tmp_path):
+    setup_resources()
+    checkpoint = str(tmp_path / 'checkpoint.json')
+
+    report = run_job(checkpoint_path=checkpoint)
+
+    assert report['scanned'] == POSTS
+    assert report['uploaded'] == POSTS
+    assert report['failed'] == 0
+    assert html_of('post-0') == '<h1>Post 0</h1>\n<p>Body of post 0</p>'
+    # A new version goes next to the post's current slug, HtmlURL moves to it
+    assert stored_key('post-1').startswith('user/post-1.')
+    assert html_of('post-1') == '<h1>Post 1</h1>\n<p>Body of post 1</p>'
+
+    with open(checkpoint) as checkpoint_file:
+        segments = json.load(checkpoint_file)['segments']
+
+    assert all(position['done'] for position in segments.values())
+
+    # A finished checkpoint leaves nothing to do, and without one the renders come out the same
+    assert run_job(checkpoint_path=checkpoint)['scanned'] == 0
+
+    report = run_job()
+
+    assert (report['uploaded'], report['unchanged']) == (0, POSTS)
+
+
+@mock_dynamodb
+@mock_s3
+def test_resumes_from_checkpoint(aws_credentials, tmp_path, monkeypatch):
+    setup_resources()
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    store_page = bulk_rerender.Job.store_page
+    pages = []
+
+    def interrupted(self, items, renderers, uploaders):
+        if pages:
+            raise KeyboardInterrupt
+        pages.append(items)
+        store_page(self, items, renderers, uploaders)
+
+    monkeypatch.setattr(bulk_rerender.Job, 'store_page', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        run_job(checkpoint_path=checkpoint)
+    monkeypatch.undo()
+
+    report = run_job(checkpoint_path=checkpoint)
+
+    assert report['uploaded'] == POSTS - len(pages[0])
+    assert len(boto3.client('s3').list_objects_v2(Bucket=BUCKET_NAME)['Contents']) == POSTS
+
+
+@mock_dynamodb
+@mock_s3
+def test_dry_run_diffs(aws_credentials):
+    setup_resources()
+    run_job()
+
+    s3 = boto3.client('s3')
+    s3.put_object(Bucket=BUCKET_NAME, Key=stored_key('post-0'), Body=b'<h1>Post 0</h1>\n<p>Old body</p>')
+    s3.delete_object(Bucket=BUCKET_NAME, Key=stored_key('post-2'))
+
+    report = run_job(dry_run=True, diff_limit=5)
+
+    assert report['uploaded'] == 0
+    assert (report['changed'], report['missing'], report['unchanged']) == (1, 1, POSTS - 2)
+    assert '-<p>Old body</p>' in report['diffs'][0]
+    assert html_of('post-0') == '<h1>Post 0</h1>\n<p>Old body</p>'
+
+
+@mock_dynamodb
+@mock_s3
+def test_dry_run_records_no_progress(aws_credentials, tmp_path):
+    setup_resources()
+    checkpoint = str(tmp_path / 'checkpoint.json')
+
+    run_job(dry_run=True, checkpoint_path=checkpoint)
+
+    assert not os.path.exists(checkpoint)
+    assert run_job(checkpoint_path=checkpoint)['uploaded'] == POSTS
+
+    with pytest.raises(SystemExit):
+        bulk_rerender.main(['--table', 'POSTS_TABLE', '--bucket', BUCKET_NAME, '--dry-run',
+                            '--checkpoint', checkpoint])
+
+
+@mock_dynamodb
+@mock_s3
+def test_unreadable_content_fails_the_post_only(aws_credentials):
+    setup_resources()
+    os.environ['CONTENT_BUCKET'] = 'CONTENT_BUCKET'
+    boto3.client('s3').create_bucket(Bucket='CONTENT_BUCKET')
+    boto3.resource('dynamodb').Table('POSTS_TABLE').update_item(
+        Key={'PostID': 'post-3', 'Author': 'user'}, UpdateExpression='SET ContentRef = :ref REMOVE Content',
+        ExpressionAttributeValues={':ref': 'post-3/missing.md'})
+
+    try:
+        report = run_job()
+    finally:
+        del os.environ['CONTENT_BUCKET']
+
+    assert report['failed'] == 1
+    assert report['failures'][0]['PostID'] == 'post-3'
+    assert report['uploaded'] == POSTS - 1
+
+
+@mock_dynamodb
+@mock_s3
+def test_moves_tag_index_urls_and_bumps_the_table_version(aws_credentials, monkeypatch):
+    setup_resources()
+    monkeypatch.setenv('TAGS_TABLE', 'TAGS_TABLE')
+    monkeypatch.setenv('READ_CACHE_VERSION_CHECK', 'true')
+    table = boto3.resource('dynamodb').Table('POSTS_TABLE')
+    tags_table = create_mock_tags_table()
+    table.update_item(Key={'PostID': 'post-0', 'Author': 'user'},
+                      UpdateExpression='SET Tags = :t, DateCreated = :d',
+                      ExpressionAttributeValues={':t': ['py'], ':d': '2023-01-01T00:00:00'})
+    tags.sync_post_tags(tags_table, None, table.get_item(Key={'PostID': 'post-0', 'Author': 'user'})['Item'])
+
+    report = run_job()
+
+    post = table.get_item(Key={'PostID': 'post-0', 'Author': 'user'})['Item']
+    version = table.get_item(Key={'PostID': '__table_version__', 'Author': '__table_version__'})['Item']
+
+    assert report['moved'] == POSTS
+    assert tags_table.get_item(Key={'Tag': 'py', 'TagSort': tags.sort_key(post)})['Item']['HtmlURL'] == \
+        post['HtmlURL']
+    assert version['Version'] == 2
+
+    # Nothing moves on a second run, the version stays
+    assert run_job()['moved'] == 0
+    assert table.get_item(Key={'PostID': '__table_version__', 'Author': '__table_version__'})['Item'][
+        'Version'] == 2
+
+
+def setup_resources():
+    boto3.client('s3').create_bucket(Bucket=BUCKET_NAME)
+    create_mock_ddb_table()
+
+    table = boto3.resource('dynamodb').Table('POSTS_TABLE')
+    for i in range(POSTS):
+        key = 'user/first-slug-{}.html'.format(i) if i == 1 else 'user/post-{}.html'.format(i)
+        table.put_item(Item={
+            'PostID': 'post-{}'.format(i),
+            'Author': 'user',
+            'Slug': 'post-{}'.format(i),
+            'Content': '# Post {0}\n\nBody of post {0}'.format(i),
+            'HtmlURL': 'https://{}.s3.amazonaws.com/{}'.format(BUCKET_NAME, key)
+        })
+    table.put_item(Item={'PostID': '__table_version__', 'Author': '__table_version__', 'Version': 1})
+
+
+@mock_dynamodb
+def create_mock_ddb_table():
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='POSTS_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'PostID',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Author',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'PostID',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'Author',
+                'KeyType': 'RANGE'
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+
+
+def create_mock_tags_table():
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='TAGS_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'Tag',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'TagSort',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'Tag',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'TagSort',
+                'KeyType': 'RANGE'
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+    return mock_ddb.Table('TAGS_TABLE')
@@ -0,0 +1,140 @@
+import os
+
+import boto3
+import pytest
+
+from moto import mock_dynamodb
+
+import cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    os.environ['READ_CACHE_VERSION_CHECK'] = 'true'
+    yield
+    os.environ['READ_CACHE_VERSION_CHECK'] = 'false'
+
+
+def test_lru_eviction():
+    read_cache = cache.TTLCache(maxsize=2, ttl=60)
+
+    read_cache.set('a', 1)
+    read_cache.set('b', 2)
+    read_cache.get('a')
+    read_cache.set('c', 3)
+
+    assert read_cache.get('b') is None
+    assert read_cache.get('a') == 1
+    assert read_cache.get('c') == 3
+    assert read_cache.stats() == {'size': 2, 'hits': 3, 'misses': 1, 'evictions': 1, 'expirations': 0}
+
+
+def test_byte_bound():
+    read_cache = cache.TTLCache(maxsize=8, ttl=60, total_bytes=10, sizeof=len)
+
+    read_cache.set('a', 'xxxx')
+    read_cache.set('b', 'xxxx')
+    read_cache.set('a', 'xxx')
+    read_cache.set('c', 'xxxx')
+
+    # Replacing 'a' moved it to the end, so 'b' was the oldest
+    assert read_cache.get('b') is None
+    assert read_cache.get('a') == 'xxx' and read_cache.get('c') == 'xxxx'
+    assert read_cache.stats()['bytes'] == 7
+
+    read_cache.pop('a')
+    assert read_cache.stats()['bytes'] == 4
+
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    read_cache = cache.TTLCache(maxsize=2, ttl=30, clock=clock)
+
+    read_cache.set('a', 1)
+    clock.now = 29.9
+    assert read_cache.get('a') == 1
+
+    clock.now = 30
+    assert read_cache.get('a') is None
+    assert read_cache.stats()['expirations'] == 1
+
+
+def test_disabled_cache_calls_loader():
+    read_cache = cache.TTLCache(maxsize=0, ttl=30)
+    calls = []
+
+    for _ in range(3):
+        cache.read_through(read_cache, None, None, ('k',), lambda: calls.append(1) or 'value')
+
+    assert len(calls) == 3
+
+
+@mock_dynamodb
+def test_version_bump_invalidates(aws_credentials):
+    table = create_mock_ddb_table()
+    clock = FakeClock()
+    read_cache = cache.TTLCache(maxsize=8, ttl=60, clock=clock)
+    table_version = cache.TableVersion(interval=1, clock=clock)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return 'value-{}'.format(len(calls))
+
+    assert cache.read_through(read_cache, table_version, table, ('k',), loader) == 'value-1'
+    assert cache.read_through(read_cache, table_version, table, ('k',), loader) == 'value-1'
+
+    cache.bump_table_version(table)
+
+    # The marker is re-read at most once per interval
+    assert cache.read_through(read_cache, table_version, table, ('k',), loader) == 'value-1'
+    clock.now = 1
+    assert cache.read_through(read_cache, table_version, table, ('k',), loader) == 'value-2'
+
+
+@mock_dynamodb
+def create_mock_ddb_table():
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='POSTS_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'PostID',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Author',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'PostID',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'Author',
+                'KeyType': 'RANGE'
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+    return mock_ddb.Table('POSTS_TABLE')
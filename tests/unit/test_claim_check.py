@@ -0,0 +1,185 @@
+import os
+import json
+
+import boto3
+import pytest
+
+from moto import mock_dynamodb, mock_s3, mock_stepfunctions
+
+import claim_check
+import clients
+import html_objects
+import publishing
+from blog_api import markdown_to_html
+from blog_api import sanitize_markdown
+from blog_api import validate_post
+
+WORKFLOW_BUCKET = 'WORKFLOW_BUCKET'
+POSTS_BUCKET = 'POSTS_BUCKET'
+
+PARAGRAPH = 'Claim checks keep the state machine payload small however long the post grows.\n\n'
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    os.environ['POSTS_TABLE'] = 'POSTS_TABLE'
+    os.environ['POSTS_BUCKET'] = POSTS_BUCKET
+    os.environ['WORKFLOW_BUCKET'] = WORKFLOW_BUCKET
+    clients.reset()
+
+    yield
+
+    for name in ('POSTS_BUCKET', 'WORKFLOW_BUCKET', 'STATE_MACHINE'):
+        os.environ.pop(name, None)
+
+
+def content_of_size(size):
+    return (PARAGRAPH * (size // len(PARAGRAPH) + 1))[:size]
+
+
+def start_workflow(content):
+    """Creates a post through validate_post and returns the inputs of the executions started so far"""
+
+    payload = validate_post.validate_post_handler({
+        'body': json.dumps({'title': 'Long Post', 'content': content}),
+        'requestContext': {'authorizer': {'principalId': 'test_user'}}
+    }, None)
+    assert payload['statusCode'] == 200
+
+    return execution_inputs()
+
+
+def execution_inputs():
+    stepfunctions = boto3.client('stepfunctions')
+    executions = stepfunctions.list_executions(stateMachineArn=os.environ['STATE_MACHINE'])['executions']
+
+    return [stepfunctions.describe_execution(executionArn=execution['executionArn'])['input']
+            for execution in executions]
+
+
+@mock_s3
+@mock_stepfunctions
+@mock_dynamodb
+def test_one_megabyte_post(aws_credentials):
+    setup_resources()
+    content = content_of_size(1024 * 1024)
+
+    state_input, = start_workflow(content)
+    state = json.loads(state_input)
+
+    assert len(state_input) < 1024
+    assert 'content' not in state
+    assert state['content_ref']['size'] == len(content)
+
+    state = sanitize_markdown.sanitize_markdown_handler(state, None)
+
+    assert len(json.dumps(state)) < 1024
+    assert 'sanitized_html' not in state
+    # Checked in gzip encoded, as the posts bucket stores it
+    assert state['html_ref']['encoding'] == 'gzip'
+    assert state['html_ref']['size'] < len(content)
+
+    html = claim_check.check_out(state['html_ref'])
+
+    assert html.startswith('<p>Claim checks')
+    assert state['html_ref']['digest'] == html_objects.digest(html.encode('utf-8'))
+    assert claim_check.content_of(state) == content
+
+
+@mock_s3
+@mock_stepfunctions
+@mock_dynamodb
+def test_state_size_is_constant(aws_credentials):
+    setup_resources()
+
+    start_workflow(content_of_size(1000))
+    short, long = sorted(start_workflow(content_of_size(200 * 1024)), key=len)
+
+    assert len(long) - len(short) < 16
+
+
+@mock_s3
+@mock_stepfunctions
+@mock_dynamodb
+def test_workflow_stores_checked_in_html(aws_credentials):
+    setup_resources()
+
+    state_input, = start_workflow('# Title\n\nBody')
+    state = sanitize_markdown.sanitize_markdown_handler(json.loads(state_input), None)
+    markdown_to_html.markdown_to_html_handler(json.loads(json.dumps(state)), None)
+
+    item = boto3.resource('dynamodb').Table('POSTS_TABLE').get_item(
+        Key={'PostID': state['post_id'], 'Author': 'test_user'})['Item']
+    html = boto3.client('s3').get_object(Bucket=POSTS_BUCKET, Key=publishing.stored_html_key(item))
+
+    assert publishing.stored_html_key(item) == html_objects.versioned_key('test_user/long-post.html',
+                                                                          state['html_ref']['digest'])
+    assert html['ContentType'] == html_objects.CONTENT_TYPE
+    assert html['ContentEncoding'] == 'gzip'
+    assert html['CacheControl'] == html_objects.CACHE_CONTROL
+    assert html_objects.decode(html['Body'].read(), 'gzip') == '<h1>Title</h1>\n<p>Body</p>'
+    assert item['Content'] == '# Title\n\nBody'
+
+
+def test_inline_state_without_bucket(aws_credentials):
+    del os.environ['WORKFLOW_BUCKET']
+
+    state = sanitize_markdown.sanitize_markdown_handler({'post_id': 'p1', 'content': 'Body'}, None)
+
+    assert state['sanitized_html'] == '<p>Body</p>'
+    assert 'html_ref' not in state
+
+
+def setup_resources():
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket=WORKFLOW_BUCKET)
+    s3.create_bucket(Bucket=POSTS_BUCKET)
+    setup_state_machine()
+    create_mock_ddb_table()
+
+
+def setup_state_machine():
+    os.environ['STATE_MACHINE'] = boto3.client('stepfunctions').create_state_machine(
+        name='PostStateMachine',
+        definition=json.dumps({'StartAt': 'Done', 'States': {'Done': {'Type': 'Pass', 'End': True}}}),
+        roleArn='arn:aws:iam::123456789012:role/test'
+    )['stateMachineArn']
+
+
+@mock_dynamodb
+def create_mock_ddb_table():
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='POSTS_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'PostID',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Author',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'PostID',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'Author',
+                'KeyType': 'RANGE'
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
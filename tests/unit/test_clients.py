@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+import clients
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    clients.reset()
+    yield
+    os.environ.pop('CLIENT_READ_TIMEOUT', None)
+    os.environ.pop('CLIENT_RETRY_MODE', None)
+    clients.reset()
+
+
+def test_clients_are_shared(aws_credentials):
+    s3 = clients.get_client('s3')
+    dynamodb = clients.get_resource('dynamodb')
+
+    assert clients.get_client('s3') is s3
+    assert clients.get_resource('dynamodb') is dynamodb
+    assert clients.get_client('dynamodb') is not dynamodb.meta.client
+
+    clients.reset()
+
+    assert clients.get_client('s3') is not s3
+
+
+def test_client_config(aws_credentials):
+    os.environ['CLIENT_READ_TIMEOUT'] = '3'
+    os.environ['CLIENT_RETRY_MODE'] = 'standard'
+
+    config = clients.get_resource('dynamodb').meta.client.meta.config
+
+    assert config.read_timeout == 3
+    assert config.tcp_keepalive is True
+    assert config.max_pool_connections == 16
+    assert config.retries['mode'] == 'standard'
@@ -0,0 +1,37 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+CODE_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'blog_api')
+
+HEAVY_MODULES = ['PIL', 'markdown', 'bleach', 'streaming_form_data']
+
+
+def imported_modules(module):
+    """Imports a handler in a fresh interpreter and returns the top-level modules it pulled in"""
+
+    script = 'import sys, json; import {}; print(json.dumps(sorted(sys.modules)))'.format(module)
+    result = subprocess.run([sys.executable, '-c', script], cwd=CODE_ROOT, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=CODE_ROOT, AWS_DEFAULT_REGION='us-east-1'), check=True)
+
+    return set(json.loads(result.stdout))
+
+
+@pytest.mark.parametrize('module', ['token_authorizer', 'list_posts', 'retrieve_post', 'upload_image',
+                                    'sanitize_markdown'])
+def test_heavy_dependencies_are_lazy(module):
+    loaded = imported_modules(module)
+
+    assert [heavy for heavy in HEAVY_MODULES if heavy in loaded] == []
+
+
+def test_sanitize_markdown_imports_on_use():
+    from blog_api import sanitize_markdown
+
+    event = sanitize_markdown.sanitize_markdown_handler({'content': '# Title\n\n<script>x</script>'}, None)
+
+    assert '<h1>Title</h1>' in event['sanitized_html']
+    assert '<script>' not in event['sanitized_html']
@@ -0,0 +1,182 @@
+import os
+import json
+
+import boto3
+import pytest
+
+from boto3.dynamodb.types import Binary
+from moto import mock_dynamodb, mock_s3
+
+import clients
+import content_codec
+import content_store
+import publishing
+import slugs
+from blog_api import retrieve_post
+from blog_api import update_post
+
+CONTENT = '# Capacity\n\n' + 'DynamoDB bills reads and writes by item size, so smaller items cost less.\n\n' * 40
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    os.environ['POSTS_TABLE'] = 'POSTS_TABLE'
+    os.environ['POSTS_BUCKET'] = 'POSTS_BUCKET'
+    clients.reset()
+    slugs.slug_cache.clear()
+    retrieve_post.read_cache.clear()
+
+    yield
+
+    for name in ('POSTS_BUCKET', 'CONTENT_COMPRESSION'):
+        os.environ.pop(name, None)
+
+
+def test_round_trip():
+    stored = content_codec.encode(CONTENT)
+
+    assert stored[:1] == content_codec.ZLIB_VERSION
+    assert len(stored) * 3 < len(CONTENT)
+    assert content_codec.decode(stored) == CONTENT
+    assert content_codec.decode(Binary(stored)) == CONTENT
+
+
+def test_plain_values():
+    # Items written before the codec, content that doesn't compress and disabled compression stay strings
+    assert content_codec.decode(CONTENT) == CONTENT
+    assert content_codec.encode('Short') == 'Short'
+
+    os.environ['CONTENT_COMPRESSION'] = 'none'
+    try:
+        assert content_codec.encode(CONTENT) == CONTENT
+    finally:
+        del os.environ['CONTENT_COMPRESSION']
+
+
+def test_unknown_version():
+    with pytest.raises(ValueError):
+        content_codec.decode(b'\x07' + CONTENT.encode('utf-8'))
+
+
+@mock_s3
+@mock_dynamodb
+def test_written_compressed_read_plain(aws_credentials):
+    table = create_mock_ddb_table()
+    boto3.client('s3').create_bucket(Bucket='POSTS_BUCKET')
+    publishing.store({
+        'post_id': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'title': 'Capacity', 'slug': 'capacity',
+        'description': '', 'author': 'test_user', 'content': CONTENT, 'sanitized_html': '<h1>Capacity</h1>',
+        'date_created': '2023-01-01T00:00:00', 'date_updated': '2023-01-01T00:00:00', 'tags': []
+    })
+
+    stored = table.get_item(Key={'PostID': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'Author': 'test_user'})['Item']
+    assert isinstance(stored['Content'], Binary)
+
+    payload = retrieve_post.retrieve_post_handler(post_event(), None)
+
+    assert payload['statusCode'] == 200
+    assert json.loads(payload['body'])[0]['Content'] == CONTENT
+
+
+@mock_dynamodb
+def test_update_compresses_legacy_item(aws_credentials):
+    table = create_mock_ddb_table()
+    table.put_item(Item={'PostID': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'Author': 'test_user', 'Slug': 'capacity',
+                         'Title': 'Capacity', 'Content': CONTENT})
+
+    payload = retrieve_post.retrieve_post_handler(post_event(), None)
+    assert json.loads(payload['body'])[0]['Content'] == CONTENT
+
+    edited = CONTENT + 'Edited.\n'
+    payload = update_post.update_post_handler(post_event(body={'content': edited}), None)
+
+    assert payload['statusCode'] == 200
+    assert json.loads(payload['body'])['Content'] == edited
+
+    stored = table.get_item(Key={'PostID': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'Author': 'test_user'})['Item']
+    assert content_codec.decode(stored['Content']) == edited
+    assert isinstance(stored['Content'], Binary)
+
+
+def test_load_plain_and_compressed_items():
+    # moto can't apply a ProjectionExpression to items with binary attributes, so the listing path is covered here
+    items = [{'PostID': 'plain', 'Content': CONTENT},
+             {'PostID': 'compressed', 'Content': Binary(content_codec.encode(CONTENT))}]
+
+    content_store.load_all(items)
+
+    assert [item['Content'] for item in items] == [CONTENT, CONTENT]
+
+
+def post_event(body=None):
+    event = {
+        'pathParameters': {'slug': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2'},
+        'requestContext': {'authorizer': {'principalId': 'test_user'}}
+    }
+    if body is not None:
+        event['body'] = json.dumps(body)
+
+    return event
+
+
+@mock_dynamodb
+def create_mock_ddb_table():
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='POSTS_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'PostID',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Author',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Slug',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'PostID',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'Author',
+                'KeyType': 'RANGE'
+            }
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'SlugLookupIndex',
+                'KeySchema': [
+                    {
+                        'AttributeName': 'Slug',
+                        'KeyType': 'HASH'
+                    }
+                ],
+                'Projection': {
+                    'ProjectionType': 'INCLUDE',
+                    'NonKeyAttributes': ['DateCreated']
+                },
+                'ProvisionedThroughput': {
+                    'ReadCapacityUnits': 5,
+                    'WriteCapacityUnits': 5
+                }
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+    return mock_ddb.Table('POSTS_TABLE')
@@ -0,0 +1,305 @@
+import os
+import json
+
+import boto3
+import pytest
+
+from moto import mock_dynamodb, mock_s3, mock_stepfunctions
+
+import clients
+import content_store
+import publishing
+import slugs
+from blog_api import delete_post
+from blog_api import markdown_to_html
+from blog_api import retrieve_post
+from blog_api import sanitize_markdown
+from blog_api import update_post
+from blog_api import validate_post
+
+CONTENT_BUCKET = 'CONTENT_BUCKET'
+POSTS_BUCKET = 'POSTS_BUCKET'
+WORKFLOW_BUCKET = 'WORKFLOW_BUCKET'
+
+PARAGRAPH = 'Large posts keep only a pointer in the posts table and their body in the content bucket.\n\n'
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    os.environ['POSTS_TABLE'] = 'POSTS_TABLE'
+    os.environ['POSTS_BUCKET'] = POSTS_BUCKET
+    os.environ['CONTENT_BUCKET'] = CONTENT_BUCKET
+    os.environ['CONTENT_OFFLOAD_BYTES'] = '1024'
+    clients.reset()
+    slugs.slug_cache.clear()
+    retrieve_post.read_cache.clear()
+
+    yield
+
+    for name in ('POSTS_BUCKET', 'CONTENT_BUCKET', 'CONTENT_OFFLOAD_BYTES', 'WORKFLOW_BUCKET', 'STATE_MACHINE'):
+        os.environ.pop(name, None)
+
+
+def content_of_size(size):
+    return (PARAGRAPH * (size // len(PARAGRAPH) + 1))[:size]
+
+
+def create_post(content):
+    return publishing.store({
+        'post_id': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'title': 'Large Post', 'slug': 'large-post',
+        'description': '', 'author': 'test_user', 'content': content, 'sanitized_html': '<p>Body</p>',
+        'date_created': '2023-01-01T00:00:00', 'date_updated': '2023-01-01T00:00:00', 'tags': []
+    })
+
+
+def post_event(query=None, body=None):
+    event = {
+        'pathParameters': {'slug': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2'},
+        'requestContext': {'authorizer': {'principalId': 'test_user'}}
+    }
+    if query is not None:
+        event['queryStringParameters'] = query
+    if body is not None:
+        event['body'] = json.dumps(body)
+
+    return event
+
+
+def stored_item():
+    return boto3.resource('dynamodb').Table('POSTS_TABLE').get_item(
+        Key={'PostID': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'Author': 'test_user'})['Item']
+
+
+def content_objects():
+    return [item['Key'] for item in boto3.client('s3').list_objects_v2(Bucket=CONTENT_BUCKET).get('Contents', [])]
+
+
+@mock_s3
+@mock_dynamodb
+def test_small_content_stays_inline(aws_credentials):
+    setup_resources()
+
+    create_post('Short body')
+
+    assert stored_item()['Content'] == 'Short body'
+    assert 'ContentRef' not in stored_item()
+    assert content_objects() == []
+
+
+@mock_s3
+@mock_dynamodb
+def test_large_content_is_offloaded(aws_credentials):
+    setup_resources()
+    content = content_of_size(4096)
+
+    create_post(content)
+    item = stored_item()
+
+    assert 'Content' not in item
+    assert item['ContentRef'] == content_store.object_key(item['PostID'], content)
+    assert content_objects() == [item['ContentRef']]
+
+    payload = retrieve_post.retrieve_post_handler(post_event(), None)
+    post, = json.loads(payload['body'])
+
+    assert post['Content'] == content
+    assert 'ContentRef' not in post
+
+
+@mock_s3
+@mock_dynamodb
+def test_fields_without_content_skip_the_bucket(aws_credentials):
+    setup_resources()
+    create_post(content_of_size(4096))
+    for key in content_objects():
+        boto3.client('s3').delete_object(Bucket=CONTENT_BUCKET, Key=key)
+
+    # The object is gone, so the read only succeeds when it never asks for it
+    payload = retrieve_post.retrieve_post_handler(post_event({'fields': 'Title,Slug'}), None)
+
+    assert payload['statusCode'] == 200
+    assert json.loads(payload['body']) == [{'Title': 'Large Post', 'Slug': 'large-post'}]
+
+
+@mock_s3
+@mock_dynamodb
+def test_update_replaces_and_inlines_content(aws_credentials):
+    setup_resources()
+    create_post(content_of_size(4096))
+    first_ref = stored_item()['ContentRef']
+
+    edited = content_of_size(8192)
+    payload = update_post.update_post_handler(post_event(body={'content': edited}), None)
+
+    assert payload['statusCode'] == 200
+    assert json.loads(payload['body'])['Content'] == edited
+    assert 'ContentRef' not in json.loads(payload['body'])
+    assert content_objects() == [stored_item()['ContentRef']] != [first_ref]
+
+    payload = update_post.update_post_handler(post_event(body={'content': 'Short again'}), None)
+
+    assert payload['statusCode'] == 200
+    assert stored_item()['Content'] == 'Short again'
+    assert 'ContentRef' not in stored_item()
+    assert content_objects() == []
+
+
+@mock_s3
+@mock_dynamodb
+def test_update_without_content_skips_the_bucket(aws_credentials):
+    setup_resources()
+    create_post(content_of_size(4096))
+    ref = stored_item()['ContentRef']
+    for key in content_objects():
+        boto3.client('s3').delete_object(Bucket=CONTENT_BUCKET, Key=key)
+
+    # The object is gone, so the update only succeeds when it never asks for it
+    payload = update_post.update_post_handler(post_event(body={'description': 'Edited'}), None)
+    post = json.loads(payload['body'])
+
+    assert payload['statusCode'] == 200
+    assert post['Description'] == 'Edited'
+    assert 'Content' not in post and 'ContentRef' not in post
+    assert stored_item()['ContentRef'] == ref
+
+
+@pytest.mark.parametrize('size', [256, 4096])
+@mock_s3
+@mock_dynamodb
+def test_update_responds_with_content_only_when_it_changes(aws_credentials, monkeypatch, size):
+    # moto can't apply the update's ProjectionExpression to binary attributes, inline content stays a string
+    monkeypatch.setenv('CONTENT_COMPRESSION', 'none')
+    setup_resources()
+    create_post(content_of_size(size))
+
+    post = json.loads(update_post.update_post_handler(post_event(body={'title': 'Renamed'}), None)['body'])
+
+    assert post['Title'] == 'Renamed'
+    assert 'Content' not in post and 'ContentRef' not in post
+
+    post = json.loads(update_post.update_post_handler(post_event(body={'content': 'Edited'}), None)['body'])
+
+    assert post['Content'] == 'Edited' and 'ContentRef' not in post
+
+
+@mock_s3
+@mock_dynamodb
+def test_delete_removes_content(aws_credentials):
+    setup_resources()
+    create_post(content_of_size(4096))
+
+    payload = delete_post.delete_post_handler(post_event(), None)
+
+    assert payload['statusCode'] == 204
+    assert content_objects() == []
+
+
+@mock_s3
+@mock_stepfunctions
+@mock_dynamodb
+def test_one_megabyte_post(aws_credentials):
+    setup_resources()
+    os.environ['WORKFLOW_BUCKET'] = WORKFLOW_BUCKET
+    boto3.client('s3').create_bucket(Bucket=WORKFLOW_BUCKET)
+    os.environ['STATE_MACHINE'] = boto3.client('stepfunctions').create_state_machine(
+        name='PostStateMachine',
+        definition=json.dumps({'StartAt': 'Done', 'States': {'Done': {'Type': 'Pass', 'End': True}}}),
+        roleArn='arn:aws:iam::123456789012:role/test'
+    )['stateMachineArn']
+    content = content_of_size(1024 * 1024)
+
+    payload = validate_post.validate_post_handler({
+        'body': json.dumps({'title': 'Large Post', 'content': content}),
+        'requestContext': {'authorizer': {'principalId': 'test_user'}}
+    }, None)
+    assert payload['statusCode'] == 200
+
+    stepfunctions = boto3.client('stepfunctions')
+    execution, = stepfunctions.list_executions(stateMachineArn=os.environ['STATE_MACHINE'])['executions']
+    state = json.loads(stepfunctions.describe_execution(executionArn=execution['executionArn'])['input'])
+    state = sanitize_markdown.sanitize_markdown_handler(state, None)
+    markdown_to_html.markdown_to_html_handler(state, None)
+
+    # Far over the 400 KB item limit, the item itself stays small
+    item = boto3.resource('dynamodb').Table('POSTS_TABLE').get_item(
+        Key={'PostID': state['post_id'], 'Author': 'test_user'})['Item']
+
+    assert 'Content' not in item
+    assert len(json.dumps(item, default=str)) < 1024
+
+    payload = retrieve_post.retrieve_post_handler({
+        'pathParameters': {'slug': state['post_id']},
+        'requestContext': {'authorizer': {'principalId': 'test_user'}}
+    }, None)
+
+    assert payload['statusCode'] == 200
+    assert json.loads(payload['body'])[0]['Content'] == content
+
+
+def setup_resources():
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket=CONTENT_BUCKET)
+    s3.create_bucket(Bucket=POSTS_BUCKET)
+    create_mock_ddb_table()
+
+
+@mock_dynamodb
+def create_mock_ddb_table():
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='POSTS_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'PostID',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Author',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Slug',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'PostID',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'Author',
+                'KeyType': 'RANGE'
+            }
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'SlugLookupIndex',
+                'KeySchema': [
+                    {
+                        'AttributeName': 'Slug',
+                        'KeyType': 'HASH'
+                    }
+                ],
+                'Projection': {
+                    'ProjectionType': 'INCLUDE',
+                    'NonKeyAttributes': ['DateCreated']
+                },
+                'ProvisionedThroughput': {
+                    'ReadCapacityUnits': 5,
+                    'WriteCapacityUnits': 5
+                }
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
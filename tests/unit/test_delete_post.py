@@ -6,6 +6,8 @@ import pytest
 
 from moto import mock_dynamodb
 
+import clients
+import slugs
 from blog_api import delete_post
 
 
@@ -19,6 +21,8 @@ def aws_credentials():
     os.environ["AWS_SESSION_TOKEN"] = "testing"
     os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
     os.environ['POSTS_TABLE'] = 'POSTS_TABLE'
+    clients.reset()
+    slugs.slug_cache.clear()
 
 
 def test_initialization(aws_credentials):
@@ -56,6 +60,78 @@ def test_valid_request(aws_credentials):
     assert payload['statusCode'] == 204
 
 
+@mock_dynamodb
+def test_slug_path(aws_credentials):
+    event = {
+        'pathParameters': {'slug': 'unit-testing'},
+        'requestContext': {"authorizer": {"principalId": "test_user"}}
+    }
+    context = None
+
+    create_mock_ddb_table()
+
+    payload = delete_post.delete_post_handler(event, context)
+    table = boto3.resource('dynamodb').Table('POSTS_TABLE')
+
+    assert payload['statusCode'] == 204
+    assert table.get_item(Key={'PostID': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'Author': 'test_user'}).get('Item') is None
+    assert slugs.slug_cache.stats()['size'] == 0
+
+
+@mock_dynamodb
+def test_missing_post(aws_credentials):
+    event = {
+        'pathParameters': {'slug': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2'},
+        'requestContext': {"authorizer": {"principalId": "other_user"}}
+    }
+    context = None
+
+    create_mock_ddb_table()
+
+    payload = delete_post.delete_post_handler(event, context)
+    table = boto3.resource('dynamodb').Table('POSTS_TABLE')
+
+    assert payload['statusCode'] == 404
+    assert table.get_item(Key={'PostID': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'Author': 'test_user'}).get('Item')
+
+
+@mock_dynamodb
+def test_slug_of_another_author(aws_credentials):
+    event = {
+        'pathParameters': {'slug': 'unit-testing'},
+        'requestContext': {"authorizer": {"principalId": "test_user"}}
+    }
+    context = None
+
+    create_mock_ddb_table()
+    table = boto3.resource('dynamodb').Table('POSTS_TABLE')
+    table.put_item(Item={'PostID': 'b1', 'Author': 'other_user', 'Slug': 'unit-testing',
+                         'DateCreated': '2099-01-01T00:00:00'})
+
+    payload = delete_post.delete_post_handler(event, context)
+
+    assert payload['statusCode'] == 204
+    assert table.get_item(Key={'PostID': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'Author': 'test_user'}).get('Item') is None
+    assert table.get_item(Key={'PostID': 'b1', 'Author': 'other_user'}).get('Item')
+
+
+@mock_dynamodb
+def test_forget_with_version_check(aws_credentials):
+    os.environ['READ_CACHE_VERSION_CHECK'] = 'true'
+    try:
+        create_mock_ddb_table()
+        table = boto3.resource('dynamodb').Table('POSTS_TABLE')
+
+        assert slugs.resolve(table, 'unit-testing', 'test_user') == ('a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'test_user')
+        assert slugs.slug_cache.stats()['size'] == 1
+
+        slugs.forget('unit-testing', 'test_user')
+
+        assert slugs.slug_cache.stats()['size'] == 0
+    finally:
+        del os.environ['READ_CACHE_VERSION_CHECK']
+
+
 @mock_dynamodb
 def create_mock_ddb_table():
     mock_ddb = boto3.resource('dynamodb')
@@ -69,6 +145,10 @@ def create_mock_ddb_table():
             {
                 'AttributeName': 'Author',
                 'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Slug',
+                'AttributeType': 'S'
             }
         ],
         KeySchema=[
@@ -81,6 +161,25 @@ def create_mock_ddb_table():
                 'KeyType': 'RANGE'
             }
         ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'SlugLookupIndex',
+                'KeySchema': [
+                    {
+                        'AttributeName': 'Slug',
+                        'KeyType': 'HASH'
+                    }
+                ],
+                'Projection': {
+                    'ProjectionType': 'INCLUDE',
+                    'NonKeyAttributes': ['DateCreated']
+                },
+                'ProvisionedThroughput': {
+                    'ReadCapacityUnits': 5,
+                    'WriteCapacityUnits': 5
+                }
+            }
+        ],
         ProvisionedThroughput={
             'ReadCapacityUnits': 5,
             'WriteCapacityUnits': 5
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from benchmarks import emulator
+
+
+@pytest.fixture(scope="module")
+def api():
+    return emulator.LocalApi.from_template()
+
+
+def echo(event, context):
+    return {'statusCode': 200, 'body': json.dumps({'event': event, 'function': context.function_name})}
+
+
+def test_routes_from_template(api):
+    search, parameters = api.route('GET', '/posts/search')
+    assert search.function == 'SearchPostsFunction'
+    assert parameters == {}
+
+    retrieve, parameters = api.route('GET', '/posts/my-post')
+    assert retrieve.handler == 'retrieve_post.retrieve_post_handler'
+    assert retrieve.authorizer is None
+    assert parameters == {'slug': 'my-post'}
+
+    update, _ = api.route('PUT', '/posts/my-post')
+    assert update.authorizer == 'TokenAuthorizer'
+
+    assert api.route('PATCH', '/posts') == (None, None)
+    assert api.invoke('GET', '/unknown')['statusCode'] == 403
+
+
+def test_authorizer_step(api):
+    assert api.invoke('PUT', '/posts/my-post', body='{}')['statusCode'] == 401
+    assert api.invoke('PUT', '/posts/my-post', headers={'Authorization': 'bad'}, body='{}')['statusCode'] == 403
+
+
+def test_proxy_event(api):
+    api.handlers['update_post.update_post_handler'] = echo
+    try:
+        response = api.invoke('PUT', '/posts/my-post', headers={'Authorization': 'token'}, query={'a': '1'},
+                              body='{"title": "x"}')
+    finally:
+        del api.handlers['update_post.update_post_handler']
+
+    body = json.loads(response['body'])
+
+    assert body['function'] == 'UpdatePostFunction'
+    assert body['event']['pathParameters'] == {'slug': 'my-post'}
+    assert body['event']['queryStringParameters'] == {'a': '1'}
+    assert body['event']['requestContext']['authorizer']['principalId'] == 'user'
+    assert body['event']['body'] == '{"title": "x"}'
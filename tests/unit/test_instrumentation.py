@@ -0,0 +1,191 @@
+import os
+import json
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import pytest
+
+from moto import mock_dynamodb
+
+import clients
+import instrumentation
+import slugs
+from blog_api import update_post
+
+
+class Context:
+    function_name = 'UpdatePostFunction'
+    aws_request_id = 'request-1'
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    os.environ['POSTS_TABLE'] = 'POSTS_TABLE'
+    os.environ['METRICS_ENABLED'] = 'false'
+    clients.reset()
+    slugs.slug_cache.clear()
+
+    yield
+
+    del os.environ['METRICS_ENABLED']
+
+
+@mock_dynamodb
+def test_update_post_metrics(aws_credentials):
+    event = {
+        'pathParameters': {'slug': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2'},
+        'requestContext': {"authorizer": {"principalId": "user"}},
+        'body': '{ "title": "New Title" }'
+    }
+
+    create_mock_ddb_table()
+
+    with instrumentation.collect() as documents:
+        first = update_post.update_post_handler(event, Context())
+        update_post.update_post_handler(event, Context())
+
+    assert first['statusCode'] == 200
+
+    document = documents[0]
+    metrics = document['_aws']['CloudWatchMetrics'][0]
+
+    assert metrics['Namespace'] == 'ServerlessBlog'
+    assert metrics['Dimensions'] == [['FunctionName']]
+    assert {metric['Name'] for metric in metrics['Metrics']} == set(document) - {'_aws', 'FunctionName', 'RequestId'}
+    assert document['FunctionName'] == 'UpdatePostFunction'
+    assert document['RequestId'] == 'request-1'
+
+    for name in ('Phase.parse', 'Phase.resolve', 'Phase.update_item', 'Phase.slugify', 'Phase.serialize'):
+        assert document[name] >= 0
+    assert document['Duration'] >= document['Phase.update_item']
+    assert document['DynamoDBCalls'] >= 2
+    assert document['ConsumedCapacity'] > 0
+    assert document['RequestBytes'] == len(event['body'])
+    assert document['ResponseBytes'] == len(first['body'])
+    assert documents[1]['ColdStart'] == 0
+
+
+def test_explicit_capacity_request_is_kept():
+    params = {'ReturnConsumedCapacity': 'INDEXES'}
+
+    instrumentation.request_capacity(params, type('Model', (), {'name': 'Query'}))
+
+    assert params == {'ReturnConsumedCapacity': 'INDEXES'}
+
+
+def test_metrics_disabled(aws_credentials, capsys):
+    handler = instrumentation.instrumented(lambda event, context: {'statusCode': 200, 'body': 'ok'})
+
+    with instrumentation.collect() as documents:
+        handler({'body': '{}'}, None)
+
+    assert documents[0]['ResponseBytes'] == 2
+    assert capsys.readouterr().out == ''
+
+    os.environ['METRICS_ENABLED'] = 'true'
+    handler({'body': '{}'}, None)
+
+    assert json.loads(capsys.readouterr().out)['RequestBytes'] == 2
+
+
+def test_concurrent_invocations_keep_their_metrics(aws_credentials):
+    both_started = threading.Barrier(2)
+
+    @instrumentation.instrumented
+    def handler(event, context):
+        both_started.wait(timeout=5)
+        instrumentation.add_metric(event['name'])
+
+        # Work handed to a pool thread reports to the invocation that submitted it
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(instrumentation.propagate(instrumentation.add_metric), 'Pooled').result()
+            executor.submit(instrumentation.add_metric, 'Lost').result()
+
+        return {'statusCode': 200, 'body': event['name']}
+
+    with instrumentation.collect() as documents:
+        threads = [threading.Thread(target=handler, args=({'name': name}, None)) for name in ('First', 'Second')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    metrics = sorted([name for name in ('First', 'Second', 'Pooled', 'Lost') if name in document]
+                     for document in documents)
+    assert metrics == [['First', 'Pooled'], ['Second', 'Pooled']]
+
+
+@mock_dynamodb
+def create_mock_ddb_table():
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='POSTS_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'PostID',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Author',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Slug',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'PostID',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'Author',
+                'KeyType': 'RANGE'
+            }
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'SlugLookupIndex',
+                'KeySchema': [
+                    {
+                        'AttributeName': 'Slug',
+                        'KeyType': 'HASH'
+                    }
+                ],
+                'Projection': {
+                    'ProjectionType': 'INCLUDE',
+                    'NonKeyAttributes': ['DateCreated']
+                },
+                'ProvisionedThroughput': {
+                    'ReadCapacityUnits': 5,
+                    'WriteCapacityUnits': 5
+                }
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+    mock_ddb.Table('POSTS_TABLE').put_item(
+        Item={
+            'PostID': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2',
+            'DateCreated': '2020-01-01T00:00:00.000Z',
+            'Slug': 'unit-testing',
+            'Title': 'Unit Testing',
+            'Content': 'Unit Testing Content',
+            'Author': 'user',
+            'Description': 'Unit Testing Description',
+            'Tags': ['unit', 'testing']
+        }
+    )
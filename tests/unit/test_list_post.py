@@ -1,5 +1,7 @@
 import os
 import json
+import math
+import uuid
 
 import boto3
 import pytest
@@ -8,8 +10,12 @@ from moto import mock_dynamodb
 
 from blog_api import list_posts
 
-# TODO: Add pagination tests
-# TODO: Add filtering tests
+import clients
+import feed
+import instrumentation
+import pagination
+import projection
+import tags
 
 
 @pytest.fixture(scope="function")
@@ -22,6 +28,10 @@ def aws_credentials():
     os.environ["AWS_SESSION_TOKEN"] = "testing"
     os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
     os.environ['POSTS_TABLE'] = 'POSTS_TABLE'
+    clients.reset()
+    os.environ['FEED_START_MONTH'] = months_ago(12)
+    os.environ['DATE_BUCKET_SHARDS'] = '1'
+    list_posts.read_cache.clear()
 
 
 def test_initialization(aws_credentials):
@@ -44,7 +54,7 @@ def test_empty_table(aws_credentials):
 
     payload = list_posts.list_posts_handler(event, context)
 
-    assert json.loads(payload['body']) == []
+    assert json.loads(payload['body']) == {'items': [], 'next_cursor': None}
 
 
 @mock_dynamodb
@@ -59,13 +69,289 @@ def test_valid_request(aws_credentials):
             'Slug': 'unit-testing',
             'Title': 'Unit Testing',
             'Content': 'Unit Testing Content',
-            'Author': 'test_user'
+            'Author': 'test_user',
+            'DateCreated': months_ago(1) + '-01T00:00:00',
+            'DateBucket': months_ago(1)
         }
     )
 
     payload = list_posts.list_posts_handler(event, context)
 
     assert payload['statusCode'] == 200
+    assert json.loads(payload['body'])['items'][0]['Title'] == 'Unit Testing'
+
+
+@mock_dynamodb
+def test_conditional_get(aws_credentials):
+    os.environ['CACHE_CONTROL_STALE_WHILE_REVALIDATE'] = '300'
+    create_mock_ddb_table()
+
+    payload = list_posts.list_posts_handler({}, None)
+    etag = payload['headers']['ETag']
+
+    assert payload['headers']['Cache-Control'] == 'public, max-age=60, stale-while-revalidate=300'
+
+    payload = list_posts.list_posts_handler({'headers': {'If-None-Match': etag}}, None)
+    del os.environ['CACHE_CONTROL_STALE_WHILE_REVALIDATE']
+
+    assert payload['statusCode'] == 304
+    assert 'body' not in payload
+
+
+@mock_dynamodb
+def test_summary_projection_by_default(aws_credentials):
+    table = create_mock_ddb_table()
+    seed_posts(table, 3)
+
+    items = json.loads(list_posts.list_posts_handler({}, None)['body'])['items']
+
+    assert len(items) == 3
+    assert all('Content' not in item and 'Author' not in item for item in items)
+    assert all(set(item) <= set(projection.SUMMARY_FIELDS) for item in items)
+
+
+@mock_dynamodb
+def test_sparse_fieldset(aws_credentials):
+    table = create_mock_ddb_table()
+    seed_posts(table, 30, months=2)
+
+    event = {'queryStringParameters': {'fields': 'Title', 'limit': '10'}}
+    body = json.loads(list_posts.list_posts_handler(event, None)['body'])
+
+    assert body['items'] == [{'Title': item['Title']} for item in body['items']]
+
+    # The cursor keys are read alongside the requested fields, so paging still works
+    event['queryStringParameters']['cursor'] = body['next_cursor']
+    assert len(json.loads(list_posts.list_posts_handler(event, None)['body'])['items']) == 10
+
+
+@mock_dynamodb
+def test_fields_outside_the_index(aws_credentials):
+    table = create_mock_ddb_table()
+    seed_posts(table, 12, months=2)
+
+    event = {'queryStringParameters': {'fields': 'Title,Content', 'limit': '10'}}
+    body = json.loads(list_posts.list_posts_handler(event, None)['body'])
+    summaries = json.loads(list_posts.list_posts_handler(
+        {'queryStringParameters': {'limit': '10'}}, None)['body'])['items']
+
+    # Content isn't in the date index, the page is read from the posts table in index order
+    assert [item['Title'] for item in body['items']] == [item['Title'] for item in summaries]
+    assert all(item['Content'] == 'Lorem ipsum dolor sit amet ' * 20 for item in body['items'])
+
+    event['queryStringParameters']['cursor'] = body['next_cursor']
+    assert len(json.loads(list_posts.list_posts_handler(event, None)['body'])['items']) == 2
+
+
+@mock_dynamodb
+def test_tag_filter_reads_the_tag_index(aws_credentials):
+    os.environ['TAGS_TABLE'] = 'TAGS_TABLE'
+    create_mock_ddb_table()
+    tags_table = create_mock_tags_table()
+    for i, post_tags in enumerate([['python'], ['aws'], ['python', 'aws'], []]):
+        tags.sync_post_tags(tags_table, None, {
+            'PostID': 'post-{}'.format(i),
+            'Author': 'test_user',
+            'Title': 'Post {}'.format(i),
+            'DateCreated': '{}-0{}T00:00:00'.format(months_ago(1), i + 1),
+            'Tags': post_tags
+        })
+
+    queries = record_queries()
+    try:
+        any_body = json.loads(list_posts.list_posts_handler(
+            {'queryStringParameters': {'tag': 'python,AWS'}}, None)['body'])
+        all_body = json.loads(list_posts.list_posts_handler(
+            {'queryStringParameters': {'tag': 'python,aws', 'match': 'all'}}, None)['body'])
+    finally:
+        queries.stop()
+        del os.environ['TAGS_TABLE']
+
+    assert [item['PostID'] for item in any_body['items']] == ['post-2', 'post-1', 'post-0']
+    assert [item['PostID'] for item in all_body['items']] == ['post-2']
+    assert all(params['TableName'] == 'TAGS_TABLE' for params in queries)
+
+
+@pytest.mark.parametrize('shards', ['1', '3', '8'])
+@mock_dynamodb
+def test_cursor_walks_every_post_newest_first(aws_credentials, shards):
+    os.environ['DATE_BUCKET_SHARDS'] = shards
+
+    table = create_mock_ddb_table()
+    seed_posts(table, 45, months=3)
+
+    seen = []
+    cursor = None
+    while True:
+        event = {'queryStringParameters': {'limit': '20', 'cursor': cursor} if cursor else {'limit': '20'}}
+        body = json.loads(list_posts.list_posts_handler(event, None)['body'])
+
+        assert len(body['items']) <= 20
+        seen.extend(body['items'])
+
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+
+    assert sorted(item['PostID'] for item in seen) == sorted('post-{:05d}'.format(i) for i in range(45))
+    assert [item['DateCreated'] for item in seen] == sorted((item['DateCreated'] for item in seen), reverse=True)
+
+
+@mock_dynamodb
+def test_cursor_holds_a_position_in_every_shard(aws_credentials):
+    os.environ['DATE_BUCKET_SHARDS'] = '8'
+
+    table = create_mock_ddb_table()
+    with table.batch_writer() as batch:
+        for i in range(200):
+            post_id = str(uuid.UUID(int=i))
+            date_created = '{}-{:02d}T{:02d}:{:02d}:00.000000'.format(months_ago(0), i % 28 + 1, i % 24, i % 60)
+            batch.put_item(Item={'PostID': post_id, 'Author': 'user', 'Title': 'Post {}'.format(i),
+                                 'DateCreated': date_created, 'DateBucket': feed.date_bucket(date_created, post_id)})
+
+    first = json.loads(list_posts.list_posts_handler({'queryStringParameters': {'limit': '20'}}, None)['body'])
+    payload = list_posts.list_posts_handler({'queryStringParameters': {'limit': '20',
+                                                                       'cursor': first['next_cursor']}}, None)
+
+    assert len(pagination.decode_cursor(first['next_cursor'], max_length=len(first['next_cursor']))['k']) == 8
+    assert payload['statusCode'] == 200
+    assert not {item['PostID'] for item in first['items']} & \
+        {item['PostID'] for item in json.loads(payload['body'])['items']}
+
+
+@mock_dynamodb
+def test_month_archive_only_reads_its_bucket(aws_credentials):
+    table = create_mock_ddb_table()
+    seed_posts(table, 30, months=3)
+
+    queries = record_queries()
+    try:
+        event = {'queryStringParameters': {'month': months_ago(1), 'limit': '100'}}
+        body = json.loads(list_posts.list_posts_handler(event, None)['body'])
+    finally:
+        queries.stop()
+
+    assert body['next_cursor'] is None
+    assert len(body['items']) == 10
+    assert all(item['DateCreated'].startswith(months_ago(1)) for item in body['items'])
+    assert [params['KeyConditionExpression'].get_expression()['values'][1] for params in queries] == [months_ago(1)]
+
+
+@pytest.mark.parametrize('params', [
+    {'limit': '0'},
+    {'limit': '1000'},
+    {'limit': 'ten'},
+    {'month': 'March'},
+    {'from': '2023-13'},
+    {'fields': 'Title,Secret'},
+    {'tag': 'python', 'match': 'some'},
+    {'tag': 'a,b,c,d,e,f'},
+    {'cursor': 'not-a-cursor'},
+    {'cursor': 'eyJQb3N0SUQiOiJ4In0'},
+])
+def test_invalid_pagination_parameters(aws_credentials, params):
+    payload = list_posts.list_posts_handler({'queryStringParameters': params}, None)
+
+    assert payload['statusCode'] == 400
+
+
+@pytest.mark.parametrize('state', [
+    {'b': None, 'k': {}},
+    {'b': 202303, 'k': {}},
+    {'b': 'month', 'k': {'0': False}},
+    {'k': {'\u00b2': False}},
+    {'k': {'-1': False}},
+])
+def test_invalid_feed_cursor(aws_credentials, state):
+    state = dict({'b': months_ago(1)}, **state)
+    event = {'queryStringParameters': {'cursor': pagination.encode_cursor(state)}}
+
+    payload = list_posts.list_posts_handler(event, None)
+
+    assert payload['statusCode'] == 400
+
+
+@mock_dynamodb
+def test_consumed_capacity_is_bounded_by_limit(aws_credentials):
+    table = create_mock_ddb_table()
+    seed_posts(table, 10000, months=6)
+
+    queries = record_queries()
+    try:
+        with instrumentation.collect() as documents:
+            cursor = None
+            for _ in range(5):
+                params = {'limit': '25'}
+                if cursor:
+                    params['cursor'] = cursor
+                body = json.loads(list_posts.list_posts_handler({'queryStringParameters': params}, None)['body'])
+                assert len(body['items']) == 25
+                cursor = body['next_cursor']
+    finally:
+        queries.stop()
+
+    # One Query per page, each reading at most `limit` items instead of the whole table
+    assert len(queries) == 5
+    assert all(params['Limit'] == 25 for params in queries)
+    assert all(params['ReturnConsumedCapacity'] == 'TOTAL' for params in queries)
+    assert [document['DynamoDBCalls'] for document in documents] == [1] * 5
+    assert [response['Count'] for response in queries.responses] == [25] * 5
+    # moto bills no units for index queries and counts the whole index as scanned, so the units are estimated
+    # from what was read: DynamoDB bills a Query 0.5 RCU per started 4 KB when eventually consistent, and a page
+    # of index summaries stays within one unit
+    assert all(queries.read_units(response) <= 1 for response in queries.responses)
+
+
+class record_queries(list):
+    """Collects the parameters and responses of every Query issued through the default boto3 session"""
+
+    def __init__(self):
+        super().__init__()
+        self.responses = []
+        self.session = boto3._get_default_session()
+        self.session.events.register('provide-client-params.dynamodb.Query', self.record)
+        self.session.events.register('after-call.dynamodb.Query', self.record_response)
+
+    def record(self, params, **kwargs):
+        self.append(params)
+
+    def record_response(self, parsed, **kwargs):
+        self.responses.append(parsed)
+
+    @staticmethod
+    def read_units(response):
+        # Item sizes approximated by their JSON length
+        size = sum(len(json.dumps(item)) for item in response['Items'])
+        return math.ceil(size / 4096) * 0.5
+
+    def stop(self):
+        self.session.events.unregister('provide-client-params.dynamodb.Query', self.record)
+        self.session.events.unregister('after-call.dynamodb.Query', self.record_response)
+
+
+def months_ago(count):
+    month = feed.current_month()
+    for _ in range(count):
+        month = feed.previous_month(month)
+    return month
+
+
+def seed_posts(table, count, months=1):
+    with table.batch_writer() as batch:
+        for i in range(count):
+            post_id = 'post-{:05d}'.format(i)
+            date_created = '{}-{:02d}T{:02d}:{:02d}:00'.format(months_ago(i % months), i % 28 + 1, i % 24, i % 60)
+            batch.put_item(
+                Item={
+                    'PostID': post_id,
+                    'Slug': 'post-{}'.format(i),
+                    'Title': 'Post {}'.format(i),
+                    'Content': 'Lorem ipsum dolor sit amet ' * 20,
+                    'Author': 'test_user',
+                    'DateCreated': date_created,
+                    'DateBucket': feed.date_bucket(date_created, post_id)
+                }
+            )
 
 
 @mock_dynamodb
@@ -81,6 +367,14 @@ def create_mock_ddb_table():
             {
                 'AttributeName': 'Author',
                 'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'DateBucket',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'DateCreated',
+                'AttributeType': 'S'
             }
         ],
         KeySchema=[
@@ -93,6 +387,29 @@ def create_mock_ddb_table():
                 'KeyType': 'RANGE'
             }
         ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'DateBucketIndex',
+                'KeySchema': [
+                    {
+                        'AttributeName': 'DateBucket',
+                        'KeyType': 'HASH'
+                    },
+                    {
+                        'AttributeName': 'DateCreated',
+                        'KeyType': 'RANGE'
+                    }
+                ],
+                'Projection': {
+                    'ProjectionType': 'INCLUDE',
+                    'NonKeyAttributes': ['Title', 'Slug', 'Description', 'Tags', 'HtmlURL']
+                },
+                'ProvisionedThroughput': {
+                    'ReadCapacityUnits': 123,
+                    'WriteCapacityUnits': 123
+                }
+            }
+        ],
         ProvisionedThroughput={
             'ReadCapacityUnits': 123,
             'WriteCapacityUnits': 123
@@ -100,3 +417,35 @@ def create_mock_ddb_table():
     )
     return mock_ddb.Table('POSTS_TABLE')
 
+
+@mock_dynamodb
+def create_mock_tags_table():
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='TAGS_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'Tag',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'TagSort',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'Tag',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'TagSort',
+                'KeyType': 'RANGE'
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 123,
+            'WriteCapacityUnits': 123
+        }
+    )
+    return mock_ddb.Table('TAGS_TABLE')
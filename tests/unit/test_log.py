@@ -0,0 +1,127 @@
+import io
+import os
+import json
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import instrumentation
+import log
+
+
+class Payload:
+    """Counts how often a logged payload gets serialized"""
+
+    def __init__(self):
+        self.serialized = 0
+
+    def __str__(self):
+        self.serialized += 1
+        return 'x' * 5000
+
+
+class Context:
+    aws_request_id = 'request-1'
+
+
+@pytest.fixture(scope="function")
+def stream():
+    os.environ['LOG_LEVEL'] = 'INFO'
+    os.environ['LOG_DEBUG_SAMPLE_RATE'] = '0'
+    os.environ['LOG_MAX_FIELD_BYTES'] = '100'
+
+    logger = log.get_logger()
+    output = io.StringIO()
+    handler = logging.StreamHandler(output)
+    handler.setFormatter(log.JsonFormatter())
+    logger.addHandler(handler)
+
+    yield output
+
+    logger.removeHandler(handler)
+    for name in ('LOG_LEVEL', 'LOG_DEBUG_SAMPLE_RATE', 'LOG_MAX_FIELD_BYTES'):
+        del os.environ[name]
+    log.start(None)
+
+
+def records(output):
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_structured_and_truncated(stream):
+    log.start(Context())
+    log.get_logger().info('Response', extra=log.data(status=200, body='y' * 500))
+
+    entry, = records(stream)
+
+    assert entry['level'] == 'INFO'
+    assert entry['message'] == 'Response'
+    assert entry['request_id'] == 'request-1'
+    assert entry['status'] == 200
+    assert entry['body'].startswith('y' * 100 + '...[')
+    assert len(entry['body']) < 150
+
+
+def test_debug_detail_is_lazy(stream):
+    payload = Payload()
+
+    log.start(Context())
+    log.get_logger().debug('Event', extra=log.data(event=payload))
+
+    assert payload.serialized == 0
+    assert records(stream) == []
+
+
+def test_sampled_invocation_logs_debug(stream):
+    os.environ['LOG_DEBUG_SAMPLE_RATE'] = '1'
+    payload = Payload()
+
+    log.start(Context())
+    log.get_logger().debug('Event', extra=log.data(event=payload))
+
+    entry, = records(stream)
+
+    assert payload.serialized >= 1
+    assert entry['sampled'] is True
+    assert logging.getLogger('botocore').getEffectiveLevel() == logging.WARNING
+
+    os.environ['LOG_DEBUG_SAMPLE_RATE'] = '0'
+    log.start(Context())
+
+    assert not log.get_logger().isEnabledFor(logging.DEBUG)
+
+
+def test_invocations_keep_their_own_context(stream):
+    class Other:
+        aws_request_id = 'request-2'
+
+    log.start(Context())
+
+    # A sampled invocation on another thread leaves this one's request id and level alone
+    os.environ['LOG_DEBUG_SAMPLE_RATE'] = '1'
+    other = threading.Thread(target=lambda: (log.start(Other()), log.get_logger().debug('Other')))
+    other.start()
+    other.join()
+
+    log.get_logger().debug('Dropped')
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(instrumentation.propagate(lambda: log.get_logger().info('Worker'))).result()
+
+    assert [(entry['message'], entry['request_id']) for entry in records(stream)] == [
+        ('Other', 'request-2'), ('Worker', 'request-1')]
+
+
+def test_exception_is_recorded(stream):
+    log.start(Context())
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        log.get_logger().exception('Unhandled error')
+
+    entry, = records(stream)
+
+    assert entry['level'] == 'ERROR'
+    assert 'ValueError: boom' in entry['exception']
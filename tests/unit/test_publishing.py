@@ -0,0 +1,192 @@
+import os
+import json
+
+import boto3
+import pytest
+
+from moto import mock_dynamodb, mock_s3, mock_sns, mock_sqs, mock_stepfunctions
+
+import clients
+import html_objects
+import publishing
+from blog_api import markdown_to_html
+from blog_api import validate_post
+
+BUCKET_NAME = 'POSTS_BUCKET'
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    os.environ['POSTS_TABLE'] = 'POSTS_TABLE'
+    os.environ['POSTS_BUCKET'] = BUCKET_NAME
+    clients.reset()
+
+    yield
+
+    for name in ('POSTS_BUCKET', 'PUBLISH_MODE', 'STATE_MACHINE', 'TOPIC_ARN', 'HTML_ENCODING'):
+        os.environ.pop(name, None)
+
+
+def create_event(content='# Title\n\n<script>alert(1)</script>Body'):
+    return {
+        'body': json.dumps({'title': 'Inline Post', 'content': content, 'tags': ['python']}),
+        'requestContext': {'authorizer': {'principalId': 'test_user'}}
+    }
+
+
+@mock_dynamodb
+@mock_s3
+@mock_sns
+@mock_sqs
+def test_inline_publish(aws_credentials):
+    os.environ['PUBLISH_MODE'] = 'inline'
+    create_mock_ddb_table()
+    boto3.client('s3').create_bucket(Bucket=BUCKET_NAME)
+    queue_url = subscribe_queue()
+
+    payload = validate_post.validate_post_handler(create_event(), None)
+    body = json.loads(payload['body'])
+
+    assert payload['statusCode'] == 201
+    assert body['slug'] == 'inline-post'
+
+    item = boto3.resource('dynamodb').Table('POSTS_TABLE').get_item(
+        Key={'PostID': body['post_id'], 'Author': 'test_user'})['Item']
+    stored = boto3.client('s3').get_object(Bucket=BUCKET_NAME, Key=publishing.stored_html_key(item))
+    html = html_objects.decode(stored['Body'].read(), stored['ContentEncoding'])
+    messages = boto3.client('sqs').receive_message(QueueUrl=queue_url)['Messages']
+
+    assert '<h1>Title</h1>' in html
+    assert '<script>' not in html
+    assert item['HtmlURL'] == body['url']
+    assert json.loads(messages[0]['Body'])['Message'] == publishing.PUBLISHED_MESSAGE
+
+
+@mock_stepfunctions
+def test_step_functions_publish(aws_credentials):
+    os.environ['STATE_MACHINE'] = boto3.client('stepfunctions').create_state_machine(
+        name='PostStateMachine',
+        definition=json.dumps({'StartAt': 'Done', 'States': {'Done': {'Type': 'Pass', 'End': True}}}),
+        roleArn='arn:aws:iam::123456789012:role/test'
+    )['stateMachineArn']
+
+    payload = validate_post.validate_post_handler(create_event(), None)
+
+    assert payload['statusCode'] == 200
+    assert json.loads(payload['body'])['message'] == 'Post is valid'
+
+
+def test_unknown_mode(aws_credentials):
+    os.environ['PUBLISH_MODE'] = 'sideways'
+
+    payload = validate_post.validate_post_handler(create_event(), None)
+
+    assert payload['statusCode'] == 500
+
+
+@mock_dynamodb
+@mock_s3
+def test_failed_upload_removes_item(aws_credentials):
+    create_mock_ddb_table()
+    post = {'post_id': 'p1', 'title': 'Title', 'slug': 'title', 'description': '', 'author': 'test_user',
+            'content': 'Body', 'sanitized_html': '<p>Body</p>', 'date_created': '2023-01-01T00:00:00',
+            'date_updated': '2023-01-01T00:00:00', 'tags': []}
+
+    with pytest.raises(Exception):
+        markdown_to_html.markdown_to_html_handler(post, None)
+
+    table = boto3.resource('dynamodb').Table('POSTS_TABLE')
+    assert 'Item' not in table.get_item(Key={'PostID': 'p1', 'Author': 'test_user'})
+
+
+@mock_dynamodb
+@mock_s3
+def test_failed_indexing_keeps_the_post(aws_credentials, monkeypatch):
+    create_mock_ddb_table()
+    boto3.client('s3').create_bucket(Bucket=BUCKET_NAME)
+    # No such table, indexing fails once the post is stored
+    monkeypatch.setenv('SEARCH_TABLE', 'SEARCH_TABLE')
+    post = {'post_id': 'p1', 'title': 'Title', 'slug': 'title', 'description': '', 'author': 'test_user',
+            'content': 'Body', 'sanitized_html': '<p>Body</p>', 'date_created': '2023-01-01T00:00:00',
+            'date_updated': '2023-01-01T00:00:00', 'tags': []}
+
+    item = publishing.store(post)
+
+    table = boto3.resource('dynamodb').Table('POSTS_TABLE')
+    assert table.get_item(Key={'PostID': 'p1', 'Author': 'test_user'})['Item']['HtmlURL'] == item['HtmlURL']
+
+
+@mock_dynamodb
+@mock_s3
+def test_html_objects(aws_credentials):
+    create_mock_ddb_table()
+    boto3.client('s3').create_bucket(Bucket=BUCKET_NAME)
+    post = {'post_id': 'p1', 'title': 'Title', 'slug': 'title', 'description': '', 'author': 'test_user',
+            'content': 'Body', 'sanitized_html': '<p>Body</p>', 'date_created': '2023-01-01T00:00:00',
+            'date_updated': '2023-01-01T00:00:00', 'tags': []}
+
+    first = publishing.store(post)
+    again = publishing.store(post)
+    os.environ['HTML_ENCODING'] = 'identity'
+    plain = publishing.store(dict(post, sanitized_html='<p>Edited</p>'))
+
+    # Equal HTML lands on the same immutable object, other HTML on a new one
+    assert first['HtmlURL'] == again['HtmlURL'] != plain['HtmlURL']
+
+    stored = boto3.client('s3').get_object(Bucket=BUCKET_NAME, Key=publishing.stored_html_key(first))
+    assert stored['ContentEncoding'] == 'gzip'
+    assert stored['CacheControl'] == 'public, max-age=31536000, immutable'
+
+    stored = boto3.client('s3').get_object(Bucket=BUCKET_NAME, Key=publishing.stored_html_key(plain))
+    assert 'ContentEncoding' not in stored
+    assert stored['Body'].read() == b'<p>Edited</p>'
+
+
+def subscribe_queue():
+    topic_arn = boto3.client('sns').create_topic(Name='PostCreationTopic')['TopicArn']
+    queue_url = boto3.client('sqs').create_queue(QueueName='posts')['QueueUrl']
+    queue_arn = boto3.client('sqs').get_queue_attributes(
+        QueueUrl=queue_url, AttributeNames=['QueueArn'])['Attributes']['QueueArn']
+    boto3.client('sns').subscribe(TopicArn=topic_arn, Protocol='sqs', Endpoint=queue_arn)
+    os.environ['TOPIC_ARN'] = topic_arn
+
+    return queue_url
+
+
+@mock_dynamodb
+def create_mock_ddb_table():
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='POSTS_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'PostID',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Author',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'PostID',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'Author',
+                'KeyType': 'RANGE'
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
@@ -0,0 +1,105 @@
+import os
+
+import boto3
+import pytest
+
+from moto import mock_s3
+
+import clients
+import instrumentation
+import rendering
+from blog_api import sanitize_markdown
+
+BUCKET_NAME = 'WORKFLOW_BUCKET'
+
+
+class Context:
+    function_name = 'SanitizeMarkdownFunction'
+    aws_request_id = 'request-1'
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    os.environ['METRICS_ENABLED'] = 'false'
+    clients.reset()
+    rendering.render_cache.clear()
+
+    yield
+
+    for name in ('METRICS_ENABLED', 'RENDER_CACHE_BUCKET', 'RENDER_CACHE_MAX_BYTES'):
+        os.environ.pop(name, None)
+    rendering.render_cache.clear()
+
+
+def test_renderer_is_reused(aws_credentials):
+    first = rendering.render('# Title\n\n[link][1]\n\n[1]: https://example.com')
+    second = rendering.to_html('[link][1]')
+
+    assert first == '<h1>Title</h1>\n<p><a href="https://example.com" rel="nofollow">link</a></p>'
+    # Reference definitions of the previous document don't leak into the next one
+    assert second == '<p>[link][1]</p>'
+    assert rendering.markdown_renderer() is rendering.markdown_renderer()
+    assert rendering.cleaner() is rendering.cleaner()
+
+
+def test_repeated_content_hits_cache(aws_credentials):
+    event = {'post_id': 'p1', 'content': '# Title\n\n<script>alert(1)</script>Body'}
+
+    with instrumentation.collect() as documents:
+        first = sanitize_markdown.sanitize_markdown_handler(dict(event), Context())
+        second = sanitize_markdown.sanitize_markdown_handler(dict(event), Context())
+
+    assert first['sanitized_html'] == second['sanitized_html']
+    assert '<script>' not in second['sanitized_html']
+    assert documents[0]['RenderCacheMisses'] == 1 and 'RenderCacheHits' not in documents[0]
+    assert documents[1]['RenderCacheHits'] == 1 and 'RenderCacheMisses' not in documents[1]
+    assert documents[1]['RenderTimeSaved'] > 0
+
+    units = {metric['Name']: metric['Unit'] for metric in documents[1]['_aws']['CloudWatchMetrics'][0]['Metrics']}
+    assert units['RenderTimeSaved'] == 'Milliseconds'
+    assert units['RenderCacheHits'] == 'Count'
+
+
+def test_large_renders_skip_memory(aws_credentials):
+    os.environ['RENDER_CACHE_MAX_BYTES'] = '10'
+
+    rendering.render('A paragraph longer than ten bytes')
+
+    assert rendering.render_cache.stats()['size'] == 0
+
+
+@mock_s3
+def test_persistent_tier(aws_credentials):
+    os.environ['RENDER_CACHE_BUCKET'] = BUCKET_NAME
+    boto3.client('s3').create_bucket(Bucket=BUCKET_NAME)
+    content = 'Rendered on another container'
+
+    html = rendering.render(content)
+    rendering.render_cache.clear()
+
+    key = rendering.RENDER_CACHE_PREFIX + rendering.render_key(content) + '.html'
+    assert boto3.client('s3').get_object(Bucket=BUCKET_NAME, Key=key)['Body'].read().decode('utf-8') == html
+
+    with instrumentation.collect() as documents:
+        @instrumentation.instrumented
+        def handler(event, context):
+            return rendering.render(content)
+
+        assert handler({}, Context()) == html
+
+    assert documents[0]['RenderCacheHits'] == 1
+    assert rendering.render_cache.get(rendering.render_key(content))[0] == html
+
+
+@mock_s3
+def test_unavailable_persistent_tier(aws_credentials):
+    os.environ['RENDER_CACHE_BUCKET'] = 'missing-bucket'
+
+    assert rendering.render('Body') == '<p>Body</p>'
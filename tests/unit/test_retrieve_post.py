@@ -1,17 +1,20 @@
 import os
 import json
 
+from decimal import Decimal
+
 import boto3
 import pytest
 
 from moto import mock_dynamodb
 
+import clients
+import slugs
 from blog_api import retrieve_post
 
 # TODO: Add tests for the following:
 # - Missing slug
 # - Missing post
-# - Multiple posts with the same slug
 
 
 @pytest.fixture(scope="function")
@@ -24,6 +27,9 @@ def aws_credentials():
     os.environ["AWS_SESSION_TOKEN"] = "testing"
     os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
     os.environ['POSTS_TABLE'] = 'POSTS_TABLE'
+    clients.reset()
+    slugs.slug_cache.clear()
+    retrieve_post.read_cache.clear()
 
 
 def test_initialization(aws_credentials):
@@ -63,6 +69,139 @@ def test_valid_request(aws_credentials):
     assert content['Title'] == 'Unit Testing'
 
 
+@mock_dynamodb
+def test_slug_path(aws_credentials):
+    event = {'pathParameters': {'slug': 'unit-testing'}}
+    context = None
+
+    create_mock_ddb_table()
+
+    payload = retrieve_post.retrieve_post_handler(event, context)
+    content = json.loads(payload['body'])
+
+    assert payload['statusCode'] == 200
+    assert [post['PostID'] for post in content] == ['a7a3ac1eb24d4aa68ac64e49bb09f1d2']
+    assert slugs.slug_cache.stats()['size'] == 1
+
+
+@mock_dynamodb
+def test_duplicate_slug_resolves_newest(aws_credentials):
+    event = {'pathParameters': {'slug': 'unit-testing'}}
+    context = None
+
+    create_mock_ddb_table()
+    table = boto3.resource('dynamodb').Table('POSTS_TABLE')
+    table.put_item(Item={'PostID': 'old', 'Author': 'test_user', 'Slug': 'unit-testing',
+                         'Title': 'Old', 'DateCreated': '2020-01-01T00:00:00.000Z'})
+    table.put_item(Item={'PostID': 'new', 'Author': 'test_user', 'Slug': 'unit-testing',
+                         'Title': 'New', 'DateCreated': '2099-01-01T00:00:00.000Z'})
+
+    payload = retrieve_post.retrieve_post_handler(event, context)
+
+    assert json.loads(payload['body'])[0]['Title'] == 'New'
+
+
+@mock_dynamodb
+def test_numeric_and_set_attributes(aws_credentials):
+    event = {'pathParameters': {'slug': 'counted'}}
+    context = None
+
+    create_mock_ddb_table()
+    boto3.resource('dynamodb').Table('POSTS_TABLE').put_item(
+        Item={'PostID': 'counted', 'Author': 'test_user', 'Slug': 'counted', 'DateCreated': '2020-01-01',
+              'Views': Decimal('1024'), 'ReadingTime': Decimal('4.5'), 'Keywords': {'b', 'a'}})
+
+    payload = retrieve_post.retrieve_post_handler(event, context)
+    item, = json.loads(payload['body'])
+
+    assert payload['statusCode'] == 200
+    assert item['Views'] == 1024
+    assert item['ReadingTime'] == 4.5
+    assert item['Keywords'] == ['a', 'b']
+
+
+@mock_dynamodb
+def test_sparse_fieldset(aws_credentials):
+    event = {
+        'pathParameters': {'slug': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2'},
+        'queryStringParameters': {'fields': 'Title,Slug'}
+    }
+    context = None
+
+    create_mock_ddb_table()
+
+    payload = retrieve_post.retrieve_post_handler(event, context)
+
+    assert payload['statusCode'] == 200
+    assert json.loads(payload['body']) == [{'Title': 'Unit Testing', 'Slug': 'unit-testing'}]
+
+
+@mock_dynamodb
+def test_warm_container_cache(aws_credentials):
+    event = {'pathParameters': {'slug': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2'}}
+    context = None
+
+    create_mock_ddb_table()
+
+    first = retrieve_post.retrieve_post_handler(event, context)
+    second = retrieve_post.retrieve_post_handler(event, context)
+
+    assert first['body'] == second['body']
+    assert retrieve_post.read_cache.stats()['hits'] == 1
+
+
+@mock_dynamodb
+def test_conditional_get(aws_credentials):
+    event = {'pathParameters': {'slug': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2'}, 'headers': {}}
+    context = None
+
+    create_mock_ddb_table()
+
+    payload = retrieve_post.retrieve_post_handler(event, context)
+    etag = payload['headers']['ETag']
+
+    assert payload['statusCode'] == 200
+    assert 'max-age=' in payload['headers']['Cache-Control']
+
+    event['headers'] = {'if-none-match': 'W/"other", ' + etag}
+    payload = retrieve_post.retrieve_post_handler(event, context)
+
+    assert payload['statusCode'] == 304
+    assert 'body' not in payload
+    assert payload['headers']['ETag'] == etag
+    assert payload['headers']['Vary'] == 'Accept-Encoding'
+    assert 'max-age=' in payload['headers']['Cache-Control']
+
+    event['headers'] = {'If-None-Match': '"stale"'}
+    payload = retrieve_post.retrieve_post_handler(event, context)
+
+    assert payload['statusCode'] == 200
+
+
+def test_unknown_field(aws_credentials):
+    event = {
+        'pathParameters': {'slug': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2'},
+        'queryStringParameters': {'fields': 'Title,Password'}
+    }
+    context = None
+
+    payload = retrieve_post.retrieve_post_handler(event, context)
+
+    assert payload['statusCode'] == 400
+
+
+@mock_dynamodb
+def test_table_version_marker_is_not_a_post(aws_credentials):
+    create_mock_ddb_table()
+    boto3.resource('dynamodb').Table('POSTS_TABLE').put_item(
+        Item={'PostID': '__table_version__', 'Author': '__table_version__', 'Version': 1})
+
+    payload = retrieve_post.retrieve_post_handler({'pathParameters': {'slug': '__table_version__'}}, None)
+
+    assert payload['statusCode'] == 200
+    assert json.loads(payload['body']) == []
+
+
 @mock_dynamodb
 def create_mock_ddb_table():
     mock_ddb = boto3.resource('dynamodb')
@@ -76,6 +215,10 @@ def create_mock_ddb_table():
             {
                 'AttributeName': 'Author',
                 'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Slug',
+                'AttributeType': 'S'
             }
         ],
         KeySchema=[
@@ -88,6 +231,25 @@ def create_mock_ddb_table():
                 'KeyType': 'RANGE'
             }
         ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'SlugLookupIndex',
+                'KeySchema': [
+                    {
+                        'AttributeName': 'Slug',
+                        'KeyType': 'HASH'
+                    }
+                ],
+                'Projection': {
+                    'ProjectionType': 'INCLUDE',
+                    'NonKeyAttributes': ['DateCreated']
+                },
+                'ProvisionedThroughput': {
+                    'ReadCapacityUnits': 5,
+                    'WriteCapacityUnits': 5
+                }
+            }
+        ],
         ProvisionedThroughput={
             'ReadCapacityUnits': 5,
             'WriteCapacityUnits': 5
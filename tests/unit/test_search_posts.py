@@ -0,0 +1,209 @@
+import os
+import json
+
+import boto3
+import pytest
+
+from moto import mock_dynamodb, mock_s3
+
+from blog_api import index_post
+from blog_api import search_posts
+
+import clients
+import pagination
+import publishing
+import search_index
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    os.environ['POSTS_TABLE'] = 'POSTS_TABLE'
+    clients.reset()
+    os.environ['SEARCH_TABLE'] = 'SEARCH_TABLE'
+    search_posts.search_cache.clear()
+    yield
+    del os.environ['SEARCH_TABLE']
+
+
+POSTS = [
+    {'PostID': 'p1', 'Title': 'Serverless Python', 'Description': 'Lambda handlers in Python',
+     'Content': 'Python functions on AWS Lambda behind API Gateway.'},
+    {'PostID': 'p2', 'Title': 'Cooking pasta', 'Description': 'Dinner',
+     'Content': 'Boil water, add salt. Not about python at all, except this one mention.'},
+    {'PostID': 'p3', 'Title': 'DynamoDB modelling', 'Description': 'Keys and indexes',
+     'Content': 'Single table design for serverless applications.'},
+]
+
+
+def test_missing_query(aws_credentials):
+    payload = search_posts.search_posts_handler({'queryStringParameters': {'q': 'the and'}}, None)
+
+    assert payload['statusCode'] == 400
+
+
+@pytest.mark.parametrize('state', [{'o': True}, {'o': -1}, {'o': 1.5}, {'o': 0, 'x': 1}])
+def test_invalid_cursor(aws_credentials, state):
+    event = {'queryStringParameters': {'q': 'python', 'cursor': pagination.encode_cursor(state)}}
+
+    payload = search_posts.search_posts_handler(event, None)
+
+    assert payload['statusCode'] == 400
+
+
+@mock_dynamodb
+def test_ranked_results(aws_credentials):
+    create_and_index()
+
+    payload = search_posts.search_posts_handler({'queryStringParameters': {'q': 'python serverless'}}, None)
+    body = json.loads(payload['body'])
+
+    assert payload['statusCode'] == 200
+    assert [item['PostID'] for item in body['items']] == ['p1', 'p3', 'p2']
+    assert body['items'][0]['Title'] == 'Serverless Python'
+    assert 'Content' not in body['items'][0]
+    assert body['next_cursor'] is None
+
+
+@mock_dynamodb
+def test_pagination(aws_credentials):
+    create_and_index()
+
+    event = {'queryStringParameters': {'q': 'python serverless', 'limit': '2'}}
+    first = json.loads(search_posts.search_posts_handler(event, None)['body'])
+    event['queryStringParameters']['cursor'] = first['next_cursor']
+    second = json.loads(search_posts.search_posts_handler(event, None)['body'])
+
+    assert [item['PostID'] for item in first['items'] + second['items']] == ['p1', 'p3', 'p2']
+    assert second['next_cursor'] is None
+
+
+@mock_dynamodb
+def test_incremental_edit_and_delete(aws_credentials):
+    _, search_table = create_and_index()
+
+    edited = dict(POSTS[1], Author='test_user', Content='Boil water, add salt.')
+    search_index.index_post(search_table, edited)
+    search_index.remove_post(search_table, 'p3')
+
+    assert search_table.get_item(Key={'Term': 'python', 'PostID': 'p2'}).get('Item') is None
+    assert search_table.get_item(Key={'Term': 'serverless', 'PostID': 'p3'}).get('Item') is None
+
+    stats = search_index.load_stats(search_table)
+    assert stats['docs'] == 2
+
+    # Every posting of the edited post carries its new length
+    length = int(search_table.get_item(Key={'Term': '#doc', 'PostID': 'p2'})['Item']['Length'])
+    assert {posting[3] for posting in search_index.load_postings(search_table, 'salt')} == {length}
+    assert [posting[3] for posting in search_index.load_postings(search_table, 'boil')] == [length]
+
+    payload = search_posts.search_posts_handler({'queryStringParameters': {'q': 'python serverless'}}, None)
+
+    assert [item['PostID'] for item in json.loads(payload['body'])['items']] == ['p1']
+
+
+@mock_dynamodb
+def test_postings_are_capped_to_the_most_frequent_terms(aws_credentials, monkeypatch):
+    _, search_table = create_and_index()
+    monkeypatch.setenv('SEARCH_MAX_TERMS', '1')
+
+    search_index.index_post(search_table, dict(POSTS[0], Author='test_user'))
+
+    doc = search_table.get_item(Key={'Term': '#doc', 'PostID': 'p1'})['Item']
+
+    # Re-indexing drops the postings of the terms past the cap, the length still counts them
+    assert set(doc['Terms']) == {'python'}
+    assert int(doc['Length']) == sum(search_index.term_frequencies(POSTS[0]).values())
+    assert search_table.get_item(Key={'Term': 'serverless', 'PostID': 'p1'}).get('Item') is None
+
+
+@mock_s3
+@mock_dynamodb
+def test_async_indexing_of_a_large_post(aws_credentials, monkeypatch):
+    _, search_table = create_and_index()
+    boto3.client('s3').create_bucket(Bucket='POSTS_BUCKET')
+    monkeypatch.setenv('POSTS_BUCKET', 'POSTS_BUCKET')
+    monkeypatch.setenv('SEARCH_INDEX_MODE', 'async')
+    monkeypatch.setenv('SEARCH_INDEX_FUNCTION', 'IndexPostFunction')
+    # moto can't apply the handler's ProjectionExpression to binary attributes, the content stays a string
+    monkeypatch.setenv('CONTENT_COMPRESSION', 'none')
+    invocations = []
+    monkeypatch.setattr(clients.get_client('lambda'), 'invoke', lambda **kwargs: invocations.append(kwargs))
+
+    # 151 distinct terms, the title term and the 99 terms written twice are the most frequent
+    words = ['term{:03d}'.format(i) for i in range(150)]
+    content = ' '.join(word for i, word in enumerate(words) for _ in range(2 if i < 99 else 1))
+    publishing.store({
+        'post_id': 'p4', 'title': 'Long', 'slug': 'long', 'description': '', 'author': 'test_user',
+        'content': content, 'sanitized_html': '<p>Long</p>', 'date_created': '2023-01-01T00:00:00',
+        'date_updated': '2023-01-01T00:00:00', 'tags': []
+    })
+
+    # Storing the post wrote no postings, the search index function does
+    assert search_table.get_item(Key={'Term': '#doc', 'PostID': 'p4'}).get('Item') is None
+    invocation, = invocations
+    assert invocation['InvocationType'] == 'Event'
+
+    assert index_post.index_post_handler(json.loads(invocation['Payload']), None) == {'indexed': True}
+
+    doc = search_table.get_item(Key={'Term': '#doc', 'PostID': 'p4'})['Item']
+    assert set(doc['Terms']) == {'long'} | set(words[:99])
+    assert int(doc['Length']) == 99 * 2 + 51 + search_index.TITLE_WEIGHT
+
+    payload = search_posts.search_posts_handler({'queryStringParameters': {'q': 'term042'}}, None)
+    assert [item['PostID'] for item in json.loads(payload['body'])['items']] == ['p4']
+
+
+@mock_dynamodb
+def test_index_post_of_a_deleted_post(aws_credentials):
+    create_and_index()
+
+    assert index_post.index_post_handler({'PostID': 'gone', 'Author': 'test_user'}, None) == {'indexed': False}
+
+
+def create_and_index():
+    mock_ddb = boto3.resource('dynamodb')
+    tables = []
+    for table_name, keys in [('POSTS_TABLE', ('PostID', 'Author')), ('SEARCH_TABLE', ('Term', 'PostID'))]:
+        mock_ddb.create_table(
+            TableName=table_name,
+            AttributeDefinitions=[
+                {
+                    'AttributeName': keys[0],
+                    'AttributeType': 'S'
+                },
+                {
+                    'AttributeName': keys[1],
+                    'AttributeType': 'S'
+                }
+            ],
+            KeySchema=[
+                {
+                    'AttributeName': keys[0],
+                    'KeyType': 'HASH'
+                },
+                {
+                    'AttributeName': keys[1],
+                    'KeyType': 'RANGE'
+                }
+            ],
+            ProvisionedThroughput={
+                'ReadCapacityUnits': 5,
+                'WriteCapacityUnits': 5
+            }
+        )
+        tables.append(mock_ddb.Table(table_name))
+
+    posts_table, search_table = tables
+    for post in POSTS:
+        post = dict(post, Author='test_user')
+        posts_table.put_item(Item=post)
+        search_index.index_post(search_table, post)
+
+    return posts_table, search_table
@@ -0,0 +1,80 @@
+import os
+import json
+
+from decimal import Decimal
+
+import pytest
+
+from boto3.dynamodb.types import Binary
+
+import serialization
+
+ITEM = {
+    'PostID': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2',
+    'Title': 'Café',
+    'Views': Decimal('1024'),
+    'Exponent': Decimal('1E+2'),
+    'ReadingTime': Decimal('4.5'),
+    'Tags': {'serverless', 'python'},
+    'Scores': {Decimal('2'), Decimal('1')},
+    'Thumbnail': Binary(b'\x00\x01'),
+    'Raw': b'abc',
+    'Draft': False,
+    'Editor': None
+}
+
+EXPECTED = {
+    'PostID': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2',
+    'Title': 'Café',
+    'Views': 1024,
+    'Exponent': 100,
+    'ReadingTime': 4.5,
+    'Tags': ['python', 'serverless'],
+    'Scores': [1, 2],
+    'Thumbnail': 'AAE=',
+    'Raw': 'YWJj',
+    'Draft': False,
+    'Editor': None
+}
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def backend(request):
+    if request.param == 'orjson' and serialization.orjson is None:
+        pytest.skip('orjson is not installed')
+
+    os.environ['SERIALIZER'] = request.param
+    yield request.param
+    del os.environ['SERIALIZER']
+
+
+def test_dynamodb_types(backend):
+    body = serialization.dumps({'items': [ITEM]})
+
+    assert serialization.backend() == backend
+    assert json.loads(body) == {'items': [EXPECTED]}
+    assert json.loads(body)['items'][0]['Views'] == 1024
+
+
+def test_backends_agree():
+    if serialization.orjson is None:
+        pytest.skip('orjson is not installed')
+
+    page = [dict(ITEM, Title='Cafe')] * 3
+
+    os.environ['SERIALIZER'] = 'json'
+    try:
+        stdlib = serialization.dumps(page)
+    finally:
+        del os.environ['SERIALIZER']
+
+    assert serialization.dumps(page) == stdlib
+
+
+def test_large_integer_falls_back(backend):
+    assert json.loads(serialization.dumps({'Big': Decimal(2 ** 70)})) == {'Big': 2 ** 70}
+
+
+def test_unsupported_type(backend):
+    with pytest.raises(TypeError):
+        serialization.dumps({'Value': object()})
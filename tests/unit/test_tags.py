@@ -0,0 +1,119 @@
+import os
+
+import boto3
+import pytest
+
+from moto import mock_dynamodb
+
+import tags
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+
+def make_post(i, post_tags):
+    return {
+        'PostID': 'post-{:03d}'.format(i),
+        'Author': 'test_user',
+        'Title': 'Post {}'.format(i),
+        'Slug': 'post-{}'.format(i),
+        'Content': 'Not copied to the tag index',
+        'DateCreated': '2023-03-{:02d}T00:00:00'.format(i + 1),
+        'Tags': post_tags
+    }
+
+
+@mock_dynamodb
+def test_single_tag_pages_newest_first(aws_credentials):
+    table = create_mock_tags_table()
+    for i in range(25):
+        tags.sync_post_tags(table, None, make_post(i, ['Python']))
+
+    first, state = tags.query_tags(table, ('python',), 'any', 10, newest='2023-03', oldest='2023-01')
+    second, state = tags.query_tags(table, ('python',), 'any', 10, after=state['after'], newest='2023-03',
+                                    oldest='2023-01')
+    third, state = tags.query_tags(table, ('python',), 'any', 10, after=state['after'], newest='2023-03',
+                                   oldest='2023-01')
+
+    post_ids = [item['PostID'] for item in first + second + third]
+
+    assert state is None
+    assert post_ids == ['post-{:03d}'.format(i) for i in reversed(range(25))]
+    assert 'Content' not in first[0]
+
+
+@mock_dynamodb
+def test_any_and_all_merge(aws_credentials):
+    table = create_mock_tags_table()
+    for i in range(12):
+        post_tags = []
+        if i % 2 == 0:
+            post_tags.append('aws')
+        if i % 3 == 0:
+            post_tags.append('python')
+        tags.sync_post_tags(table, None, make_post(i, post_tags))
+
+    any_items, _ = tags.query_tags(table, ('aws', 'python'), 'any', 20, newest='2023-03', oldest='2023-01')
+    all_items, _ = tags.query_tags(table, ('aws', 'python'), 'all', 20, newest='2023-03', oldest='2023-01')
+
+    assert [item['PostID'] for item in any_items] == ['post-{:03d}'.format(i) for i in (10, 9, 8, 6, 4, 3, 2, 0)]
+    assert [item['PostID'] for item in all_items] == ['post-006', 'post-000']
+
+
+@mock_dynamodb
+def test_sync_removes_dropped_tags(aws_credentials):
+    table = create_mock_tags_table()
+    post = make_post(1, ['aws', 'python'])
+    tags.sync_post_tags(table, None, post)
+
+    updated = dict(post, Tags=['python'], Title='Renamed')
+    tags.sync_post_tags(table, post, updated)
+
+    assert tags.query_tags(table, ('aws',), 'any', 10, newest='2023-03', oldest='2023-01')[0] == []
+    assert tags.query_tags(table, ('python',), 'any', 10, newest='2023-03', oldest='2023-01')[0][0]['Title'] == \
+        'Renamed'
+
+    tags.sync_post_tags(table, updated, None)
+
+    assert table.scan()['Items'] == []
+
+
+@mock_dynamodb
+def create_mock_tags_table():
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='TAGS_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'Tag',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'TagSort',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'Tag',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'TagSort',
+                'KeyType': 'RANGE'
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+    return mock_ddb.Table('TAGS_TABLE')
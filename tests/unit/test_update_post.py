@@ -4,10 +4,19 @@ import json
 import boto3
 import pytest
 
-from moto import mock_dynamodb
-
+from moto import mock_dynamodb, mock_s3
+
+import clients
+import html_objects
+import publishing
+import rendering
+import slugs
+import tags
+from blog_api import rerender_post
 from blog_api import update_post
 
+BUCKET_NAME = 'POSTS_BUCKET'
+
 
 @pytest.fixture(scope="function")
 def aws_credentials():
@@ -19,6 +28,13 @@ def aws_credentials():
     os.environ["AWS_SESSION_TOKEN"] = "testing"
     os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
     os.environ['POSTS_TABLE'] = 'POSTS_TABLE'
+    clients.reset()
+    slugs.slug_cache.clear()
+
+    yield
+
+    for name in ('POSTS_BUCKET', 'RERENDER_MODE', 'RERENDER_FUNCTION', 'TAGS_TABLE'):
+        os.environ.pop(name, None)
 
 
 def test_initialization(aws_credentials):
@@ -60,7 +76,7 @@ def test_no_attributes(aws_credentials):
 def test_same_attributes(aws_credentials):
     event = {
         'pathParameters': {'slug': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2'},
-        'requestContext': {"authorizer": {"principalId": "test_user"}},
+        'requestContext': {"authorizer": {"principalId": "user"}},
         'body': '{ "title": "Unit Testing", "content": "Unit Testing Content" }'
     }
     context = None
@@ -76,7 +92,7 @@ def test_same_attributes(aws_credentials):
 def test_valid_request(aws_credentials):
     event = {
         'pathParameters': {'slug': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2'},
-        'requestContext': {"authorizer": {"principalId": "test_user"}},
+        'requestContext': {"authorizer": {"principalId": "user"}},
         'body': '{ "title": "New Title" }'
     }
     context = None
@@ -90,6 +106,186 @@ def test_valid_request(aws_credentials):
     assert json.loads(payload['body'])['Slug'] == 'new-title'
 
 
+@mock_dynamodb
+def test_title_and_tags(aws_credentials):
+    event = {
+        'pathParameters': {'slug': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2'},
+        'requestContext': {"authorizer": {"principalId": "user"}},
+        'body': '{ "title": "New Title", "tags": ["new"] }'
+    }
+    context = None
+
+    create_mock_ddb_table()
+
+    payload = update_post.update_post_handler(event, context)
+    body = json.loads(payload['body'])
+
+    assert payload['statusCode'] == 200
+    assert body['Title'] == 'New Title'
+    assert body['Tags'] == ['new']
+
+
+@mock_dynamodb
+def test_reslug_invalidates_slug_cache(aws_credentials):
+    event = {
+        'pathParameters': {'slug': 'unit-testing'},
+        'requestContext': {"authorizer": {"principalId": "user"}},
+        'body': '{ "title": "New Title" }'
+    }
+    context = None
+
+    create_mock_ddb_table()
+
+    payload = update_post.update_post_handler(event, context)
+    table = boto3.resource('dynamodb').Table('POSTS_TABLE')
+
+    assert payload['statusCode'] == 200
+    assert json.loads(payload['body'])['PostID'] == 'a7a3ac1eb24d4aa68ac64e49bb09f1d2'
+    assert slugs.resolve(table, 'unit-testing') is None
+    assert slugs.resolve(table, 'new-title') == ('a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'user')
+
+
+@mock_dynamodb
+def test_slug_of_another_author(aws_credentials):
+    event = {
+        'pathParameters': {'slug': 'unit-testing'},
+        'requestContext': {"authorizer": {"principalId": "user"}},
+        'body': '{ "description": "Edited" }'
+    }
+    context = None
+
+    create_mock_ddb_table()
+    table = boto3.resource('dynamodb').Table('POSTS_TABLE')
+    table.put_item(Item={'PostID': 'b1', 'Author': 'other_user', 'Slug': 'unit-testing',
+                         'DateCreated': '2021-01-01T00:00:00.000Z', 'Title': 'Unit Testing'})
+
+    payload = update_post.update_post_handler(event, context)
+
+    # The newer post of the other author is left alone and no item is created for the caller
+    assert payload['statusCode'] == 200
+    assert json.loads(payload['body'])['PostID'] == 'a7a3ac1eb24d4aa68ac64e49bb09f1d2'
+    assert 'Description' not in table.get_item(Key={'PostID': 'b1', 'Author': 'other_user'})['Item']
+    assert 'Item' not in table.get_item(Key={'PostID': 'b1', 'Author': 'user'})
+
+
+@mock_dynamodb
+def test_missing_post(aws_credentials):
+    event = {
+        'pathParameters': {'slug': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2'},
+        'requestContext': {"authorizer": {"principalId": "test_user"}},
+        'body': '{ "title": "New Title" }'
+    }
+    context = None
+
+    create_mock_ddb_table()
+
+    payload = update_post.update_post_handler(event, context)
+    table = boto3.resource('dynamodb').Table('POSTS_TABLE')
+
+    assert payload['statusCode'] == 404
+    assert 'Item' not in table.get_item(Key={'PostID': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'Author': 'test_user'})
+
+
+def content_event(body):
+    return {
+        'pathParameters': {'slug': 'unit-testing'},
+        'requestContext': {"authorizer": {"principalId": "user"}},
+        'body': json.dumps(body)
+    }
+
+
+def stored_html():
+    """
+    HTML the post's HtmlURL serves
+    """
+    item = boto3.resource('dynamodb').Table('POSTS_TABLE').get_item(
+        Key={'PostID': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'Author': 'user'})['Item']
+    response = boto3.client('s3').get_object(Bucket=BUCKET_NAME, Key=publishing.stored_html_key(item))
+
+    return html_objects.decode(response['Body'].read(), response['ContentEncoding'])
+
+
+def clear_bucket():
+    s3 = boto3.client('s3')
+    for stored in s3.list_objects_v2(Bucket=BUCKET_NAME).get('Contents', []):
+        s3.delete_object(Bucket=BUCKET_NAME, Key=stored['Key'])
+
+
+@mock_dynamodb
+@mock_s3
+def test_content_change_rerenders(aws_credentials):
+    os.environ['POSTS_BUCKET'] = BUCKET_NAME
+    boto3.client('s3').create_bucket(Bucket=BUCKET_NAME)
+    create_mock_ddb_table()
+
+    payload = update_post.update_post_handler(content_event({'content': '# New Content'}), None)
+
+    assert payload['statusCode'] == 200
+    assert json.loads(payload['body'])['ContentHash'] == rendering.content_hash('# New Content')
+    assert stored_html() == '<h1>New Content</h1>'
+    assert json.loads(payload['body'])['HtmlURL'].startswith('https://POSTS_BUCKET.s3.amazonaws.com/user/unit-testing.')
+
+    clear_bucket()
+    update_post.update_post_handler(content_event({'content': '# New Content', 'description': 'Edited'}), None)
+    update_post.update_post_handler(content_event({'tags': ['edited']}), None)
+
+    assert 'Contents' not in boto3.client('s3').list_objects_v2(Bucket=BUCKET_NAME)
+
+
+@mock_dynamodb
+@mock_s3
+def test_async_rerender(aws_credentials, monkeypatch):
+    os.environ['POSTS_BUCKET'] = BUCKET_NAME
+    os.environ['RERENDER_MODE'] = 'async'
+    os.environ['RERENDER_FUNCTION'] = 'RerenderPostFunction'
+    boto3.client('s3').create_bucket(Bucket=BUCKET_NAME)
+    create_mock_ddb_table()
+
+    invocations = []
+    monkeypatch.setattr(clients.get_client('lambda'), 'invoke', lambda **kwargs: invocations.append(kwargs))
+
+    update_post.update_post_handler(content_event({'content': 'First'}), None)
+    update_post.update_post_handler(content_event({'content': 'Second'}), None)
+
+    assert [invocation['InvocationType'] for invocation in invocations] == ['Event', 'Event']
+    assert 'Contents' not in boto3.client('s3').list_objects_v2(Bucket=BUCKET_NAME)
+
+    first, second = [json.loads(invocation['Payload']) for invocation in invocations]
+
+    assert rerender_post.rerender_post_handler(first, None) == {'rerendered': False}
+    assert rerender_post.rerender_post_handler(second, None) == {'rerendered': True}
+    assert stored_html() == '<p>Second</p>'
+
+
+@pytest.mark.parametrize('mode', ['sync', 'async'])
+@mock_dynamodb
+@mock_s3
+def test_rerender_moves_tag_index_urls(aws_credentials, monkeypatch, mode):
+    os.environ['POSTS_BUCKET'] = BUCKET_NAME
+    os.environ['RERENDER_MODE'] = mode
+    os.environ['RERENDER_FUNCTION'] = 'RerenderPostFunction'
+    os.environ['TAGS_TABLE'] = 'TAGS_TABLE'
+    boto3.client('s3').create_bucket(Bucket=BUCKET_NAME)
+    table = create_mock_ddb_table()
+    tags_table = create_mock_tags_table()
+    post = table.get_item(Key={'PostID': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'Author': 'user'})['Item']
+    tags.sync_post_tags(tags_table, None, dict(post, HtmlURL='https://POSTS_BUCKET.s3.amazonaws.com/user/old.html'))
+
+    invocations = []
+    monkeypatch.setattr(clients.get_client('lambda'), 'invoke', lambda **kwargs: invocations.append(kwargs))
+
+    update_post.update_post_handler(content_event({'content': '# New Content', 'tags': ['unit', 'py']}), None)
+    for invocation in invocations:
+        rerender_post.rerender_post_handler(json.loads(invocation['Payload']), None)
+
+    url = table.get_item(Key={'PostID': 'a7a3ac1eb24d4aa68ac64e49bb09f1d2', 'Author': 'user'})['Item']['HtmlURL']
+    items = tags_table.scan()['Items']
+
+    assert url.startswith('https://POSTS_BUCKET.s3.amazonaws.com/user/unit-testing.')
+    assert sorted(item['Tag'] for item in items) == ['py', 'unit']
+    assert {item['HtmlURL'] for item in items} == {url}
+
+
 @mock_dynamodb
 def create_mock_ddb_table():
     mock_ddb = boto3.resource('dynamodb')
@@ -103,6 +299,10 @@ def create_mock_ddb_table():
             {
                 'AttributeName': 'Author',
                 'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'Slug',
+                'AttributeType': 'S'
             }
         ],
         KeySchema=[
@@ -115,6 +315,25 @@ def create_mock_ddb_table():
                 'KeyType': 'RANGE'
             }
         ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'SlugLookupIndex',
+                'KeySchema': [
+                    {
+                        'AttributeName': 'Slug',
+                        'KeyType': 'HASH'
+                    }
+                ],
+                'Projection': {
+                    'ProjectionType': 'INCLUDE',
+                    'NonKeyAttributes': ['DateCreated']
+                },
+                'ProvisionedThroughput': {
+                    'ReadCapacityUnits': 5,
+                    'WriteCapacityUnits': 5
+                }
+            }
+        ],
         ProvisionedThroughput={
             'ReadCapacityUnits': 5,
             'WriteCapacityUnits': 5
@@ -132,3 +351,36 @@ def create_mock_ddb_table():
             'Tags': ['unit', 'testing']
         }
     )
+    return mock_ddb.Table('POSTS_TABLE')
+
+
+def create_mock_tags_table():
+    mock_ddb = boto3.resource('dynamodb')
+    mock_ddb.create_table(
+        TableName='TAGS_TABLE',
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'Tag',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'TagSort',
+                'AttributeType': 'S'
+            }
+        ],
+        KeySchema=[
+            {
+                'AttributeName': 'Tag',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'TagSort',
+                'KeyType': 'RANGE'
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+    return mock_ddb.Table('TAGS_TABLE')